@@ -0,0 +1,56 @@
+"""
+Destinations reachable by a direct route from each airport.
+
+Every airport has one cache entry holding ``(id, name)`` pairs of its
+destinations, so a page of airports is served with a single ``get_many``
+and one query for the airports that missed. Entries are keyed by the
+airport's ``updated_at``, which the Route and Airport signals move when
+routes or airport names change (see signals.destinations_changed): every
+worker misses after a write, even with per-process caches.
+"""
+from collections import defaultdict
+
+from django.core.cache import cache
+
+from airlines import replicas
+from airlines.models import Route
+
+DESTINATIONS_TIMEOUT = 60 * 60 * 24
+
+
+def destinations_key(airport) -> str:
+    return f"airport-destinations:{airport.id}:{airport.updated_at.timestamp()}"
+
+
+def get_destinations(airports) -> dict:
+    """Map every airport id to a list of ``(id, name)`` of its destinations"""
+    keys = {destinations_key(airport): airport.id for airport in airports}
+    cached = cache.get_many(keys)
+    destinations = {keys[key]: value for key, value in cached.items()}
+
+    missing = [
+        airport_id for airport_id in keys.values() if airport_id not in destinations
+    ]
+    if missing:
+        built = defaultdict(list)
+        rows = (
+            Route.objects.filter(source_id__in=missing)
+            .order_by("destination__name")
+            .values_list("source_id", "destination_id", "destination__name")
+        )
+        # cached for a day: a lagging replica must not fill it
+        with replicas.primary():
+            rows = list(rows)
+        for source_id, destination_id, name in rows:
+            built[source_id].append((destination_id, name))
+        built = {airport_id: built[airport_id] for airport_id in missing}
+        cache.set_many(
+            {
+                key: built[airport_id]
+                for key, airport_id in keys.items()
+                if airport_id in built
+            },
+            DESTINATIONS_TIMEOUT,
+        )
+        destinations.update(built)
+    return destinations
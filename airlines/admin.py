@@ -3,12 +3,14 @@ from django.contrib import admin
 from airlines.models import (
     Route,
     Flight,
+    FlightSchedule,
     Airport,
     Airplane,
     AirplaneType,
     Order,
     Ticket,
     Crew,
+    SeatHold,
 )
 
 
@@ -23,6 +25,11 @@ class FlightAdmin(admin.ModelAdmin):
     pass
 
 
+@admin.register(FlightSchedule)
+class FlightScheduleAdmin(admin.ModelAdmin):
+    pass
+
+
 @admin.register(Airport)
 class AirportAdmin(admin.ModelAdmin):
     pass
@@ -51,3 +58,8 @@ class TicketAdmin(admin.ModelAdmin):
 @admin.register(Crew)
 class CrewAdmin(admin.ModelAdmin):
     pass
+
+
+@admin.register(SeatHold)
+class SeatHoldAdmin(admin.ModelAdmin):
+    pass
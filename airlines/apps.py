@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class AirlinesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "airlines"
+
+    def ready(self):
+        from airlines import checks, signals  # noqa: F401
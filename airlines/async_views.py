@@ -0,0 +1,182 @@
+"""
+Async read endpoints for flight and route search.
+
+Under ASGI they run on the event loop and read through the async ORM
+(``aiterator``, ``afirst``, ``acount``), so one process keeps many searches
+in flight. They take the same filters and return the same shapes as
+FlightViewSet and RouteViewSet, which keep serving WSGI unchanged, and
+read from replicas the same way (see airlines.replicas). Response caching
+and conditional GETs are left to the sync endpoints.
+"""
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from airlines import replicas, schedules
+from airlines.models import Airport
+from airlines.permissions import IsAdminOrIfAuthenticatedReadOnly
+from airlines.renderers import FastJSONRenderer
+from airlines.serializers import (
+    FlightDetailSerializer,
+    FlightListSerializer,
+    RouteSerializer,
+)
+from airlines.views import (
+    FlightPagination,
+    FlightViewSet,
+    RouteViewSet,
+    ScheduledFlights,
+    filter_flights,
+    filter_routes,
+)
+
+
+class AsyncReadView(View):
+    """
+    Authenticates, checks permissions and throttles like a DRF view, then
+    awaits ``read``; errors render like DRF's exception handler does
+    """
+
+    http_method_names = ["get", "head", "options"]
+    authentication_classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES
+    throttle_scopes = {}
+    action = None
+    renderer_class = FastJSONRenderer
+
+    async def get(self, request, *args, **kwargs):
+        request = Request(
+            request, authenticators=[auth() for auth in self.authentication_classes]
+        )
+        try:
+            # authenticators load the user and throttles hit the cache, both sync
+            await sync_to_async(self.check_access)(request)
+            token = replicas.use_replica() if self.replica_reads else None
+            try:
+                data = await self.read(request, *args, **kwargs)
+            finally:
+                replicas.release(token)
+        except exceptions.APIException as error:
+            return self.error_response(request, error)
+        return self.render(data)
+
+    async def read(self, request, *args, **kwargs):
+        """
+        The response data; subclasses implement it, reading through the
+        async ORM and raising APIException subclasses for errors
+        """
+
+    def check_access(self, request):
+        request.user
+        self.replica_reads = not replicas.is_pinned(request)
+        for permission in self.permission_classes:
+            if not permission().has_permission(request, self):
+                if request.authenticators and not request.successful_authenticator:
+                    raise exceptions.NotAuthenticated()
+                raise exceptions.PermissionDenied()
+
+        waits = []
+        for throttle_class in self.throttle_classes:
+            throttle = throttle_class()
+            if not throttle.allow_request(request, self):
+                waits.append(throttle.wait())
+        if waits:
+            durations = [wait for wait in waits if wait is not None]
+            raise exceptions.Throttled(max(durations, default=None))
+
+    def render(self, data, status=200) -> HttpResponse:
+        renderer = self.renderer_class()
+        return HttpResponse(
+            renderer.render(data), content_type=renderer.media_type, status=status
+        )
+
+    def error_response(self, request, error) -> HttpResponse:
+        if isinstance(error.detail, (list, dict)):
+            data = error.detail
+        else:
+            data = {"detail": error.detail}
+
+        status = error.status_code
+        authenticate_header = None
+        if isinstance(
+            error, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)
+        ):
+            if request.authenticators:
+                authenticate_header = request.authenticators[0].authenticate_header(
+                    request
+                )
+            if not authenticate_header:
+                status = 403
+
+        response = self.render(data, status=status)
+        if authenticate_header:
+            response["WWW-Authenticate"] = authenticate_header
+        if getattr(error, "wait", None):
+            response["Retry-After"] = "%d" % error.wait
+        return response
+
+
+def sparse_queryset(serializer_class, queryset, request, keep=()):
+    """What SparseQuerysetMixin.filter_queryset does for the sync viewsets"""
+    serializer = serializer_class(context={"request": request})
+    if not serializer.lean:
+        return queryset
+    return serializer.sparse_queryset(queryset, keep)
+
+
+class FlightListView(AsyncReadView):
+    action = "list"
+    throttle_scopes = FlightViewSet.throttle_scopes
+
+    async def read(self, request):
+        route = request.query_params.get("route")
+        airport_ids = await Airport.objects.aids_for_city(route) if route else None
+        queryset = filter_flights(
+            FlightViewSet.queryset.all(), request.query_params, airport_ids
+        )
+        scheduled = ScheduledFlights(request.query_params, airport_ids)
+
+        paginator = FlightPagination()
+        keep = [field.lstrip("-") for field in paginator.ordering]
+        queryset = sparse_queryset(FlightListSerializer, queryset, request, keep)
+        flights = await paginator.apaginate_queryset(queryset, request, self, scheduled)
+
+        context = {"request": request}
+        data = FlightListSerializer(flights, many=True, context=context).data
+        return paginator.get_paginated_response(data).data
+
+
+class FlightDetailView(AsyncReadView):
+    async def read(self, request, pk):
+        queryset = FlightViewSet.queryset.select_related("airplane__airplane_type")
+        queryset = sparse_queryset(FlightDetailSerializer, queryset, request)
+        pk = int(pk)
+        if pk < 0:
+            flight = await sync_to_async(schedules.resolve)(pk, queryset)
+        else:
+            flight = await queryset.filter(pk=pk).afirst()
+        if flight is None:
+            raise exceptions.NotFound()
+        return FlightDetailSerializer(flight, context={"request": request}).data
+
+
+class RouteListView(AsyncReadView):
+    action = "list"
+    throttle_scopes = RouteViewSet.throttle_scopes
+
+    async def read(self, request):
+        source = request.query_params.get("source")
+        destination = request.query_params.get("destination")
+        queryset = filter_routes(
+            RouteViewSet.queryset.all(),
+            await Airport.objects.aids_for_city(source) if source else None,
+            await Airport.objects.aids_for_city(destination) if destination else None,
+        )
+        queryset = sparse_queryset(RouteSerializer, queryset, request)
+
+        routes = [route async for route in queryset.aiterator()]
+        return RouteSerializer(routes, many=True, context={"request": request}).data
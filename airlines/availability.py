@@ -0,0 +1,161 @@
+"""
+Per-route daily availability, the rollup behind /routes/{id}/calendar/.
+
+A RouteDay row holds the number of flights of a route departing that day
+and the seats left on them. Sold and cancelled tickets move seats_left by
+their count; saving or deleting a flight recounts the days it leaves and
+joins, an airplane resized recounts the days it flies (see
+airlines.signals). ``rebuild_route_calendar`` recounts every day.
+Schedules (airlines.schedules) are added when the calendar is read.
+"""
+from collections import Counter
+from datetime import datetime, time, timedelta
+from functools import reduce
+from operator import or_
+
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from airlines import schedules
+from airlines.models import Flight, RouteDay, Ticket
+
+SEATS_LEFT = Coalesce(
+    Sum(F("airplane__rows") * F("airplane__seats_in_row") - F("tickets_sold")), 0
+)
+
+
+def day_range(first, last):
+    """Midnights bounding the days first to last"""
+    start = datetime.combine(first, time())
+    return start, datetime.combine(last, time()) + timedelta(days=1)
+
+
+def day_totals(flights):
+    """{(route id, day): (flights, seats left)} of a Flight queryset"""
+    rows = (
+        flights.annotate(day=TruncDate("departure_time"))
+        .order_by()
+        .values("route_id", "day")
+        .annotate(flights=Count("id"), seats_left=SEATS_LEFT)
+        .values_list("route_id", "day", "flights", "seats_left")
+    )
+    return {(route_id, day): (count, seats) for route_id, day, count, seats in rows}
+
+
+def recount(*route_days):
+    """
+    Recount the given (route id, day) pairs from their flights: one
+    aggregate query and one upsert, however many pairs
+    """
+    route_days = set(route_days)
+    if not route_days:
+        return
+    routes = {route_id for route_id, _ in route_days}
+    days = {day for _, day in route_days}
+    start, end = day_range(min(days), max(days))
+    totals = day_totals(
+        Flight.objects.filter(
+            route_id__in=routes, departure_time__gte=start, departure_time__lt=end
+        )
+    )
+
+    RouteDay.objects.bulk_create(
+        [
+            RouteDay(route_id=route_id, day=day, flights=flights, seats_left=seats)
+            for (route_id, day), (flights, seats) in totals.items()
+            if (route_id, day) in route_days
+        ],
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=["route", "day"],
+        update_fields=["flights", "seats_left"],
+    )
+    emptied = route_days - totals.keys()
+    if emptied:
+        RouteDay.objects.filter(
+            pk__in=[
+                pk
+                for pk, route_id, day in RouteDay.objects.filter(
+                    route_id__in=routes, day__in=days
+                ).values_list("id", "route_id", "day")
+                if (route_id, day) in emptied
+            ]
+        ).delete()
+
+
+def recount_airplane(airplane_id: int):
+    days = (
+        Flight.objects.filter(airplane_id=airplane_id)
+        .annotate(day=TruncDate("departure_time"))
+        .order_by()
+        .values_list("route_id", "day")
+        .distinct()
+    )
+    recount(*days)
+
+
+def route_day(flight) -> tuple:
+    departure_time = Flight._meta.get_field("departure_time").to_python(
+        flight.departure_time
+    )
+    return flight.route_id, departure_time.date()
+
+
+def seats_sold(tickets, sign: int = 1):
+    """
+    Take the seats of new tickets off their days, or give back those of
+    cancelled ones (sign=-1), in a single UPDATE; flights the tickets do
+    not carry already are looked up in one query
+    """
+    changes, missing = Counter(), Counter()
+    for ticket in tickets:
+        if Ticket.flight.is_cached(ticket):
+            changes[route_day(ticket.flight)] += 1
+        else:
+            missing[ticket.flight_id] += 1
+    for flight_id, route_id, departure_time in Flight.objects.filter(
+        pk__in=missing
+    ).values_list("id", "route_id", "departure_time"):
+        changes[(route_id, departure_time.date())] += missing[flight_id]
+    if not changes:
+        return
+
+    RouteDay.objects.filter(
+        reduce(or_, (Q(route_id=route_id, day=day) for route_id, day in changes))
+    ).update(
+        seats_left=F("seats_left")
+        - sign
+        * Case(
+            *(
+                When(route_id=route_id, day=day, then=Value(seats))
+                for (route_id, day), seats in changes.items()
+            ),
+            default=Value(0),
+        )
+    )
+
+
+def calendar(route_id: int, first, last) -> list:
+    """Flights and seats left per day from first to last, empty days included"""
+    start, end = day_range(first, last)
+    days = {
+        day: [flights, seats_left]
+        for day, flights, seats_left in RouteDay.objects.filter(
+            route_id=route_id, day__gte=first, day__lte=last
+        ).values_list("day", "flights", "seats_left")
+    }
+    for flight in schedules.virtual_flights(
+        max(start, timezone.now()), end, route_id=route_id
+    ):
+        totals = days.setdefault(flight.departure_time.date(), [0, 0])
+        totals[0] += 1
+        totals[1] += flight.tickets_available
+
+    result = []
+    day = first
+    while day <= last:
+        flights, seats_left = days.get(day, (0, 0))
+        result.append({"date": day, "flights": flights, "seats_left": seats_left})
+        day += timedelta(days=1)
+    return result
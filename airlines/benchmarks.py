@@ -0,0 +1,327 @@
+"""
+Helpers for the local API benchmark (``manage.py benchmark_api``) and for
+reading recorded runs back (``manage.py benchmark_report``).
+
+Requests go through Django's test client in worker threads, so every
+request also reports how many SQL queries it ran on its own connection.
+AsyncRunner drives the ASGI handler instead (``manage.py benchmark_async``).
+"""
+import asyncio
+import json
+import math
+import re
+import statistics
+import threading
+import time
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from urllib.parse import urlencode
+
+from django.core.handlers.asgi import ASGIHandler
+from django.db import connection, close_old_connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from airlines.metrics import LATENCY_BUCKETS
+
+
+# histogram bounds shared by benchmark samples and /metrics scrapes
+LATENCY_BOUNDS_MS = tuple(bound * 1000 for bound in LATENCY_BUCKETS)
+SAMPLE_PATTERN = re.compile(r"^(\w+)\{(.*)\} (\S+)$")
+LABEL_PATTERN = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def percentile(values, fraction: float) -> float:
+    """Nearest-rank percentile of an unsorted list, 0 for an empty one"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(fraction * len(ordered)) - 1, 0)
+    return ordered[rank]
+
+
+def bucket_percentile(bounds, counts, fraction: float) -> float:
+    """
+    Percentile estimated from histogram bucket counts by linear
+    interpolation inside the bucket, as Prometheus' histogram_quantile does
+    """
+    total = sum(counts)
+    if not total:
+        return 0.0
+    rank = fraction * total
+    seen = 0
+    lower = 0.0
+    for bound, count in zip(bounds, counts):
+        if count and seen + count >= rank:
+            return lower + (bound - lower) * (rank - seen) / count
+        seen += count
+        lower = bound
+    # the +Inf bucket has no upper bound, report the last finite one
+    return bounds[-1]
+
+
+def bucket_labels() -> list:
+    return [f"<={bound:g}ms" for bound in LATENCY_BOUNDS_MS] + ["+Inf"]
+
+
+def bucket_counts(samples_ms) -> list:
+    counts = [0] * (len(LATENCY_BOUNDS_MS) + 1)
+    for value in samples_ms:
+        counts[bisect_left(LATENCY_BOUNDS_MS, value)] += 1
+    return counts
+
+
+def run_from_benchmark(data: dict) -> dict:
+    endpoints = {}
+    for name, result in data.get("endpoints", {}).items():
+        latency = result["latency_ms"]
+        endpoints[name] = {
+            "requests": result["requests"],
+            "p50": latency["p50"],
+            "p95": latency["p95"],
+            "p99": latency["p99"],
+            "queries": result["queries"]["mean"],
+            "histogram": bucket_counts(result.get("samples_ms", ())),
+        }
+    return endpoints
+
+
+def run_from_metrics(text: str) -> dict:
+    """Endpoints of a /metrics scrape, named "<method> <route>" """
+    buckets = {}
+    queries = {}
+    for line in text.splitlines():
+        match = SAMPLE_PATTERN.match(line.strip())
+        if not match:
+            continue
+        metric, raw_labels, value = match.groups()
+        labels = dict(LABEL_PATTERN.findall(raw_labels))
+        name = f"{labels.get('method', '')} {labels.get('route', '')}".strip()
+        if metric == "http_request_duration_seconds_bucket":
+            bound = labels["le"]
+            bound = math.inf if bound == "+Inf" else float(bound) * 1000
+            buckets.setdefault(name, {})[bound] = float(value)
+        elif metric.startswith("http_request_db_queries_"):
+            queries.setdefault(name, {})[metric.rsplit("_", 1)[1]] = float(value)
+
+    endpoints = {}
+    for name, cumulative in buckets.items():
+        bounds = sorted(cumulative)
+        counts = []
+        previous = 0.0
+        for bound in bounds:
+            counts.append(int(cumulative[bound] - previous))
+            previous = cumulative[bound]
+        finite = [bound for bound in bounds if bound != math.inf]
+        stats = queries.get(name, {})
+        endpoints[name] = {
+            "requests": sum(counts),
+            "p50": bucket_percentile(finite, counts, 0.50),
+            "p95": bucket_percentile(finite, counts, 0.95),
+            "p99": bucket_percentile(finite, counts, 0.99),
+            "queries": stats["sum"] / stats["count"] if stats.get("count") else 0.0,
+            "histogram": counts,
+        }
+    return endpoints
+
+
+def load_run(path: str) -> dict:
+    """Endpoints of a benchmark_api JSON file or of a saved /metrics scrape"""
+    with open(path) as file:
+        text = file.read()
+    if text.lstrip().startswith("{"):
+        return run_from_benchmark(json.loads(text))
+    return run_from_metrics(text)
+
+
+def login(client: Client, email: str, password: str) -> str:
+    """Access token of a real JWT login"""
+    response = client.post(
+        "/api/user/token/",
+        {"email": email, "password": password},
+        content_type="application/json",
+    )
+    if response.status_code != 200:
+        raise RuntimeError(f"Login failed: {response.content[:200]!r}")
+    return response.json()["access"]
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    path: str
+    data: object = None
+    params: dict = None
+    authenticated: bool = True
+
+
+@dataclass
+class ScenarioResult:
+    scenario: Scenario
+    latencies: list = field(default_factory=list)
+    queries: list = field(default_factory=list)
+    errors: int = 0
+    elapsed: float = 0.0
+
+    def as_dict(self) -> dict:
+        latencies = self.latencies
+        path = self.scenario.path
+        return {
+            "method": self.scenario.method,
+            # a callable path picks a new one for every request
+            "path": path if isinstance(path, str) else None,
+            "requests": len(latencies),
+            "errors": self.errors,
+            "throughput_rps": round(len(latencies) / self.elapsed, 2)
+            if self.elapsed
+            else 0.0,
+            "latency_ms": {
+                "p50": round(percentile(latencies, 0.50), 3),
+                "p95": round(percentile(latencies, 0.95), 3),
+                "p99": round(percentile(latencies, 0.99), 3),
+                "mean": round(statistics.fmean(latencies), 3) if latencies else 0.0,
+                "max": round(max(latencies), 3) if latencies else 0.0,
+            },
+            "queries": {
+                "mean": round(statistics.fmean(self.queries), 2)
+                if self.queries
+                else 0.0,
+                "max": max(self.queries) if self.queries else 0,
+            },
+            "samples_ms": [round(value, 3) for value in latencies],
+        }
+
+
+class Runner:
+    def __init__(self, email: str, password: str, concurrency: int):
+        self.email = email
+        self.password = password
+        self.concurrency = concurrency
+        self.local = threading.local()
+        # one login up front: hashing the password in every worker thread
+        # would be counted in the elapsed time of the first scenario
+        self.token = login(self.client(), email, password)
+
+    def client(self) -> Client:
+        """One client per worker thread, all sending the same real JWT"""
+        client = getattr(self.local, "client", None)
+        if client is None:
+            # an address outside INTERNAL_IPS keeps debug_toolbar out of the way
+            client = Client(HTTP_HOST="localhost", REMOTE_ADDR="10.0.0.1")
+            self.local.client = client
+        return client
+
+    def request(self, scenario: Scenario):
+        client = self.client()
+        headers = {}
+        if scenario.authenticated:
+            headers["HTTP_AUTHORIZATION"] = f"Bearer {self.token}"
+        call = getattr(client, scenario.method.lower())
+        path = scenario.path() if callable(scenario.path) else scenario.path
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            if scenario.method == "GET":
+                params = (
+                    scenario.params() if callable(scenario.params) else scenario.params
+                )
+                response = call(path, params or {}, **headers)
+            else:
+                response = call(
+                    path,
+                    scenario.data() if callable(scenario.data) else scenario.data,
+                    content_type="application/json",
+                    **headers,
+                )
+            latency = (time.perf_counter() - started) * 1000
+        return latency, len(captured), response.status_code < 400
+
+    def run(self, scenario: Scenario, requests: int) -> ScenarioResult:
+        result = ScenarioResult(scenario)
+
+        def work(_):
+            try:
+                return self.request(scenario)
+            finally:
+                # what request_finished does after a real request
+                close_old_connections()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for latency, queries, ok in pool.map(work, range(requests)):
+                result.latencies.append(latency)
+                result.queries.append(queries)
+                result.errors += not ok
+        result.elapsed = time.perf_counter() - started
+        return result
+
+
+class AsyncRunner:
+    """
+    Sends GET scenarios straight to Django's ASGI handler from one event
+    loop, ``concurrency`` requests in flight at a time, as one ASGI server
+    process would. SQL queries run on other threads and are not counted
+    """
+
+    def __init__(self, token: str, concurrency: int):
+        self.token = token
+        self.concurrency = concurrency
+        self.handler = ASGIHandler()
+
+    def scope(self, scenario: Scenario) -> dict:
+        path = scenario.path() if callable(scenario.path) else scenario.path
+        params = scenario.params() if callable(scenario.params) else scenario.params
+        headers = [(b"host", b"localhost")]
+        if scenario.authenticated:
+            headers.append((b"authorization", f"Bearer {self.token}".encode()))
+        return {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": scenario.method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": urlencode(params or {}).encode(),
+            "root_path": "",
+            "headers": headers,
+            "client": ("10.0.0.1", 50000),
+            "server": ("localhost", 80),
+        }
+
+    async def request(self, scenario: Scenario):
+        status = None
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        started = time.perf_counter()
+        await self.handler(self.scope(scenario), receive, send)
+        latency = (time.perf_counter() - started) * 1000
+        return latency, status is not None and status < 400
+
+    async def arun(self, scenario: Scenario, requests: int) -> ScenarioResult:
+        result = ScenarioResult(scenario)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def work():
+            async with semaphore:
+                return await self.request(scenario)
+
+        started = time.perf_counter()
+        for latency, ok in await asyncio.gather(*(work() for _ in range(requests))):
+            result.latencies.append(latency)
+            result.errors += not ok
+        result.elapsed = time.perf_counter() - started
+        return result
+
+    def run(self, scenario: Scenario, requests: int) -> ScenarioResult:
+        if scenario.method != "GET":
+            raise ValueError("AsyncRunner only sends GET requests")
+        return asyncio.run(self.arun(scenario, requests))
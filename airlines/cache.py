@@ -0,0 +1,169 @@
+"""
+Versioned response cache.
+
+Cached responses are keyed by a namespace version plus the normalized
+request. Writes never touch cached entries: they bump the namespace
+version (an O(1) incr), which makes every older key unreachable until it
+expires on its own.
+
+The versions live in the response cache itself, so workers only see each
+other's writes when it is shared: with the LocMemCache default every worker
+keeps its own versions. Production with several workers needs a shared
+backend (RESPONSE_CACHE_BACKEND); airlines.checks warns otherwise.
+"""
+import hashlib
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.response import Response
+
+from airlines import replicas
+
+
+def response_cache():
+    return caches[getattr(settings, "RESPONSE_CACHE_ALIAS", "default")]
+
+
+def version_key(namespace: str) -> str:
+    return f"response-version:{namespace}"
+
+
+def namespace_version(namespace: str) -> int:
+    cache = response_cache()
+    version = cache.get(version_key(namespace))
+    if version is None:
+        # Start from the clock, never from 1, so an evicted counter cannot
+        # come back at a version whose entries are still cached
+        cache.add(version_key(namespace), time.time_ns(), timeout=None)
+        version = cache.get(version_key(namespace))
+    return version
+
+
+def _incr(namespace: str):
+    cache = response_cache()
+    try:
+        cache.incr(version_key(namespace))
+    except ValueError:
+        cache.add(version_key(namespace), time.time_ns(), timeout=None)
+
+
+def bump_version(namespace: str):
+    """Move a namespace version right away, e.g. from an on_commit callback"""
+    _incr(namespace)
+
+
+def written_key(namespace: str) -> str:
+    return f"response-written:{namespace}"
+
+
+def _committed(namespace: str):
+    _incr(namespace)
+    # replicas may not have this write yet, see CachedResponseMixin
+    if replicas.sticky_seconds():
+        response_cache().set(
+            written_key(namespace), True, timeout=replicas.sticky_seconds()
+        )
+
+
+def bump_namespace(*namespaces):
+    """
+    Invalidate namespaces now, for reads later in the same transaction, and
+    again on commit, for entries other requests cached from pre-commit data
+    """
+    for namespace in namespaces:
+        _incr(namespace)
+        transaction.on_commit(lambda namespace=namespace: _committed(namespace))
+
+
+def record(namespace: str, outcome: str):
+    cache = response_cache()
+    key = f"response-stats:{namespace}:{outcome}"
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, timeout=None) or cache.incr(key)
+
+
+def stats(namespaces) -> dict:
+    cache = response_cache()
+    keys = {
+        (namespace, outcome): f"response-stats:{namespace}:{outcome}"
+        for namespace in namespaces
+        for outcome in ("hits", "misses")
+    }
+    values = cache.get_many(keys.values())
+    result = {}
+    for (namespace, outcome), key in keys.items():
+        result.setdefault(namespace, {})[outcome] = values.get(key, 0)
+    return result
+
+
+class CachedResponseMixin:
+    """
+    Serve list/retrieve responses from the response cache.
+    Views set ``cache_namespace``; writes to the models feeding that
+    namespace must call bump_namespace() (see airlines.signals)
+    """
+
+    cache_namespace = None
+    cached_actions = ("list", "retrieve")
+
+    def response_cache_key(self) -> str:
+        request = self.request
+        query = sorted(
+            (name, value)
+            for name, values in request.query_params.lists()
+            for value in values
+        )
+        raw = "|".join(
+            [
+                self.action,
+                request.get_host(),
+                request.path,
+                repr(query),
+                request.accepted_renderer.format,
+            ]
+        )
+        version = namespace_version(self.cache_namespace)
+        digest = hashlib.md5(raw.encode()).hexdigest()
+        return f"response:{self.cache_namespace}:{version}:{digest}"
+
+    def cached_response(self, build):
+        if self.action not in self.cached_actions:
+            return build()
+
+        cache = response_cache()
+        key = self.response_cache_key()
+        data = cache.get(key)
+        if data is not None:
+            record(self.cache_namespace, "hits")
+            response = Response(data)
+            response["X-Cache"] = "HIT"
+            return response
+
+        record(self.cache_namespace, "misses")
+        response = build()
+        if response.status_code == 200 and self.may_store(cache):
+            cache.set(key, response.data)
+        response["X-Cache"] = "MISS"
+        return response
+
+    def may_store(self, cache) -> bool:
+        """
+        A response read from a replica soon after a write to the namespace
+        may predate it, and would be cached under the new version
+        """
+        if replicas.read_alias() is None:
+            return True
+        return cache.get(written_key(self.cache_namespace)) is None
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(partial(super().list, request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            partial(super().retrieve, request, *args, **kwargs)
+        )
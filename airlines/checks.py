@@ -0,0 +1,53 @@
+"""
+System checks for settings that only hold up with a single worker process.
+
+WEB_CONCURRENCY tells how many workers serve the site; state kept in a
+LocMemCache is private to each of them.
+"""
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+
+def is_per_process(alias: str) -> bool:
+    return isinstance(caches[alias], LocMemCache)
+
+
+@checks.register(checks.Tags.caches)
+def check_throttle_store(app_configs, **kwargs):
+    workers = getattr(settings, "WEB_CONCURRENCY", 1)
+    alias = getattr(settings, "THROTTLE_CACHE_ALIAS", "default")
+    if (
+        workers > 1
+        and getattr(settings, "THROTTLE_STORE", "cache") == "cache"
+        and is_per_process(alias)
+    ):
+        return [
+            checks.Error(
+                f"THROTTLE_STORE is 'cache' on the LocMemCache {alias!r} cache "
+                f"with {workers} workers: every worker would get its own limits.",
+                hint="Use THROTTLE_STORE 'sqlite' or 'redis', or a shared cache.",
+                id="airlines.E001",
+            )
+        ]
+    return []
+
+
+@checks.register(checks.Tags.caches)
+def check_response_cache(app_configs, **kwargs):
+    workers = getattr(settings, "WEB_CONCURRENCY", 1)
+    alias = getattr(settings, "RESPONSE_CACHE_ALIAS", "default")
+    if workers > 1 and is_per_process(alias):
+        return [
+            checks.Warning(
+                f"The response cache {alias!r} is a LocMemCache with {workers} "
+                "workers: a write only moves the namespace versions of its own "
+                "worker, the others keep serving cached responses until they "
+                "expire and search a stale itinerary graph.",
+                hint="Set RESPONSE_CACHE_BACKEND to a shared backend (Redis, "
+                "Memcached, or a FileBasedCache on one host).",
+                id="airlines.W001",
+            )
+        ]
+    return []
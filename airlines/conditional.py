@@ -0,0 +1,74 @@
+"""
+Conditional GET for viewsets over models with an ``updated_at`` column.
+
+A list is validated with one aggregate query (latest ``updated_at`` and row
+count of the filtered queryset), a detail with the row itself, so a
+matching ``If-None-Match`` / ``If-Modified-Since`` answers 304 before
+anything is serialized.
+"""
+import hashlib
+from calendar import timegm
+from functools import partial
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+
+def make_etag(request, *parts) -> str:
+    """Strong validator from the request path, media type and the state parts"""
+    key = "|".join(
+        [request.get_full_path(), request.accepted_media_type or ""]
+        + [str(part) for part in parts]
+    )
+    return '"%s"' % hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()
+
+
+def to_timestamp(value) -> int:
+    return timegm(value.utctimetuple())
+
+
+class ConditionalResponseMixin:
+    """
+    Adds ETag and Last-Modified to list and retrieve responses and answers
+    304 Not Modified when the client copy is still current
+    """
+
+    def conditional_response(self, request, etag, last_modified, respond):
+        last_modified = to_timestamp(last_modified) if last_modified else None
+        not_modified = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if not_modified is not None:
+            return not_modified
+
+        response = respond()
+        if response.status_code == 200:
+            response["ETag"] = etag
+            if last_modified is not None:
+                response["Last-Modified"] = http_date(last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        state = queryset.order_by().aggregate(
+            latest=Max("updated_at"), count=Count("pk")
+        )
+        etag = make_etag(request, state["latest"], state["count"])
+        return self.conditional_response(
+            request,
+            etag,
+            state["latest"],
+            partial(super().list, request, *args, **kwargs),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag = make_etag(request, instance.pk, instance.updated_at)
+
+        def respond():
+            serializer = self.get_serializer(instance)
+            return Response(serializer.data)
+
+        return self.conditional_response(request, etag, instance.updated_at, respond)
@@ -0,0 +1,110 @@
+"""
+Seat holds: short reservations taken before the order is placed.
+
+Holds need no cleanup job: an expired hold simply stops counting and is
+overwritten by the next hold on the same seat.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction, IntegrityError
+from django.db.models import Q
+from django.utils import timezone
+
+from airlines.models import SeatHold, Ticket
+
+
+class SeatsUnavailable(Exception):
+    def __init__(self, seats):
+        super().__init__(seats)
+        self.seats = seats
+
+
+def hold_duration() -> timedelta:
+    return timedelta(minutes=getattr(settings, "SEAT_HOLD_MINUTES", 10))
+
+
+def active(queryset=None):
+    queryset = SeatHold.objects.all() if queryset is None else queryset
+    return queryset.filter(expires_at__gt=timezone.now())
+
+
+def hold_seats(user, flight, seats) -> list:
+    """
+    Hold all (row, seat) pairs on a flight for the current user, or none of
+    them: raises SeatsUnavailable listing seats sold or held by someone else
+    """
+    now = timezone.now()
+    expires_at = now + hold_duration()
+    seats = sorted(set(seats))
+    sold = set(
+        Ticket.objects.filter(
+            flight=flight,
+            row__in={row for row, _ in seats},
+            seat__in={seat for _, seat in seats},
+        ).values_list("row", "seat")
+    )
+    unavailable = [seat for seat in seats if seat in sold]
+
+    with transaction.atomic():
+        for row, seat in seats:
+            if (row, seat) in sold:
+                continue
+            renewed = (
+                SeatHold.objects.filter(flight=flight, row=row, seat=seat)
+                .filter(Q(expires_at__lte=now) | Q(user=user))
+                .update(user=user, expires_at=expires_at)
+            )
+            if renewed:
+                continue
+            try:
+                with transaction.atomic():
+                    SeatHold.objects.create(
+                        flight=flight,
+                        user=user,
+                        row=row,
+                        seat=seat,
+                        expires_at=expires_at,
+                    )
+            except IntegrityError:
+                unavailable.append((row, seat))
+
+        if unavailable:
+            raise SeatsUnavailable(sorted(unavailable))
+
+    return list(
+        SeatHold.objects.filter(
+            flight=flight, user=user, expires_at=expires_at
+        ).order_by("row", "seat")
+    )
+
+
+def held_by_others(user, seats) -> set:
+    """(flight_id, row, seat) triples that other users hold right now"""
+    if not seats:
+        return set()
+    held = (
+        active()
+        .filter(
+            flight_id__in={flight_id for flight_id, _, _ in seats},
+            row__in={row for _, row, _ in seats},
+            seat__in={seat for _, _, seat in seats},
+        )
+        .exclude(user=user)
+        .values_list("flight_id", "row", "seat")
+    )
+    return set(held) & set(seats)
+
+
+def consume(user, seats):
+    """Drop the user's holds on seats that just became tickets"""
+    seats = set(seats)
+    flight_ids = {flight_id for flight_id, _, _ in seats}
+    holds = SeatHold.objects.filter(user=user, flight_id__in=flight_ids)
+    stale = [
+        hold.id
+        for hold in holds.only("id", "flight_id", "row", "seat")
+        if (hold.flight_id, hold.row, hold.seat) in seats
+    ]
+    if stale:
+        SeatHold.objects.filter(id__in=stale).delete()
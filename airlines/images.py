@@ -0,0 +1,130 @@
+"""
+Resized derivatives of uploaded airport, airplane and crew images.
+
+Every upload is rendered into a few sizes, each saved as WebP and JPEG
+next to the original. Rendering runs on a small thread pool after the
+upload is committed, so requests never wait for Pillow. The result is
+stored in ``image_derivatives`` of the owning row:
+
+    {"source": "uploads/crew/x.png",
+     "thumbnail": {"width": 160, "height": 120,
+                   "webp": "uploads/derivatives/x-thumbnail.webp",
+                   "jpeg": "uploads/derivatives/x-thumbnail.jpg"}, ...}
+
+``IMAGE_WORKERS = 0`` renders inline, which the tests rely on.
+"""
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# name: (max width, max height), images are never upscaled
+DERIVATIVES = {
+    "thumbnail": (160, 160),
+    "card": (480, 320),
+    "full": (1600, 1600),
+}
+FORMATS = {
+    "webp": ("WEBP", "webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", "jpg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+DERIVATIVES_DIR = "uploads/derivatives"
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_WORKERS, thread_name_prefix="images"
+            )
+    return _executor
+
+
+def derivative_path(source: str, size: str, extension: str) -> str:
+    stem, _ = os.path.splitext(os.path.basename(source))
+    return f"{DERIVATIVES_DIR}/{stem}-{size}.{extension}"
+
+
+def render_derivatives(source: str) -> dict:
+    """Render every size and format of ``source`` into the default storage"""
+    with default_storage.open(source) as file:
+        original = ImageOps.exif_transpose(Image.open(file))
+        original = original.convert("RGB")
+
+    derivatives = {"source": source}
+    for size, box in DERIVATIVES.items():
+        image = original.copy()
+        image.thumbnail(box, Image.LANCZOS)
+        entry = {"width": image.width, "height": image.height}
+        for name, (image_format, extension, options) in FORMATS.items():
+            path = derivative_path(source, size, extension)
+            buffer = io.BytesIO()
+            image.save(buffer, image_format, **options)
+            if default_storage.exists(path):
+                default_storage.delete(path)
+            entry[name] = default_storage.save(path, ContentFile(buffer.getvalue()))
+        derivatives[size] = entry
+    return derivatives
+
+
+def delete_derivatives(derivatives: dict):
+    for size in DERIVATIVES:
+        for name in FORMATS:
+            path = derivatives.get(size, {}).get(name)
+            if path:
+                default_storage.delete(path)
+
+
+def process(model, pk: int, source: str):
+    try:
+        derivatives = render_derivatives(source)
+        with transaction.atomic():
+            # a newer upload may have replaced the image meanwhile
+            instance = (
+                model.objects.select_for_update().filter(pk=pk, image=source).first()
+            )
+            if instance is not None:
+                instance.image_derivatives = derivatives
+                # a real save, so updated_at and the model signals follow
+                instance.save(update_fields=["image_derivatives", "updated_at"])
+        if instance is None:
+            delete_derivatives(derivatives)
+    except Exception:
+        logger.exception("Rendering derivatives of %s failed", source)
+    finally:
+        if settings.IMAGE_WORKERS:
+            close_old_connections()
+
+
+def image_changed(instance):
+    """Schedule rendering when the image is not the one derivatives came from"""
+    source = instance.image.name if instance.image else ""
+    derivatives = instance.image_derivatives or {}
+    if source == derivatives.get("source", ""):
+        return
+
+    model = type(instance)
+    if not source:
+        model.objects.filter(pk=instance.pk).update(image_derivatives={})
+        instance.image_derivatives = {}
+        return
+
+    job = partial(process, model, instance.pk, source)
+    if settings.IMAGE_WORKERS:
+        transaction.on_commit(lambda: executor().submit(job))
+    else:
+        transaction.on_commit(job)
@@ -0,0 +1,320 @@
+"""
+In-memory connection search over flights.
+
+Every flight is one connection (from airport, to airport, departure,
+arrival). Connections live in parallel integer arrays sorted by departure
+time, with airports mapped to dense integer indexes. Searches run a
+round-based Connection Scan: round k finds the earliest arrival at every
+airport using exactly k legs, so one scan yields the Pareto set of
+(fewest legs, earliest arrival) itineraries.
+
+The graph is built once per process and patched by the Flight and Route
+signals. Every change also moves the "itinerary" version in the response
+cache (see airlines.cache); a process whose graph was loaded at an older
+version rebuilds it before its next search, as it does anyway after
+``ITINERARY_GRAPH_TTL`` seconds. A rebuild loads a new graph on the side
+and swaps it in; searches keep using the old one meanwhile, so other
+workers may answer from before a change for as long as a load takes. The
+version is only shared between workers when the response cache is.
+"""
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from django.conf import settings
+
+from airlines import replicas
+from airlines.cache import bump_version, namespace_version
+from airlines.models import Flight
+
+NAMESPACE = "itinerary"
+EPOCH = datetime(1970, 1, 1)
+UNREACHED = 2**62
+
+
+def to_seconds(value: datetime) -> int:
+    return int((value.replace(tzinfo=None) - EPOCH).total_seconds())
+
+
+def from_seconds(value: int) -> datetime:
+    return EPOCH + timedelta(seconds=value)
+
+
+@dataclass
+class Leg:
+    flight: int
+    number: str
+    source: int
+    destination: int
+    departure_time: datetime
+    arrival_time: datetime
+
+
+@dataclass
+class Itinerary:
+    legs: list
+
+    @property
+    def departure_time(self) -> datetime:
+        return self.legs[0].departure_time
+
+    @property
+    def arrival_time(self) -> datetime:
+        return self.legs[-1].arrival_time
+
+
+class ConnectionGraph:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.built_at = None
+        # the shared NAMESPACE version the graph is current with
+        self.version = None
+        self.clear()
+
+    def clear(self):
+        self.airport_index = {}
+        self.airport_ids = array("q")
+        self.dep_stop = array("l")
+        self.arr_stop = array("l")
+        self.dep_time = array("q")
+        self.arr_time = array("q")
+        self.flight_ids = array("q")
+        self.serials = array("q")
+        self.numbers = []
+        self.live = {}
+        self.next_serial = 0
+
+    def stop(self, airport_id: int) -> int:
+        index = self.airport_index.get(airport_id)
+        if index is None:
+            index = self.airport_index[airport_id] = len(self.airport_ids)
+            self.airport_ids.append(airport_id)
+        return index
+
+    def load(self, horizon: datetime = None):
+        """Rebuild the whole graph from flights departing after ``horizon``"""
+        horizon = horizon or datetime.now() - timedelta(days=1)
+        rows = (
+            Flight.objects.filter(departure_time__gte=horizon)
+            .order_by("departure_time", "id")
+            .values_list(
+                "id",
+                "number",
+                "route__source_id",
+                "route__destination_id",
+                "departure_time",
+                "arrival_time",
+            )
+        )
+        with self.lock, replicas.primary():
+            self.clear()
+            for flight_id, number, source, destination, departure, arrival in (
+                rows.iterator(chunk_size=5000)
+            ):
+                self.append(flight_id, number, source, destination, departure, arrival)
+            self.built_at = time.monotonic()
+
+    def append(self, flight_id, number, source, destination, departure, arrival):
+        self.next_serial += 1
+        self.dep_stop.append(self.stop(source))
+        self.arr_stop.append(self.stop(destination))
+        self.dep_time.append(to_seconds(departure))
+        self.arr_time.append(to_seconds(arrival))
+        self.flight_ids.append(flight_id)
+        self.serials.append(self.next_serial)
+        self.numbers.append(number)
+        self.live[flight_id] = self.next_serial
+
+    def upsert(self, flight_id, number, source, destination, departure, arrival):
+        """Insert a new or changed flight, keeping the arrays sorted"""
+        with self.lock:
+            self.next_serial += 1
+            position = bisect_right(self.dep_time, to_seconds(departure))
+            self.dep_stop.insert(position, self.stop(source))
+            self.arr_stop.insert(position, self.stop(destination))
+            self.dep_time.insert(position, to_seconds(departure))
+            self.arr_time.insert(position, to_seconds(arrival))
+            self.flight_ids.insert(position, flight_id)
+            self.serials.insert(position, self.next_serial)
+            self.numbers.insert(position, number)
+            self.live[flight_id] = self.next_serial
+            self.compact_if_needed()
+
+    def remove(self, flight_id: int):
+        with self.lock:
+            self.live.pop(flight_id, None)
+            self.compact_if_needed()
+
+    def is_live(self, index: int) -> bool:
+        return self.live.get(self.flight_ids[index]) == self.serials[index]
+
+    def compact_if_needed(self):
+        """Drop superseded connections once they make up a quarter of the arrays"""
+        if len(self.serials) - len(self.live) <= max(len(self.live) // 4, 64):
+            return
+        keep = [index for index in range(len(self.serials)) if self.is_live(index)]
+        for name in (
+            "dep_stop",
+            "arr_stop",
+            "dep_time",
+            "arr_time",
+            "flight_ids",
+            "serials",
+        ):
+            values = getattr(self, name)
+            setattr(self, name, array(values.typecode, (values[i] for i in keep)))
+        self.numbers = [self.numbers[index] for index in keep]
+
+    def search(
+        self,
+        source: int,
+        destination: int,
+        depart_after: datetime,
+        min_connection: timedelta,
+        max_legs: int,
+        window: timedelta,
+    ) -> list:
+        """
+        Return Pareto optimal itineraries from ``source`` to ``destination``:
+        each one has more legs and an earlier arrival than the one before it.
+        ``window`` bounds the departure of the first leg only
+        """
+        with self.lock:
+            if source not in self.airport_index or destination not in self.airport_index:
+                return []
+            origin = self.airport_index[source]
+            target = self.airport_index[destination]
+            transfer = int(min_connection.total_seconds())
+            first = bisect_left(self.dep_time, to_seconds(depart_after))
+            # only the origin is ready in the first round
+            last = bisect_right(self.dep_time, to_seconds(depart_after + window))
+
+            # ready[stop]: the earliest time a leg may depart from stop
+            ready = {origin: to_seconds(depart_after)}
+            journeys = {origin: ()}
+            best_arrival = UNREACHED
+            itineraries = []
+            for _ in range(max_legs):
+                arrival = {}
+                reached = {}
+                for index in range(first, last):
+                    departure = self.dep_time[index]
+                    if departure > best_arrival:
+                        break
+                    stop = self.dep_stop[index]
+                    if stop not in ready or departure < ready[stop]:
+                        continue
+                    if not self.is_live(index):
+                        continue
+                    to_stop = self.arr_stop[index]
+                    if self.arr_time[index] < arrival.get(to_stop, UNREACHED):
+                        arrival[to_stop] = self.arr_time[index]
+                        reached[to_stop] = journeys[stop] + (index,)
+
+                if not arrival:
+                    break
+                if arrival.get(target, UNREACHED) < best_arrival:
+                    best_arrival = arrival[target]
+                    itineraries.append(self.itinerary(reached[target]))
+
+                ready = {
+                    stop: time_ + transfer
+                    for stop, time_ in arrival.items()
+                    if stop not in (origin, target)
+                }
+                journeys = reached
+                last = len(self.dep_time)
+            return itineraries
+
+    def itinerary(self, indexes) -> Itinerary:
+        return Itinerary(
+            legs=[
+                Leg(
+                    flight=self.flight_ids[index],
+                    number=self.numbers[index],
+                    source=self.airport_ids[self.dep_stop[index]],
+                    destination=self.airport_ids[self.arr_stop[index]],
+                    departure_time=from_seconds(self.dep_time[index]),
+                    arrival_time=from_seconds(self.arr_time[index]),
+                )
+                for index in indexes
+            ]
+        )
+
+
+graph = ConnectionGraph()
+rebuilding = threading.Lock()
+
+
+def get_graph() -> ConnectionGraph:
+    """
+    The graph of this process. Once another process changed flights or it
+    is older than the TTL, one caller loads its replacement while the others
+    keep searching it; an unbuilt or invalidated graph makes every caller
+    wait for the new one
+    """
+    global graph
+    current = graph
+    version = namespace_version(NAMESPACE)
+    ttl = getattr(settings, "ITINERARY_GRAPH_TTL", 600)
+    if (
+        current.built_at is not None
+        and current.version == version
+        and time.monotonic() - current.built_at <= ttl
+    ):
+        return current
+    if not rebuilding.acquire(blocking=current.built_at is None):
+        return current
+    try:
+        if graph is current:
+            fresh = ConnectionGraph()
+            # read before loading: a change made meanwhile rebuilds again
+            fresh.version = version
+            fresh.load()
+            graph = fresh
+    finally:
+        rebuilding.release()
+    return graph
+
+
+def publish(current: ConnectionGraph):
+    """
+    Tell other processes to rebuild. The graph of this one was patched and
+    stays current, unless it had missed an earlier change already
+    """
+    up_to_date = current.version == namespace_version(NAMESPACE)
+    bump_version(NAMESPACE)
+    if up_to_date:
+        current.version = namespace_version(NAMESPACE)
+
+
+def flight_changed(flight):
+    """Patch the graph of this process after a flight was created or updated"""
+    current = graph
+    if current.built_at is not None:
+        route = flight.route
+        current.upsert(
+            flight.id,
+            flight.number,
+            route.source_id,
+            route.destination_id,
+            flight.departure_time,
+            flight.arrival_time,
+        )
+    publish(current)
+
+
+def flight_removed(flight_id: int):
+    current = graph
+    if current.built_at is not None:
+        current.remove(flight_id)
+    publish(current)
+
+
+def invalidate():
+    """Force a rebuild on the next search, e.g. after a route was repointed"""
+    graph.built_at = None
+    bump_version(NAMESPACE)
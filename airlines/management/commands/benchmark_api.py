@@ -0,0 +1,118 @@
+import json
+import random
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+
+from airlines.benchmarks import Runner, Scenario
+from airlines.models import Airport, Flight
+
+
+class Command(BaseCommand):
+    """
+    Django command to benchmark the API in-process with concurrent clients.
+    Seed data first (manage.py seed_data) and raise the throttle rates, e.g.
+    THROTTLE_USER_RATE=1000000/day THROTTLE_ANON_RATE=1000000/day
+    """
+
+    help = "Drive the main endpoints concurrently and write latency stats to JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--concurrency", type=int, default=8)
+        parser.add_argument("--email", default="seed0@example.com")
+        parser.add_argument("--password", default="bench1234")
+        parser.add_argument("--output", default="benchmark.json")
+        parser.add_argument("--label", default="", help="Free text stored in the run")
+        parser.add_argument(
+            "--only", nargs="*", default=None, help="Names of scenarios to run"
+        )
+        parser.add_argument("--random-seed", type=int, default=42)
+
+    def scenarios(self, seed: int) -> list:
+        rng = random.Random(seed)
+        flights = list(
+            Flight.objects.order_by("-id").values_list(
+                "id", "departure_time", "airplane__rows", "airplane__seats_in_row"
+            )[:2000]
+        )
+        cities = list(
+            Airport.objects.order_by("id").values_list("close_big_city", flat=True)[:200]
+        )
+        if not flights or not cities:
+            raise CommandError("No data to benchmark, run manage.py seed_data first")
+
+        def search_params():
+            departure = rng.choice(flights)[1]
+            return {
+                "route": rng.choice(cities),
+                "date_from": departure.strftime("%Y-%m-%d"),
+                "date_to": (departure + timedelta(days=7)).strftime("%Y-%m-%d"),
+            }
+
+        def order_payload():
+            flight_id, _, rows, seats_in_row = rng.choice(flights)
+            return {
+                "tickets": [
+                    {
+                        "flight": flight_id,
+                        "row": rng.randint(1, rows),
+                        "seat": rng.randint(1, seats_in_row),
+                    }
+                ]
+            }
+
+        return [
+            Scenario("flights-list", "GET", "/api/airlines/flights/"),
+            Scenario(
+                "flights-search", "GET", "/api/airlines/flights/", params=search_params
+            ),
+            Scenario("routes-list", "GET", "/api/airlines/routes/"),
+            Scenario("orders-list", "GET", "/api/airlines/orders/"),
+            Scenario("orders-create", "POST", "/api/airlines/orders/", order_payload),
+            Scenario(
+                "jwt-login",
+                "POST",
+                "/api/user/token/",
+                {"email": self.email, "password": self.password},
+                authenticated=False,
+            ),
+        ]
+
+    def handle(self, *args, **options):
+        self.email = options["email"]
+        self.password = options["password"]
+        runner = Runner(self.email, self.password, options["concurrency"])
+        scenarios = self.scenarios(options["random_seed"])
+        if options["only"]:
+            scenarios = [s for s in scenarios if s.name in options["only"]]
+
+        run = {
+            "meta": {
+                "label": options["label"],
+                "started_at": datetime.now().isoformat(timespec="seconds"),
+                "requests_per_endpoint": options["requests"],
+                "concurrency": options["concurrency"],
+                "database": connection.vendor,
+                "debug": settings.DEBUG,
+            },
+            "endpoints": {},
+        }
+        for scenario in scenarios:
+            result = runner.run(scenario, options["requests"])
+            stats = result.as_dict()
+            run["endpoints"][scenario.name] = stats
+            latency = stats["latency_ms"]
+            self.stdout.write(
+                f"{scenario.name:<16} p50 {latency['p50']:>8.2f} ms  "
+                f"p95 {latency['p95']:>8.2f} ms  p99 {latency['p99']:>8.2f} ms  "
+                f"{stats['throughput_rps']:>8.1f} req/s  "
+                f"{stats['queries']['mean']:>5.1f} queries  "
+                f"{stats['errors']} errors"
+            )
+
+        with open(options["output"], "w") as output:
+            json.dump(run, output, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
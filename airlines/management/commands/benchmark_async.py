@@ -0,0 +1,140 @@
+import json
+import random
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from airlines.benchmarks import AsyncRunner, Runner, Scenario
+from airlines.models import Airport, Flight
+
+
+class Command(BaseCommand):
+    """
+    Django command to compare the sync flight and route searches, served
+    WSGI style with one worker thread per concurrent request, against their
+    async twins served by the ASGI handler from a single event loop.
+    Seed data and raise the throttle rates first, as for benchmark_api
+    """
+
+    help = "Compare sync (WSGI) and async (ASGI) search endpoints under concurrency"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=400)
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument("--email", default="seed0@example.com")
+        parser.add_argument("--password", default="bench1234")
+        parser.add_argument("--output", default="benchmark-async.json")
+        parser.add_argument("--label", default="", help="Free text stored in the run")
+        parser.add_argument(
+            "--only", nargs="*", default=None, help="Names of scenarios to run"
+        )
+        parser.add_argument(
+            "--response-cache",
+            action="store_true",
+            help="Keep the sync flight response cache, the async views have none",
+        )
+        parser.add_argument("--random-seed", type=int, default=42)
+
+    def scenarios(self, seed: int) -> list:
+        rng = random.Random(seed)
+        flights = list(
+            Flight.objects.order_by("-id").values_list("id", "departure_time")[:2000]
+        )
+        cities = list(
+            Airport.objects.order_by("id").values_list("close_big_city", flat=True)[
+                :200
+            ]
+        )
+        if not flights or not cities:
+            raise CommandError("No data to benchmark, run manage.py seed_data first")
+
+        def search_params():
+            departure = rng.choice(flights)[1]
+            return {
+                "route": rng.choice(cities),
+                "date_from": departure.strftime("%Y-%m-%d"),
+                "date_to": (departure + timedelta(days=7)).strftime("%Y-%m-%d"),
+            }
+
+        def route_params():
+            return {"source": rng.choice(cities)}
+
+        def detail_path(prefix):
+            return lambda: f"{prefix}{rng.choice(flights)[0]}/"
+
+        sync, native = "/api/airlines/", "/api/airlines/async/"
+        return [
+            ("flights-list", f"{sync}flights/", f"{native}flights/", None),
+            ("flights-search", f"{sync}flights/", f"{native}flights/", search_params),
+            (
+                "flight-detail",
+                detail_path(f"{sync}flights/"),
+                detail_path(f"{native}flights/"),
+                None,
+            ),
+            ("routes-search", f"{sync}routes/", f"{native}routes/", route_params),
+        ]
+
+    def handle(self, *args, **options):
+        pairs = self.scenarios(options["random_seed"])
+        if options["only"]:
+            pairs = [pair for pair in pairs if pair[0] in options["only"]]
+
+        concurrency = options["concurrency"]
+        runner = Runner(options["email"], options["password"], concurrency)
+        async_runner = AsyncRunner(runner.token, concurrency)
+
+        run = {
+            "meta": {
+                "label": options["label"],
+                "started_at": datetime.now().isoformat(timespec="seconds"),
+                "requests_per_endpoint": options["requests"],
+                "concurrency": concurrency,
+                "database": connection.vendor,
+                "debug": settings.DEBUG,
+            },
+            "endpoints": {},
+        }
+        caches = settings.CACHES
+        if not options["response_cache"]:
+            caches = {
+                **caches,
+                settings.RESPONSE_CACHE_ALIAS: {
+                    "BACKEND": "django.core.cache.backends.dummy.DummyCache"
+                },
+            }
+
+        with override_settings(CACHES=caches):
+            for name, sync_path, async_path, params in pairs:
+                wsgi = runner.run(
+                    Scenario(f"{name}-wsgi", "GET", sync_path, params=params),
+                    options["requests"],
+                )
+                asgi = async_runner.run(
+                    Scenario(f"{name}-asgi", "GET", async_path, params=params),
+                    options["requests"],
+                )
+                throughput = []
+                for result in (wsgi, asgi):
+                    stats = result.as_dict()
+                    run["endpoints"][result.scenario.name] = stats
+                    throughput.append(stats["throughput_rps"])
+                    self.write(result.scenario.name, stats)
+
+                speedup = throughput[1] / max(throughput[0], 0.01)
+                self.stdout.write(f"{'':<20} asgi/wsgi throughput x{speedup:.2f}")
+
+        with open(options["output"], "w") as output:
+            json.dump(run, output, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    def write(self, name: str, stats: dict):
+        latency = stats["latency_ms"]
+        self.stdout.write(
+            f"{name:<20} p50 {latency['p50']:>8.2f} ms  "
+            f"p95 {latency['p95']:>8.2f} ms  p99 {latency['p99']:>8.2f} ms  "
+            f"{stats['throughput_rps']:>8.1f} req/s  {stats['errors']} errors"
+        )
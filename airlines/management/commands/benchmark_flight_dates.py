@@ -0,0 +1,102 @@
+import time
+from datetime import datetime, timedelta
+
+from django.core.management import BaseCommand
+from django.db.models import F
+
+from airlines.models import Airplane, AirplaneType, Airport, Flight, Route
+
+
+class Command(BaseCommand):
+    """
+    Django command to compare query plans of the old function-wrapped date
+    filter (departure_time__date=) with the half-open range filters used by
+    the flight search
+    """
+
+    help = "Show query plans and timings for flight date filters"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Insert this many synthetic flights before measuring",
+        )
+        parser.add_argument("--date", default="2024-03-15")
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        if options["seed"]:
+            self.seed(options["seed"])
+
+        day = datetime.strptime(options["date"], "%Y-%m-%d")
+        queryset = Flight.objects.annotate(
+            tickets_available=(
+                F("airplane__rows") * F("airplane__seats_in_row") - F("tickets_sold")
+            )
+        ).order_by("departure_time", "id")
+        cases = {
+            "departure_time__date (before)": queryset.filter(
+                departure_time__date=day.date()
+            ),
+            "departure_time range (after)": queryset.filter(
+                departure_time__gte=day, departure_time__lt=day + timedelta(days=1)
+            ),
+            "arrival_time range": queryset.filter(
+                arrival_time__gte=day, arrival_time__lt=day + timedelta(days=1)
+            ),
+        }
+
+        self.stdout.write(f"Flights in table: {Flight.objects.count()}")
+        for name, case in cases.items():
+            timings = []
+            for _ in range(options["repeat"]):
+                start = time.perf_counter()
+                list(case[:20])
+                timings.append((time.perf_counter() - start) * 1000)
+            self.stdout.write(self.style.MIGRATE_HEADING(f"\n{name}"))
+            self.stdout.write(case[:20].explain())
+            self.stdout.write(
+                f"best of {options['repeat']}: {min(timings):.2f} ms "
+                f"(first page of 20)"
+            )
+
+    def seed(self, count: int, batch_size: int = 10000):
+        airplane_type, _ = AirplaneType.objects.get_or_create(name="Benchmark")
+        airplane, _ = Airplane.objects.get_or_create(
+            name="Benchmark",
+            defaults={"rows": 30, "seats_in_row": 6, "airplane_type": airplane_type},
+        )
+        airports = [
+            Airport.objects.get_or_create(
+                name=f"Benchmark {index}", defaults={"close_big_city": f"City {index}"}
+            )[0]
+            for index in range(10)
+        ]
+        routes = [
+            Route.objects.get_or_create(source=source, destination=destination)[0]
+            for source in airports
+            for destination in airports
+            if source != destination
+        ]
+
+        start = datetime(2023, 1, 1)
+        step = timedelta(minutes=1)
+        batch = []
+        for index in range(count):
+            departure = start + step * index
+            batch.append(
+                Flight(
+                    number=f"BM{index % 10000}",
+                    route=routes[index % len(routes)],
+                    airplane=airplane,
+                    departure_time=departure,
+                    arrival_time=departure + timedelta(hours=2),
+                )
+            )
+            if len(batch) == batch_size:
+                Flight.objects.bulk_create(batch)
+                batch = []
+        Flight.objects.bulk_create(batch)
+        self.stdout.write(self.style.SUCCESS(f"Seeded {count} flights"))
@@ -0,0 +1,107 @@
+import io
+import time
+from datetime import datetime, timedelta
+
+from django.core.management import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from airlines.models import Airplane, Airport, Flight, Route
+from airlines.renderers import FastJSONParser, FastJSONRenderer, orjson
+from airlines.serializers import FlightListSerializer
+
+
+class Command(BaseCommand):
+    """
+    Django command to compare the stock DRF JSON renderer and parser with
+    the orjson backed ones on FlightListSerializer output
+    """
+
+    help = "Microbenchmark JSON rendering of flight list pages"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--page-size", type=int, default=100)
+        parser.add_argument("--repeat", type=int, default=200)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(
+                self.style.WARNING(
+                    "orjson is not installed, both sides use stdlib json"
+                )
+            )
+
+        flights = self.flights(options["page_size"])
+        data = FlightListSerializer(flights, many=True).data
+        payload = JSONRenderer().render(data)
+        repeat = options["repeat"]
+
+        self.stdout.write(
+            f"{options['page_size']} flights, {len(payload)} bytes, best of {repeat}"
+        )
+        cases = [
+            ("serialize", lambda: FlightListSerializer(flights, many=True).data, None),
+            (
+                "render",
+                lambda: JSONRenderer().render(data),
+                lambda: FastJSONRenderer().render(data),
+            ),
+            (
+                "serialize + render",
+                lambda: JSONRenderer().render(
+                    FlightListSerializer(flights, many=True).data
+                ),
+                lambda: FastJSONRenderer().render(
+                    FlightListSerializer(flights, many=True).data
+                ),
+            ),
+            (
+                "parse",
+                lambda: JSONParser().parse(io.BytesIO(payload)),
+                lambda: FastJSONParser().parse(io.BytesIO(payload)),
+            ),
+        ]
+        for name, stock, fast in cases:
+            stock_ms = self.best(stock, repeat)
+            if fast is None:
+                self.stdout.write(f"{name:<20} {stock_ms:8.3f} ms")
+                continue
+            fast_ms = self.best(fast, repeat)
+            self.stdout.write(
+                f"{name:<20} stock {stock_ms:8.3f} ms  fast {fast_ms:8.3f} ms  "
+                f"x{stock_ms / fast_ms:.1f}"
+            )
+
+    @staticmethod
+    def best(function, repeat: int) -> float:
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            function()
+            timings.append((time.perf_counter() - started) * 1000)
+        return min(timings)
+
+    @staticmethod
+    def flights(count: int) -> list:
+        """Unsaved flights shaped like a list page, the database is not touched"""
+        airplane = Airplane(id=1, name="Benchmark", rows=30, seats_in_row=6)
+        start = datetime(2024, 3, 15, 6, 0)
+        flights = []
+        for index in range(count):
+            route = Route(
+                id=index,
+                source=Airport(id=index * 2, name=f"Airport {index}"),
+                destination=Airport(id=index * 2 + 1, name=f"Airport {index + 1}"),
+            )
+            departure = start + timedelta(minutes=15 * index)
+            flight = Flight(
+                id=index,
+                number=f"BM{index}",
+                route=route,
+                airplane=airplane,
+                departure_time=departure,
+                arrival_time=departure + timedelta(hours=2),
+            )
+            flight.tickets_available = 180 - index % 180
+            flights.append(flight)
+        return flights
@@ -0,0 +1,122 @@
+from django.core.management import BaseCommand, CommandError
+
+from airlines.benchmarks import bucket_labels, load_run
+from airlines.task import histogram
+
+PERCENTILES = ("p50", "p95", "p99")
+
+
+class Command(BaseCommand):
+    """
+    Django command to print latency distributions of a recorded run and to
+    compare it with a baseline. Runs are benchmark_api JSON files or saved
+    /metrics scrapes. Exits non-zero when an endpoint regressed past the
+    thresholds, so it can gate CI
+    """
+
+    help = "Report a benchmark run and compare it against a baseline run"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "runs",
+            nargs="+",
+            metavar="RUN",
+            help="A run to report on, or a baseline run followed by the current one",
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=10.0,
+            help="Allowed p50/p95/p99 growth in percent",
+        )
+        parser.add_argument(
+            "--min-delta-ms",
+            type=float,
+            default=1.0,
+            help="Latency growth below this many ms is noise, never a regression",
+        )
+        parser.add_argument(
+            "--query-threshold",
+            type=float,
+            default=0.0,
+            help="Allowed growth of the mean SQL queries per request",
+        )
+        parser.add_argument("--no-histograms", action="store_true")
+
+    def handle(self, *args, **options):
+        runs = options["runs"]
+        if len(runs) > 2:
+            raise CommandError("Pass one run, or a baseline and a current run")
+        current = self.load(runs[-1])
+        baseline = self.load(runs[0]) if len(runs) == 2 else None
+
+        regressions = []
+        for name in sorted(set(current) | set(baseline or {})):
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            after = current.get(name)
+            before = baseline.get(name) if baseline is not None else None
+            if after is None:
+                self.stdout.write("  missing from the current run")
+                continue
+
+            if before is None:
+                for key in PERCENTILES:
+                    self.stdout.write(f"  {key:<8}{after[key]:>10.2f} ms")
+                self.stdout.write(f"  queries {after['queries']:>10.2f}")
+            else:
+                problems = self.compare(before, after, options)
+                if problems:
+                    regressions.append(name)
+                    for problem in problems:
+                        self.stdout.write(self.style.ERROR(f"  REGRESSION {problem}"))
+
+            if not options["no_histograms"] and after["requests"]:
+                self.stdout.write(self.histogram(after["histogram"]))
+
+        if regressions:
+            raise CommandError(
+                f"{len(regressions)} endpoint(s) regressed: {', '.join(regressions)}"
+            )
+        if baseline is not None:
+            self.stdout.write(self.style.SUCCESS("No regressions"))
+
+    @staticmethod
+    def histogram(counts: list) -> str:
+        """Bars from the fastest to the slowest non-empty bucket"""
+        used = [index for index, count in enumerate(counts) if count]
+        if not used:
+            return ""
+        first, last = used[0], used[-1] + 1
+        return histogram(counts[first:last], bucket_labels()[first:last], width=40)
+
+    def load(self, path: str) -> dict:
+        try:
+            return load_run(path)
+        except (OSError, ValueError, KeyError) as error:
+            raise CommandError(f"Cannot read run {path}: {error}")
+
+    def compare(self, before: dict, after: dict, options) -> list:
+        problems = []
+        for key in PERCENTILES:
+            old, new = before[key], after[key]
+            if not old:
+                self.stdout.write(
+                    f"  {key:<8}{'-':>10} -> {new:>10.2f} ms  no baseline"
+                )
+                continue
+            delta = new - old
+            percent = delta / old * 100
+            self.stdout.write(
+                f"  {key:<8}{old:>10.2f} -> {new:>10.2f} ms  "
+                f"{delta:+9.2f} ms {percent:+7.1f}%"
+            )
+            if delta > options["min_delta_ms"] and percent > options["threshold"]:
+                problems.append(f"{key} {percent:+.1f}% ({delta:+.2f} ms)")
+
+        old, new = before["queries"], after["queries"]
+        self.stdout.write(
+            f"  queries {old:>10.2f} -> {new:>10.2f}     {new - old:+9.2f}"
+        )
+        if new - old > options["query_threshold"]:
+            problems.append(f"queries {old:g} -> {new:g}")
+        return problems
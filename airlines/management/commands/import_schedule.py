@@ -0,0 +1,310 @@
+import csv
+import json
+import sys
+import time
+from functools import partial
+from itertools import islice
+from pathlib import Path
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connections, router, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from airlines import availability, itinerary, seatmap
+from airlines.cache import bump_namespace
+from airlines.models import Airplane, Airport, Flight, Route
+from airlines.signals import destinations_changed
+
+FIELDS = (
+    "number",
+    "source",
+    "destination",
+    "airplane",
+    "departure_time",
+    "arrival_time",
+)
+UPDATED_FIELDS = ("route_id", "airplane_id", "arrival_time")
+FORMATS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+
+
+class RowError(ValueError):
+    pass
+
+
+def update_flights(updates: dict):
+    """
+    Save {flight id: {field name: value}}, all with the same fields, through
+    one UPDATE statement run by executemany. bulk_update spends
+    milliseconds per row compiling its CASE expressions
+    """
+    if not updates:
+        return
+    connection = connections[router.db_for_write(Flight)]
+    quote = connection.ops.quote_name
+    fields = [Flight._meta.get_field(name) for name in next(iter(updates.values()))]
+    assignments = ", ".join(f"{quote(field.column)} = %s" for field in fields)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"UPDATE {quote(Flight._meta.db_table)} SET {assignments} WHERE id = %s",
+            [
+                (
+                    *(
+                        field.get_db_prep_save(values[field.attname], connection)
+                        for field in fields
+                    ),
+                    flight_id,
+                )
+                for flight_id, values in updates.items()
+            ],
+        )
+
+
+class Command(BaseCommand):
+    """
+    Django command to load an airline schedule. Reads CSV (with a header
+    row) or NDJSON with the columns number, source, destination (airport
+    names), airplane (name), departure_time and arrival_time (ISO 8601).
+    Rows are read, validated and written a chunk at a time, so memory does
+    not grow with the file; a flight with the same number and departure
+    time is updated instead of inserted, unless nothing changed. Every
+    chunk commits on its own
+    """
+
+    help = "Import flights from a CSV or NDJSON schedule file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Schedule file, - for stdin")
+        parser.add_argument("--format", choices=("csv", "ndjson"), default=None)
+        parser.add_argument("--chunk-size", type=int, default=2000)
+        parser.add_argument(
+            "--create-routes",
+            action="store_true",
+            help="Create missing routes instead of rejecting their flights",
+        )
+        parser.add_argument(
+            "--max-errors",
+            type=int,
+            default=100,
+            help="Stop after this many rejected rows",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Only validate")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = options["format"] or FORMATS.get(Path(path).suffix.lower())
+        if file_format is None:
+            raise CommandError("Cannot tell the file format, pass --format")
+
+        self.create_routes = options["create_routes"]
+        self.dry_run = options["dry_run"]
+        self.load_lookups()
+        self.route_sources = set()
+        self.counts = dict.fromkeys(
+            ("rows", "created", "updated", "unchanged", "rejected"), 0
+        )
+        started = time.perf_counter()
+
+        stream = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8")
+        try:
+            rows = self.read_rows(stream, file_format)
+            while chunk := list(islice(rows, options["chunk_size"])):
+                flights = self.validate(chunk, options["max_errors"])
+                if not self.dry_run:
+                    self.write(flights)
+                self.report(started)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+            if self.counts["created"] or self.counts["updated"]:
+                self.changed()
+
+        self.stdout.write(self.style.SUCCESS("Checked" if self.dry_run else "Imported"))
+
+    def load_lookups(self):
+        """Reference data is small next to a schedule, keep all of it at hand"""
+        self.airports = dict(Airport.objects.values_list("name", "id"))
+        self.airplanes, self.ambiguous_airplanes = {}, set()
+        for airplane_id, name in Airplane.objects.values_list("id", "name"):
+            if name in self.airplanes:
+                self.ambiguous_airplanes.add(name)
+            self.airplanes[name] = airplane_id
+        self.routes = {}
+        for route_id, source_id, destination_id in (
+            Route.objects.order_by("-id")
+            .values_list("id", "source_id", "destination_id")
+            .iterator()
+        ):
+            self.routes[(source_id, destination_id)] = route_id
+
+    def read_rows(self, stream, file_format):
+        """Yields (line number, row dict or None when unreadable)"""
+        if file_format == "csv":
+            reader = csv.DictReader(stream)
+            missing = set(FIELDS) - set(reader.fieldnames or ())
+            if missing:
+                raise CommandError(f"Missing columns: {', '.join(sorted(missing))}")
+            for row in reader:
+                yield reader.line_num, row
+            return
+
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield line_number, row if isinstance(row, dict) else None
+
+    def validate(self, chunk: list, max_errors: int) -> dict:
+        """Flight values by (number, departure_time); the last row wins"""
+        flights, missing_routes = {}, set()
+        for line_number, row in chunk:
+            self.counts["rows"] += 1
+            try:
+                key, values = self.parse(row)
+            except RowError as error:
+                self.reject(line_number, error, max_errors)
+                continue
+            flights[key] = values
+            if values["route"] not in self.routes:
+                missing_routes.add(values["route"])
+
+        if missing_routes and not self.dry_run:
+            self.add_routes(missing_routes)
+        for values in flights.values():
+            values["route_id"] = self.routes.get(values.pop("route"))
+        return flights
+
+    def parse(self, row):
+        if row is None:
+            raise RowError("not a JSON object")
+
+        number = str(row.get("number") or "").strip()
+        if not number or len(number) > Flight._meta.get_field("number").max_length:
+            raise RowError(f"invalid flight number {number!r}")
+
+        source = self.airport_id(row.get("source"))
+        destination = self.airport_id(row.get("destination"))
+        if source == destination:
+            raise RowError("source and destination are the same airport")
+
+        airplane = str(row.get("airplane") or "").strip()
+        if airplane in self.ambiguous_airplanes:
+            raise RowError(f"more than one airplane is named {airplane!r}")
+        if airplane not in self.airplanes:
+            raise RowError(f"unknown airplane {airplane!r}")
+
+        departure = self.parse_time(row.get("departure_time"), "departure_time")
+        arrival = self.parse_time(row.get("arrival_time"), "arrival_time")
+        if arrival <= departure:
+            raise RowError("arrival_time must be after departure_time")
+
+        if (source, destination) not in self.routes and not self.create_routes:
+            raise RowError(f"no route from {row['source']!r} to {row['destination']!r}")
+
+        return (number, departure), {
+            "route": (source, destination),
+            "airplane_id": self.airplanes[airplane],
+            "arrival_time": arrival,
+        }
+
+    def airport_id(self, name) -> int:
+        name = str(name or "").strip()
+        if name not in self.airports:
+            raise RowError(f"unknown airport {name!r}")
+        return self.airports[name]
+
+    @staticmethod
+    def parse_time(value, field: str):
+        try:
+            parsed = parse_datetime(str(value or "").strip())
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise RowError(f"invalid {field} {value!r}")
+        if timezone.is_aware(parsed):
+            parsed = timezone.make_naive(parsed)
+        return parsed
+
+    def reject(self, line_number, error, max_errors: int):
+        self.counts["rejected"] += 1
+        where = f"line {line_number}: " if line_number is not None else ""
+        self.stderr.write(f"{where}{error}")
+        if self.counts["rejected"] > max_errors:
+            raise CommandError(
+                f"More than {max_errors} rejected rows, stopping; "
+                f"{self.counts['created']} created and "
+                f"{self.counts['updated']} updated flights are kept"
+            )
+
+    def add_routes(self, pairs):
+        routes = Route.objects.bulk_create(
+            [Route(source_id=source, destination_id=dest) for source, dest in pairs]
+        )
+        for route in routes:
+            self.routes[(route.source_id, route.destination_id)] = route.id
+            self.route_sources.add(route.source_id)
+
+    def write(self, flights: dict):
+        numbers = {number for number, _ in flights}
+        departures = {departure for _, departure in flights}
+        existing = {}
+        # the lowest id wins where a schedule was imported twice before
+        for flight_id, number, departure, *values in (
+            Flight.objects.filter(number__in=numbers, departure_time__in=departures)
+            .order_by("-id")
+            .values_list("id", "number", "departure_time", *UPDATED_FIELDS)
+        ):
+            existing[(number, departure)] = (
+                flight_id,
+                dict(zip(UPDATED_FIELDS, values)),
+            )
+
+        now = timezone.now()
+        created, updated, resized, unchanged = [], {}, [], 0
+        route_days = set()
+        for key, values in flights.items():
+            if key not in existing:
+                created.append(Flight(number=key[0], departure_time=key[1], **values))
+                route_days.add((values["route_id"], key[1].date()))
+                continue
+            flight_id, stored = existing[key]
+            if stored == values:
+                unchanged += 1
+                continue
+            updated[flight_id] = {**values, "updated_at": now}
+            route_days.add((values["route_id"], key[1].date()))
+            route_days.add((stored["route_id"], key[1].date()))
+            if stored["airplane_id"] != values["airplane_id"]:
+                resized.append(flight_id)
+
+        with transaction.atomic():
+            Flight.objects.bulk_create(created)
+            update_flights(updated)
+            availability.recount(*route_days)
+            for flight_id in resized:
+                transaction.on_commit(partial(seatmap.invalidate_seat_map, flight_id))
+
+        self.counts["created"] += len(created)
+        self.counts["updated"] += len(updated)
+        self.counts["unchanged"] += unchanged
+
+    def changed(self):
+        """What the Flight and Route signals would have done, once"""
+        if self.route_sources:
+            destinations_changed(*self.route_sources)
+        bump_namespace("flights")
+        itinerary.invalidate()
+
+    def report(self, started: float):
+        elapsed = time.perf_counter() - started
+        counts = self.counts
+        rate = counts["rows"] / elapsed if elapsed else counts["rows"]
+        self.stdout.write(
+            f"{counts['rows']} rows: {counts['created']} created, "
+            f"{counts['updated']} updated, {counts['unchanged']} unchanged, "
+            f"{counts['rejected']} rejected "
+            f"in {elapsed:.1f}s ({rate:,.0f} rows/s)"
+        )
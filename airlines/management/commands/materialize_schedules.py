@@ -0,0 +1,51 @@
+from datetime import timedelta
+
+from django.core.management import BaseCommand
+from django.utils import timezone
+
+from airlines import availability, itinerary, schedules
+from airlines.cache import bump_namespace
+from airlines.models import Flight
+
+
+class Command(BaseCommand):
+    """
+    Django command to store the flights schedules generate over the next
+    days, run daily to keep a rolling window. Searches merge in virtual
+    flights without it; itineraries only see stored flights
+    """
+
+    help = "Store the flights of all schedules departing in the next days"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=14)
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        start = timezone.now()
+        end = start + timedelta(days=options["days"])
+        flights = [
+            Flight(
+                number=flight.number,
+                route_id=flight.route_id,
+                airplane_id=flight.airplane_id,
+                departure_time=flight.departure_time,
+                arrival_time=flight.arrival_time,
+                schedule_id=flight.schedule_id,
+            )
+            for flight in schedules.virtual_flights(start, end)
+        ]
+        # a flight booked meanwhile already has its row
+        Flight.objects.bulk_create(
+            flights, batch_size=options["batch_size"], ignore_conflicts=True
+        )
+
+        if flights:
+            availability.recount(
+                *((flight.route_id, flight.departure_time.date()) for flight in flights)
+            )
+            bump_namespace("flights")
+            itinerary.invalidate()
+        self.stdout.write(
+            self.style.SUCCESS(f"Materialized {len(flights)} scheduled flights")
+        )
@@ -0,0 +1,57 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+
+from airlines.availability import day_totals
+from airlines.models import Flight, RouteDay
+
+
+class Command(BaseCommand):
+    """Django command to verify or rebuild the per-route daily availability"""
+
+    help = "Verify or rebuild the RouteDay rollup behind the route calendars"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report days with wrong totals, exit 1 if any",
+        )
+
+    def handle(self, *args, **options):
+        actual = day_totals(Flight.objects.all())
+
+        if options["check"]:
+            stored = {
+                (route_id, day): (flights, seats_left)
+                for route_id, day, flights, seats_left in RouteDay.objects.values_list(
+                    "route_id", "day", "flights", "seats_left"
+                ).iterator()
+            }
+            drifted = sorted(
+                key
+                for key in stored.keys() | actual.keys()
+                if stored.get(key) != actual.get(key)
+            )
+            for route_id, day in drifted:
+                self.stdout.write(
+                    f"Route {route_id} on {day}: "
+                    f"stored {stored.get((route_id, day))}, "
+                    f"actual {actual.get((route_id, day))}"
+                )
+            if drifted:
+                raise CommandError(f"{len(drifted)} route day(s) out of sync")
+            self.stdout.write(self.style.SUCCESS("All route days are in sync"))
+            return
+
+        with transaction.atomic():
+            RouteDay.objects.all().delete()
+            RouteDay.objects.bulk_create(
+                [
+                    RouteDay(
+                        route_id=route_id, day=day, flights=flights, seats_left=seats
+                    )
+                    for (route_id, day), (flights, seats) in actual.items()
+                ],
+                batch_size=1000,
+            )
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(actual)} route days"))
@@ -0,0 +1,48 @@
+from django.core.management import BaseCommand, CommandError
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from airlines.models import Flight, Ticket
+
+
+class Command(BaseCommand):
+    """Django command to verify or rebuild the Flight.tickets_sold counters"""
+
+    help = "Verify or rebuild the denormalized Flight.tickets_sold counters"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report flights with a wrong counter, exit 1 if any",
+        )
+
+    def handle(self, *args, **options):
+        sold = (
+            Ticket.objects.filter(flight=OuterRef("pk"))
+            .order_by()
+            .values("flight")
+            .annotate(total=Count("id"))
+            .values("total")
+        )
+        actual = Coalesce(Subquery(sold), 0)
+
+        if options["check"]:
+            drifted = (
+                Flight.objects.annotate(actual_sold=actual)
+                .exclude(tickets_sold=F("actual_sold"))
+                .values_list("id", "tickets_sold", "actual_sold")
+            )
+            drifted_count = 0
+            for flight_id, stored, counted in drifted.iterator():
+                drifted_count += 1
+                self.stdout.write(
+                    f"Flight {flight_id}: stored {stored}, actual {counted}"
+                )
+            if drifted_count:
+                raise CommandError(f"{drifted_count} flight counter(s) out of sync")
+            self.stdout.write(self.style.SUCCESS("All flight counters are in sync"))
+            return
+
+        updated = Flight.objects.update(tickets_sold=actual)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt counters for {updated} flights"))
@@ -0,0 +1,228 @@
+import random
+import time
+from datetime import datetime, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, call_command
+from django.db import transaction
+
+from airlines import itinerary
+from airlines.cache import bump_namespace
+from airlines.models import (
+    Airplane,
+    AirplaneType,
+    Airport,
+    Flight,
+    Order,
+    Route,
+    Ticket,
+)
+
+CITIES = (
+    "London",
+    "Paris",
+    "Rome",
+    "Madrid",
+    "Berlin",
+    "Vienna",
+    "Prague",
+    "Warsaw",
+    "Kyiv",
+    "Lviv",
+    "Riga",
+    "Oslo",
+    "Lisbon",
+    "Athens",
+    "Nice",
+    "Glasgow",
+    "São Paulo",
+    "New York",
+    "Tokyo",
+    "Kraków",
+)
+
+
+class Command(BaseCommand):
+    """Django command to fill the database with a synthetic airline dataset"""
+
+    help = "Seed airports, routes, airplanes, flights and tickets with bulk inserts"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--airports", type=int, default=100)
+        parser.add_argument("--routes", type=int, default=1000)
+        parser.add_argument("--airplanes", type=int, default=50)
+        parser.add_argument("--flights", type=int, default=100000)
+        parser.add_argument(
+            "--tickets-per-flight",
+            type=int,
+            default=10,
+            help="Seats sold on every flight (capped by airplane capacity)",
+        )
+        parser.add_argument("--users", type=int, default=100)
+        parser.add_argument("--days", type=int, default=365)
+        parser.add_argument("--start", default=None, help="YYYY-MM-DD, default today")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--random-seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options["random_seed"])
+        self.batch_size = options["batch_size"]
+        started = time.perf_counter()
+
+        airports = self.seed_airports(options["airports"])
+        routes = self.seed_routes(airports, options["routes"])
+        airplanes = self.seed_airplanes(options["airplanes"])
+        users = self.seed_users(options["users"])
+        start = (
+            datetime.strptime(options["start"], "%Y-%m-%d")
+            if options["start"]
+            else datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        )
+        self.seed_flights(
+            routes,
+            airplanes,
+            users,
+            options["flights"],
+            options["tickets_per_flight"],
+            start,
+            options["days"],
+        )
+
+        call_command("rebuild_route_calendar", stdout=self.stdout)
+        bump_namespace("flights")
+        itinerary.invalidate()
+        self.stdout.write(
+            self.style.SUCCESS(f"Done in {time.perf_counter() - started:.1f}s")
+        )
+
+    def report(self, label: str, count: int, started: float):
+        elapsed = time.perf_counter() - started
+        rate = count / elapsed if elapsed else count
+        self.stdout.write(f"{label}: {count} in {elapsed:.1f}s ({rate:,.0f}/s)")
+
+    def seed_airports(self, count: int) -> list:
+        started = time.perf_counter()
+        offset = Airport.objects.count()
+        airports = []
+        for index in range(count):
+            city = CITIES[index % len(CITIES)]
+            if index >= len(CITIES):
+                city = f"{city} {index // len(CITIES)}"
+            airports.append(
+                Airport(
+                    name=f"Seed airport {offset + index}",
+                    close_big_city=city,
+                )
+            )
+        airports = Airport.objects.bulk_create(airports, batch_size=self.batch_size)
+        self.report("Airports", len(airports), started)
+        return airports
+
+    def seed_routes(self, airports: list, count: int) -> list:
+        started = time.perf_counter()
+        pairs = set()
+        count = min(count, len(airports) * (len(airports) - 1))
+        while len(pairs) < count:
+            source, destination = self.random.sample(airports, 2)
+            pairs.add((source.id, destination.id))
+        routes = Route.objects.bulk_create(
+            [
+                Route(source_id=source, destination_id=destination)
+                for source, destination in pairs
+            ],
+            batch_size=self.batch_size,
+        )
+        self.report("Routes", len(routes), started)
+        return routes
+
+    def seed_airplanes(self, count: int) -> list:
+        started = time.perf_counter()
+        airplane_types = AirplaneType.objects.bulk_create(
+            [AirplaneType(name=name) for name in ("Narrow-body", "Wide-body")]
+        )
+        airplanes = Airplane.objects.bulk_create(
+            [
+                Airplane(
+                    name=f"Seed airplane {index}",
+                    rows=self.random.randint(20, 40),
+                    seats_in_row=self.random.choice((4, 6, 9)),
+                    airplane_type=self.random.choice(airplane_types),
+                )
+                for index in range(count)
+            ]
+        )
+        self.report("Airplanes", len(airplanes), started)
+        return airplanes
+
+    def seed_users(self, count: int) -> list:
+        started = time.perf_counter()
+        user_model = get_user_model()
+        template = user_model(email="template@example.com")
+        template.set_password("bench1234")
+        offset = user_model.objects.count()
+        users = user_model.objects.bulk_create(
+            [
+                user_model(
+                    email=f"seed{offset + index}@example.com",
+                    password=template.password,
+                )
+                for index in range(count)
+            ],
+            batch_size=self.batch_size,
+        )
+        self.report("Users (password bench1234)", len(users), started)
+        return users
+
+    def seed_flights(
+        self, routes, airplanes, users, count, tickets_per_flight, start, days
+    ):
+        started = time.perf_counter()
+        window = days * 24 * 60
+        created = tickets = 0
+        while created < count:
+            size = min(self.batch_size, count - created)
+            flights = []
+            for index in range(created, created + size):
+                airplane = self.random.choice(airplanes)
+                departure = start + timedelta(minutes=self.random.randrange(window))
+                flights.append(
+                    Flight(
+                        number=f"SD{index}",
+                        route=self.random.choice(routes),
+                        airplane=airplane,
+                        departure_time=departure,
+                        arrival_time=departure
+                        + timedelta(minutes=self.random.randint(45, 720)),
+                        tickets_sold=(
+                            min(tickets_per_flight, airplane.capacity) if users else 0
+                        ),
+                    )
+                )
+
+            with transaction.atomic():
+                flights = Flight.objects.bulk_create(flights)
+                tickets += self.seed_tickets(flights, users)
+            created += size
+            self.report("Flights", created, started)
+        self.report("Tickets", tickets, started)
+
+    def seed_tickets(self, flights: list, users: list) -> int:
+        if not users:
+            return 0
+        orders = Order.objects.bulk_create(
+            [Order(user=self.random.choice(users)) for _ in flights]
+        )
+        tickets = []
+        for flight, order in zip(flights, orders):
+            seats_in_row = flight.airplane.seats_in_row
+            for index in range(flight.tickets_sold):
+                tickets.append(
+                    Ticket(
+                        flight=flight,
+                        order=order,
+                        row=index // seats_in_row + 1,
+                        seat=index % seats_in_row + 1,
+                    )
+                )
+        Ticket.objects.bulk_create(tickets, batch_size=self.batch_size)
+        return len(tickets)
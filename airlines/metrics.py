@@ -0,0 +1,212 @@
+"""
+Per-route request metrics in fixed-bucket histograms, served in the
+Prometheus text format.
+
+Each process accumulates into its own in-memory registry. With
+``METRICS_DIR`` set, every process also dumps its registry into its own
+file there (at most every ``METRICS_FLUSH_SECONDS``), and ``/metrics``
+sums all files so a scrape sees every worker. Clear the directory when
+the service starts, like Prometheus' own multiprocess mode expects.
+
+``/metrics`` answers staff users and scrapers sending
+``Authorization: Bearer <METRICS_TOKEN>``. It refuses to serve a single
+worker's numbers when WEB_CONCURRENCY says there are more of them and
+METRICS_DIR is not set.
+"""
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+HISTOGRAMS = {
+    "http_request_duration_seconds": ("Request latency", LATENCY_BUCKETS),
+    "http_request_db_queries": ("SQL queries run by a request", QUERY_BUCKETS),
+    "http_request_db_duration_seconds": ("SQL time of a request", LATENCY_BUCKETS),
+    "http_response_size_bytes": ("Response body size", SIZE_BUCKETS),
+}
+REQUESTS_TOTAL = "http_requests_total"
+
+logger = logging.getLogger(__name__)
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        # (metric, labels) -> per bucket counts with +Inf last, then sum
+        self.histograms = {}
+        self.counters = {}
+        self.token = uuid.uuid4().hex[:8]
+        self.flushed_at = 0.0
+
+    def observe(self, metric: str, labels: tuple, value: float):
+        buckets = HISTOGRAMS[metric][1]
+        key = (metric, labels)
+        with self.lock:
+            state = self.histograms.get(key)
+            if state is None:
+                state = self.histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+            state[bisect_left(buckets, value)] += 1
+            state[-1] += value
+
+    def increment(self, metric: str, labels: tuple):
+        key = (metric, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + 1
+
+    def record(self, route, method, status, seconds, queries, db_seconds, size):
+        labels = (("route", route), ("method", method))
+        self.increment(REQUESTS_TOTAL, labels + (("status", str(status)),))
+        self.observe("http_request_duration_seconds", labels, seconds)
+        self.observe("http_request_db_queries", labels, queries)
+        self.observe("http_request_db_duration_seconds", labels, db_seconds)
+        if size is not None:
+            self.observe("http_response_size_bytes", labels, size)
+        self.flush_if_due()
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "histograms": [
+                    [metric, list(labels), list(state)]
+                    for (metric, labels), state in self.histograms.items()
+                ],
+                "counters": [
+                    [metric, list(labels), value]
+                    for (metric, labels), value in self.counters.items()
+                ],
+            }
+
+    def path(self, directory: str) -> str:
+        return os.path.join(directory, f"metrics-{os.getpid()}-{self.token}.json")
+
+    def flush(self, wait: bool = True):
+        directory = getattr(settings, "METRICS_DIR", None)
+        if not directory or not self.flush_lock.acquire(blocking=wait):
+            return
+        try:
+            self.flushed_at = time.monotonic()
+            path = self.path(directory)
+            temporary = f"{path}.tmp"
+            with open(temporary, "w") as file:
+                json.dump(self.snapshot(), file)
+            os.replace(temporary, path)
+        finally:
+            self.flush_lock.release()
+
+    def flush_if_due(self):
+        interval = getattr(settings, "METRICS_FLUSH_SECONDS", 5)
+        if time.monotonic() - self.flushed_at >= interval:
+            # another thread writing the file is as good as writing it here
+            self.flush(wait=False)
+
+
+registry = Registry()
+
+
+def merge(snapshots) -> dict:
+    histograms = {}
+    counters = {}
+    for snapshot in snapshots:
+        for metric, labels, state in snapshot.get("histograms", ()):
+            key = (metric, tuple(map(tuple, labels)))
+            total = histograms.get(key)
+            if total is None or len(total) != len(state):
+                histograms[key] = list(state)
+            else:
+                histograms[key] = [a + b for a, b in zip(total, state)]
+        for metric, labels, value in snapshot.get("counters", ()):
+            key = (metric, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+    return {"histograms": histograms, "counters": counters}
+
+
+def collect() -> dict:
+    """Metrics of every process sharing METRICS_DIR, or of this one only"""
+    directory = getattr(settings, "METRICS_DIR", None)
+    if not directory:
+        return merge([registry.snapshot()])
+
+    registry.flush()
+    snapshots = []
+    for path in glob.glob(os.path.join(directory, "metrics-*.json")):
+        try:
+            with open(path) as file:
+                snapshots.append(json.load(file))
+        except (OSError, ValueError):
+            continue
+    return merge(snapshots)
+
+
+def format_labels(labels, *extra) -> str:
+    pairs = []
+    for name, value in tuple(labels) + extra:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"')
+        value = value.replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def format_number(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(collected: dict) -> str:
+    lines = [
+        f"# HELP {REQUESTS_TOTAL} Requests by route, method and status",
+        f"# TYPE {REQUESTS_TOTAL} counter",
+    ]
+    for (metric, labels), value in sorted(collected["counters"].items()):
+        lines.append(f"{metric}{format_labels(labels)} {value}")
+
+    for metric, (description, buckets) in HISTOGRAMS.items():
+        lines.append(f"# HELP {metric} {description}")
+        lines.append(f"# TYPE {metric} histogram")
+        for (name, labels), state in sorted(collected["histograms"].items()):
+            if name != metric:
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets + ("+Inf",), state[:-1]):
+                cumulative += count
+                bucket_labels = format_labels(labels, ("le", bound))
+                lines.append(f"{metric}_bucket{bucket_labels} {cumulative}")
+            total = format_number(state[-1])
+            lines.append(f"{metric}_sum{format_labels(labels)} {total}")
+            lines.append(f"{metric}_count{format_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def can_scrape(request) -> bool:
+    if request.user.is_staff:
+        return True
+    token = getattr(settings, "METRICS_TOKEN", None)
+    header = request.headers.get("Authorization", "")
+    return bool(token) and constant_time_compare(header, f"Bearer {token}")
+
+
+def metrics_view(request):
+    if not can_scrape(request):
+        return HttpResponseForbidden()
+    workers = getattr(settings, "WEB_CONCURRENCY", 1)
+    if workers > 1 and not getattr(settings, "METRICS_DIR", None):
+        logger.error("%s workers share no METRICS_DIR, not serving /metrics", workers)
+        return HttpResponse(
+            "Set METRICS_DIR to collect the metrics of every worker\n",
+            content_type="text/plain; charset=utf-8",
+            status=503,
+        )
+    return HttpResponse(
+        render(collect()), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -0,0 +1,114 @@
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import connections
+
+from airlines import metrics
+
+
+class QueryTracker:
+    """Execute wrapper counting SQL statements and the time spent in them"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+class MetricsMiddleware:
+    """
+    Record latency, SQL queries, SQL time and response size per route.
+    Works in both sync and async chains, so async views stay on the loop
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        tracker = QueryTracker()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            track_queries(stack, tracker)
+            response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - started, tracker)
+        return response
+
+    async def __acall__(self, request):
+        tracker = QueryTracker()
+        started = time.perf_counter()
+        # the async ORM runs queries on the thread sync_to_async uses for
+        # this request, so the wrappers go on that thread's connections
+        stack = ExitStack()
+        await sync_to_async(track_queries)(stack, tracker)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        self.record(request, response, time.perf_counter() - started, tracker)
+        return response
+
+    @staticmethod
+    def record(request, response, elapsed, tracker):
+        match = request.resolver_match
+        metrics.registry.record(
+            route=match.view_name if match else "unmatched",
+            method=request.method,
+            status=response.status_code,
+            seconds=elapsed,
+            queries=tracker.count,
+            db_seconds=tracker.seconds,
+            size=None if response.streaming else len(response.content),
+        )
+
+
+def track_queries(stack: ExitStack, tracker: QueryTracker):
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(tracker))
+
+
+class RateLimitHeadersMiddleware:
+    """
+    RateLimit-Limit, -Remaining and -Reset (seconds until the bucket is
+    full) of the tightest throttle the request went through
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.add_headers(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.add_headers(request, await self.get_response(request))
+
+    @staticmethod
+    def add_headers(request, response):
+        rate_limit = getattr(request, "rate_limit", None)
+        if rate_limit is not None:
+            response["RateLimit-Limit"] = rate_limit.limit
+            response["RateLimit-Remaining"] = rate_limit.remaining
+            response["RateLimit-Reset"] = rate_limit.reset
+        return response
@@ -0,0 +1,62 @@
+# Generated by Django 4.2.4 on 2026-10-18 11:20
+
+import unicodedata
+
+from django.db import migrations, models
+
+
+def normalize_city(value: str) -> str:
+    # airlines.search.normalize_city as of this migration
+    value = unicodedata.normalize("NFKD", value)
+    value = "".join(char for char in value if not unicodedata.combining(char))
+    return " ".join(value.casefold().split())
+
+
+def fill_city_key(apps, schema_editor):
+    Airport = apps.get_model("airlines", "Airport")
+    airports = list(Airport.objects.all())
+    for airport in airports:
+        airport.city_key = normalize_city(airport.close_big_city)
+    Airport.objects.bulk_update(airports, ["city_key"], batch_size=500)
+
+
+def add_city_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS airlines_airport_city_key_trgm "
+            "ON airlines_airport USING gin (city_key gin_trgm_ops)"
+        )
+    elif schema_editor.connection.vendor == "sqlite":
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS airlines_airport_city "
+            "USING fts5(city_key, tokenize='trigram')"
+        )
+        schema_editor.execute(
+            "INSERT INTO airlines_airport_city (rowid, city_key) "
+            "SELECT id, city_key FROM airlines_airport"
+        )
+
+
+def remove_city_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS airlines_airport_city_key_trgm")
+    elif schema_editor.connection.vendor == "sqlite":
+        schema_editor.execute("DROP TABLE IF EXISTS airlines_airport_city")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("airlines", "0009_flight_search_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="airport",
+            name="city_key",
+            field=models.CharField(default="", editable=False, max_length=255),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_city_key, migrations.RunPython.noop),
+        migrations.RunPython(add_city_index, remove_city_index),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.4 on 2026-10-18 12:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("airlines", "0014_flightschedule"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RouteDay",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("flights", models.PositiveIntegerField(default=0)),
+                ("seats_left", models.IntegerField(default=0)),
+                (
+                    "route",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="days",
+                        to="airlines.route",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["route", "day"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="routeday",
+            constraint=models.UniqueConstraint(
+                fields=("route", "day"), name="route_day_unique"
+            ),
+        ),
+    ]
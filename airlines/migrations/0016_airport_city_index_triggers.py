@@ -0,0 +1,49 @@
+from django.db import migrations
+
+TRIGGERS = {
+    "airlines_airport_city_insert": (
+        "AFTER INSERT ON airlines_airport BEGIN "
+        "INSERT INTO airlines_airport_city (rowid, city_key) "
+        "VALUES (new.id, new.city_key); END"
+    ),
+    "airlines_airport_city_update": (
+        "AFTER UPDATE OF id, city_key ON airlines_airport BEGIN "
+        "DELETE FROM airlines_airport_city WHERE rowid = old.id; "
+        "INSERT INTO airlines_airport_city (rowid, city_key) "
+        "VALUES (new.id, new.city_key); END"
+    ),
+    "airlines_airport_city_delete": (
+        "AFTER DELETE ON airlines_airport BEGIN "
+        "DELETE FROM airlines_airport_city WHERE rowid = old.id; END"
+    ),
+}
+
+
+def add_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    # repair rows written by bulk paths that bypassed the signals
+    schema_editor.execute("DELETE FROM airlines_airport_city")
+    schema_editor.execute(
+        "INSERT INTO airlines_airport_city (rowid, city_key) "
+        "SELECT id, city_key FROM airlines_airport"
+    )
+    for name, body in TRIGGERS.items():
+        schema_editor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+
+
+def remove_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for name in TRIGGERS:
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("airlines", "0015_routeday"),
+    ]
+
+    operations = [
+        migrations.RunPython(add_triggers, remove_triggers),
+    ]
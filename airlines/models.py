@@ -1,11 +1,20 @@
 import os
 import uuid
+from datetime import timedelta
 
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models.expressions import RawSQL
 from django.conf import settings
 from django.utils.text import slugify
 
+from airlines.search import (
+    TRIGRAM_LENGTH,
+    city_match_sql,
+    normalize_city,
+    uses_city_index,
+)
+
 
 def image_file_path(instance, filename):
     _, extension = os.path.splitext(filename)
@@ -22,19 +31,74 @@ def image_file_path(instance, filename):
 
 class AirplaneType(models.Model):
     name = models.CharField(max_length=255)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
 
 
+class AirportQuerySet(models.QuerySet):
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for airport in objs:
+            airport.city_key = normalize_city(airport.close_big_city)
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        if "close_big_city" in fields:
+            objs = list(objs)
+            for airport in objs:
+                airport.city_key = normalize_city(airport.close_big_city)
+            fields = [*fields, "city_key"]
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+    def update(self, **kwargs):
+        """Updates of close_big_city set city_key, unless they pass it along"""
+        if "close_big_city" in kwargs and "city_key" not in kwargs:
+            city = kwargs["close_big_city"]
+            if not isinstance(city, str):
+                raise TypeError("close_big_city can only be updated to a string")
+            kwargs["city_key"] = normalize_city(city)
+        return super().update(**kwargs)
+
+    def for_city(self, term: str) -> "AirportQuerySet":
+        """
+        Airports whose city contains the substring, matched by an index:
+        a pg_trgm GIN index serves it on Postgres, an FTS5 trigram table on SQLite
+        """
+        key = normalize_city(term)
+        if not key:
+            return self.none()
+
+        if uses_city_index(self.db) and len(key) >= TRIGRAM_LENGTH:
+            return self.filter(id__in=RawSQL(*city_match_sql(key)))
+        return self.filter(city_key__contains=key)
+
+    def ids_for_city(self, term: str) -> list:
+        """Resolve a city substring to matching airport ids in one indexed query"""
+        return list(self.for_city(term).values_list("id", flat=True))
+
+    async def aids_for_city(self, term: str) -> list:
+        return [pk async for pk in self.for_city(term).values_list("id", flat=True)]
+
+
 class Airport(models.Model):
     name = models.CharField(max_length=255, unique=True)
     close_big_city = models.CharField(max_length=255)
+    city_key = models.CharField(max_length=255, editable=False)
     image = models.ImageField(null=True, upload_to=image_file_path)
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = AirportQuerySet.as_manager()
 
     def __str__(self):
         return f"{self.name}, {self.close_big_city}"
 
+    def save(self, *args, **kwargs):
+        self.city_key = normalize_city(self.close_big_city)
+        super().save(*args, **kwargs)
+
 
 class Airplane(models.Model):
     name = models.CharField(max_length=255)
@@ -42,6 +106,8 @@ class Airplane(models.Model):
     seats_in_row = models.IntegerField()
     airplane_type = models.ForeignKey(AirplaneType, on_delete=models.CASCADE)
     image = models.ImageField(null=True, upload_to=image_file_path)
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     @property
     def capacity(self) -> int:
@@ -55,6 +121,8 @@ class Crew(models.Model):
     first_name = models.CharField(max_length=255)
     last_name = models.CharField(max_length=255)
     image = models.ImageField(null=True, upload_to=image_file_path)
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.first_name + " " + self.last_name
@@ -74,25 +142,120 @@ class Route(models.Model):
     destination = models.ForeignKey(
         Airport, on_delete=models.CASCADE, related_name="destination_routes"
     )
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["source", "destination"]
 
 
+def validate_weekdays(value: str):
+    if not value or any(day not in "1234567" for day in value):
+        raise ValidationError("Use ISO weekday numbers, e.g. 135 for Mon, Wed, Fri")
+
+
+class FlightSchedule(models.Model):
+    """
+    A flight departing at departure_time on the given weekdays from
+    valid_from to valid_until. Its dated flights only get a Flight row once
+    booked or materialized ahead, see airlines.schedules
+    """
+
+    number = models.CharField(max_length=10)
+    route = models.ForeignKey(Route, on_delete=models.CASCADE, related_name="schedules")
+    airplane = models.ForeignKey(Airplane, on_delete=models.CASCADE)
+    weekdays = models.CharField(
+        max_length=7,
+        validators=[validate_weekdays],
+        help_text="ISO weekdays it flies, e.g. 135 for Mon, Wed, Fri",
+    )
+    departure_time = models.TimeField()
+    duration = models.DurationField()
+    valid_from = models.DateField()
+    valid_until = models.DateField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["valid_from", "departure_time"]
+
+    def __str__(self):
+        return f"{self.number}, {self.route}, {self.weekdays} {self.departure_time}"
+
+    @staticmethod
+    def validate_validity(valid_from, valid_until, duration, error_to_raise):
+        if valid_until < valid_from:
+            raise error_to_raise({"valid_until": "must not be before valid_from"})
+        if duration <= timedelta(0):
+            raise error_to_raise({"duration": "must be positive"})
+
+    def clean(self):
+        FlightSchedule.validate_validity(
+            self.valid_from, self.valid_until, self.duration, ValidationError
+        )
+
+    def flies_on(self, day) -> bool:
+        return (
+            self.valid_from <= day <= self.valid_until
+            and str(day.isoweekday()) in self.weekdays
+        )
+
+
 class Flight(models.Model):
     number = models.CharField(max_length=10, default="12-A-3D")
     route = models.ForeignKey(Route, on_delete=models.CASCADE)
     airplane = models.ForeignKey(Airplane, on_delete=models.CASCADE)
     departure_time = models.DateTimeField()
     arrival_time = models.DateTimeField()
+    tickets_sold = models.PositiveIntegerField(default=0, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    # set on flights materialized from a schedule
+    schedule = models.ForeignKey(
+        FlightSchedule,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="flights",
+    )
 
     class Meta:
         ordering = ["-departure_time"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["schedule", "departure_time"],
+                name="flight_schedule_departure_unique",
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["departure_time", "route"], name="flight_departure_route_idx"
+            ),
+            models.Index(fields=["arrival_time"], name="flight_arrival_idx"),
+        ]
 
     def __str__(self):
         return f"{self.number}, {self.route}, str({self.departure_time})"
 
 
+class RouteDay(models.Model):
+    """
+    Flights of a route departing on a day and the seats left on them,
+    kept up to date by airlines.availability
+    """
+
+    route = models.ForeignKey(Route, on_delete=models.CASCADE, related_name="days")
+    day = models.DateField()
+    flights = models.PositiveIntegerField(default=0)
+    seats_left = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ["route", "day"]
+        constraints = [
+            models.UniqueConstraint(fields=["route", "day"], name="route_day_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.route} {self.day}: {self.flights} flights"
+
+
 class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -136,3 +299,25 @@ class Ticket(models.Model):
     class Meta:
         unique_together = ("flight", "row", "seat")
         ordering = ["row", "seat"]
+
+
+class SeatHold(models.Model):
+    """
+    A short reservation of a seat. A hold past expires_at no longer blocks
+    the seat and is simply taken over by the next client asking for it
+    """
+
+    flight = models.ForeignKey(Flight, on_delete=models.CASCADE, related_name="holds")
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="seat_holds"
+    )
+    row = models.IntegerField()
+    seat = models.IntegerField()
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{str(self.flight)} (row: {self.row}, seat: {self.seat}) until {self.expires_at}"
+
+    class Meta:
+        unique_together = ("flight", "row", "seat")
+        ordering = ["expires_at"]
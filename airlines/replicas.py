@@ -0,0 +1,127 @@
+"""
+Read replica routing.
+
+Safe requests to the airlines API read from one of
+``settings.DATABASE_REPLICAS``, chosen per request; writes, and reads
+anywhere else, use the default database. The alias is kept in a context
+variable, so it follows a request into sync_to_async threads.
+
+Replicas lag behind the primary. A client that wrote something through
+the API reads from the primary for the next ``REPLICA_STICKY_SECONDS``:
+the write response sets a signed cookie holding its time, so the pin
+holds whichever worker serves the next request. Reads that fill caches
+shared by everyone run under primary().
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from rest_framework.permissions import SAFE_METHODS
+
+_read_alias = ContextVar("read_alias", default=None)
+
+
+def read_alias():
+    """The replica serving reads right now, None for the default database"""
+    return _read_alias.get()
+
+
+def sticky_seconds() -> int:
+    return getattr(settings, "REPLICA_STICKY_SECONDS", 5)
+
+
+def use_replica():
+    """
+    Send reads of the current context to a replica, if any is configured.
+    Returns a token for release()
+    """
+    aliases = getattr(settings, "DATABASE_REPLICAS", ())
+    if not aliases:
+        return None
+    return _read_alias.set(random.choice(aliases))
+
+
+def release(token):
+    if token is not None:
+        _read_alias.reset(token)
+
+
+@contextmanager
+def reading_from_replica():
+    token = use_replica()
+    try:
+        yield
+    finally:
+        release(token)
+
+
+@contextmanager
+def primary():
+    """Read the default database, e.g. to fill a shared cache"""
+    token = _read_alias.set(None)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+PIN_COOKIE = "replica_pin"
+PIN_SALT = "airlines.replicas"
+
+
+def pin(response):
+    """Send the client's reads to the primary until replicas caught up"""
+    if sticky_seconds():
+        response.set_signed_cookie(
+            PIN_COOKIE,
+            "1",
+            salt=PIN_SALT,
+            max_age=sticky_seconds(),
+            httponly=True,
+            samesite="Lax",
+        )
+
+
+def is_pinned(request) -> bool:
+    """Whether the client wrote within the last REPLICA_STICKY_SECONDS"""
+    value = request.get_signed_cookie(
+        PIN_COOKIE, default=None, salt=PIN_SALT, max_age=sticky_seconds()
+    )
+    return value is not None
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return None
+
+
+class ReplicaReadMixin:
+    """
+    Serve safe requests from a replica unless the client is pinned to the
+    primary; successful writes pin the client
+    """
+
+    replica_token = None
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            # unhandled exceptions skip finalize_response
+            release(self.replica_token)
+            self.replica_token = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS and not is_pinned(request):
+            self.replica_token = use_replica()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            pin(response)
+        return response
@@ -0,0 +1,237 @@
+"""
+Flights generated from recurring schedules.
+
+A FlightSchedule stands for one flight per matching day without storing
+them. Searches expand schedules into unsaved "virtual" Flight instances
+for the days asked about and merge them with the stored flights. A virtual
+flight has a negative id encoding its schedule and day, so clients can
+open, hold and book it like any other flight; the first hold or ticket
+materializes its Flight row, and the row is what searches return from
+then on. Editing a schedule changes the flights it has not materialized
+yet.
+
+The ``materialize_schedules`` command stores the next days of flights
+ahead of time, for what reads only stored flights (itineraries).
+"""
+from datetime import date, datetime, timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Q
+
+from airlines.models import Flight, FlightSchedule
+
+EPOCH = date(2000, 1, 1)
+# low bits of a virtual id hold the day, the others the schedule id
+DAY_BITS = 20
+
+
+def virtual_id(schedule_id: int, day: date) -> int:
+    return -((schedule_id << DAY_BITS) | (day - EPOCH).days)
+
+
+def parse_virtual_id(flight_id: int):
+    """(schedule id, day) of a virtual flight id"""
+    flight_id = -flight_id
+    days = flight_id & ((1 << DAY_BITS) - 1)
+    return flight_id >> DAY_BITS, EPOCH + timedelta(days=days)
+
+
+def is_virtual(flight) -> bool:
+    return flight.pk is not None and flight.pk < 0
+
+
+def window_days() -> int:
+    return getattr(settings, "FLIGHT_SCHEDULE_WINDOW_DAYS", 31)
+
+
+def departures(schedule, start: datetime, end: datetime, reverse: bool = False):
+    """Departures of a schedule in [start, end), the latest first when reverse"""
+    first = max(start.date(), schedule.valid_from)
+    last = min(end.date(), schedule.valid_until)
+    day, step = (last, timedelta(days=-1)) if reverse else (first, timedelta(days=1))
+    while first <= day <= last:
+        departure = datetime.combine(day, schedule.departure_time)
+        if start <= departure < end and schedule.flies_on(day):
+            yield departure
+        day += step
+
+
+def count_departures(schedule, start: datetime, end: datetime) -> int:
+    """len(list(departures(...))) without walking the days"""
+    first = max(start.date(), schedule.valid_from)
+    last = min(end.date(), schedule.valid_until)
+    if first > last:
+        return 0
+    weeks, days = divmod((last - first).days + 1, 7)
+    count = weeks * len(set(schedule.weekdays)) + sum(
+        schedule.flies_on(first + timedelta(days=day)) for day in range(days)
+    )
+    # the first and last day may fly outside [start, end)
+    if schedule.flies_on(first):
+        count -= datetime.combine(first, schedule.departure_time) < start
+    if schedule.flies_on(last):
+        count -= datetime.combine(last, schedule.departure_time) >= end
+    return count
+
+
+def search_range(schedule, start: datetime, end: datetime, arrival_day=None):
+    """Narrow [start, end) to the departures arriving on arrival_day"""
+    if arrival_day is not None:
+        start = max(start, arrival_day - schedule.duration)
+        end = min(end, arrival_day + timedelta(days=1) - schedule.duration)
+    return start, end
+
+
+def virtual_flight(schedule, departure: datetime) -> Flight:
+    airplane = schedule.airplane
+    flight = Flight(
+        id=virtual_id(schedule.id, departure.date()),
+        number=schedule.number,
+        route=schedule.route,
+        airplane=airplane,
+        departure_time=departure,
+        arrival_time=departure + schedule.duration,
+        schedule=schedule,
+    )
+    # what FlightViewSet annotates on stored flights
+    flight.tickets_available = airplane.rows * airplane.seats_in_row
+    return flight
+
+
+def schedules_between(start: datetime, end: datetime, airport_ids=None, route_id=None):
+    queryset = FlightSchedule.objects.select_related(
+        "route__source", "route__destination", "airplane__airplane_type"
+    ).filter(valid_from__lte=end.date(), valid_until__gte=start.date())
+    if airport_ids is not None:
+        queryset = queryset.filter(
+            Q(route__source_id__in=airport_ids)
+            | Q(route__destination_id__in=airport_ids)
+        )
+    if route_id is not None:
+        queryset = queryset.filter(route_id=route_id)
+    return queryset
+
+
+def virtual_flights(
+    start: datetime, end: datetime, airport_ids=None, route_id=None
+) -> list:
+    """
+    Virtual flights departing in [start, end), without the ones that
+    already have a row; two queries whatever the number of schedules
+    """
+    schedules = list(schedules_between(start, end, airport_ids, route_id))
+    if not schedules:
+        return []
+
+    stored = set(
+        Flight.objects.filter(
+            schedule__in=schedules, departure_time__gte=start, departure_time__lt=end
+        ).values_list("schedule_id", "departure_time")
+    )
+    return [
+        virtual_flight(schedule, departure)
+        for schedule in schedules
+        for departure in departures(schedule, start, end)
+        if (schedule.id, departure) not in stored
+    ]
+
+
+def nearest_flights(
+    schedules,
+    start: datetime,
+    end: datetime,
+    count: int,
+    reverse=False,
+    arrival_day=None,
+) -> list:
+    """
+    Up to ``count`` virtual flights per schedule departing in [start, end),
+    the earliest ones (the latest when reverse) without a row yet. Costs
+    schedules x count however far away start is; a query per round, and
+    rounds only repeat while stored flights were skipped
+    """
+    streams = {}
+    for schedule in schedules:
+        low, high = search_range(schedule, start, end, arrival_day)
+        streams[schedule] = departures(schedule, low, high, reverse)
+
+    found = {schedule: [] for schedule in streams}
+    wanted = count
+    while streams:
+        batch = {
+            schedule: list(islice(stream, wanted))
+            for schedule, stream in streams.items()
+        }
+        stored = set(
+            Flight.objects.filter(
+                schedule__in=list(batch),
+                departure_time__in={day for days in batch.values() for day in days},
+            ).values_list("schedule_id", "departure_time")
+        )
+        for schedule, days in batch.items():
+            found[schedule].extend(
+                day for day in days if (schedule.id, day) not in stored
+            )
+        streams = {
+            schedule: stream
+            for schedule, stream in streams.items()
+            if len(batch[schedule]) == wanted and len(found[schedule]) < count
+        }
+        wanted *= 2
+
+    return [
+        virtual_flight(schedule, departure)
+        for schedule, days in found.items()
+        for departure in days[:count]
+    ]
+
+
+def resolve(flight_id: int, queryset=None):
+    """
+    The flight behind a virtual id: its row when it has one, else a virtual
+    flight; None when the schedule does not fly that day
+    """
+    schedule_id, day = parse_virtual_id(flight_id)
+    schedule = (
+        FlightSchedule.objects.select_related(
+            "route__source", "route__destination", "airplane__airplane_type"
+        )
+        .filter(pk=schedule_id)
+        .first()
+    )
+    if schedule is None or not schedule.flies_on(day):
+        return None
+
+    departure = datetime.combine(day, schedule.departure_time)
+    queryset = Flight.objects.all() if queryset is None else queryset
+    stored = queryset.filter(schedule=schedule, departure_time=departure).first()
+    return stored or virtual_flight(schedule, departure)
+
+
+def materialize(flight) -> Flight:
+    """The stored row of a flight, inserting it for a virtual one"""
+    if not is_virtual(flight):
+        return flight
+    stored, _ = Flight.objects.get_or_create(
+        schedule_id=flight.schedule_id,
+        departure_time=flight.departure_time,
+        defaults={
+            "number": flight.number,
+            "route": flight.route,
+            "airplane": flight.airplane,
+            "arrival_time": flight.arrival_time,
+        },
+    )
+    return stored
+
+
+def materialize_booked(tickets_data):
+    """Swap virtual flights of validated ticket data for their rows"""
+    stored = {}
+    for ticket in tickets_data:
+        flight = ticket["flight"]
+        if is_virtual(flight):
+            if flight.id not in stored:
+                stored[flight.id] = materialize(flight)
+            ticket["flight"] = stored[flight.id]
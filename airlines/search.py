@@ -0,0 +1,35 @@
+"""
+City search helpers.
+
+Airports keep a normalized copy of ``close_big_city`` in ``city_key``,
+set by Airport.save and by the AirportQuerySet bulk paths. Substring
+lookups on it are served by a pg_trgm GIN index on Postgres and by an FTS5
+trigram table (``airlines_airport_city``, rowid = airport id) on SQLite,
+which triggers on airlines_airport keep in sync (migration 0016).
+"""
+import unicodedata
+
+from django.db import connections
+
+CITY_INDEX_TABLE = "airlines_airport_city"
+TRIGRAM_LENGTH = 3
+
+
+def normalize_city(value: str) -> str:
+    """Casefold, strip accents and collapse whitespace ("São  Paulo" -> "sao paulo")"""
+    value = unicodedata.normalize("NFKD", value)
+    value = "".join(char for char in value if not unicodedata.combining(char))
+    return " ".join(value.casefold().split())
+
+
+def uses_city_index(using: str) -> bool:
+    return connections[using].vendor == "sqlite"
+
+
+def city_match_sql(key: str):
+    """SQL selecting ids of airports whose city_key contains ``key`` (SQLite)"""
+    phrase = '"' + key.replace('"', '""') + '"'
+    return (
+        f"SELECT rowid FROM {CITY_INDEX_TABLE} WHERE {CITY_INDEX_TABLE} MATCH %s",
+        (phrase,),
+    )
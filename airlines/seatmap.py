@@ -0,0 +1,94 @@
+"""
+Packed seat occupancy bitmaps for flights.
+
+Seat (row, seat) of an airplane with ``seats_in_row`` seats per row maps to
+bit ``(row - 1) * seats_in_row + (seat - 1)``; bits are packed most
+significant first, so a 180 seat airplane fits in 23 bytes.
+
+Ticket writes drop the cached bitmap once they commit and the next read
+rebuilds it. The default cache is per process, so other workers may serve
+their copy for up to SEAT_MAP_SECONDS. Holds come and go within minutes,
+so their bitmap is read from the database every time.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from airlines import replicas
+from airlines.models import SeatHold, Ticket
+
+
+def seat_map_seconds() -> int:
+    return getattr(settings, "SEAT_MAP_SECONDS", 60)
+
+
+def seat_map_key(flight_id: int) -> str:
+    return f"seat-map:{flight_id}"
+
+
+def seat_index(row: int, seat: int, seats_in_row: int) -> int:
+    return (row - 1) * seats_in_row + (seat - 1)
+
+
+def set_bits(bitmap: bytearray, seats, seats_in_row: int):
+    for row, seat in seats:
+        index = seat_index(row, seat, seats_in_row)
+        bitmap[index // 8] |= 0x80 >> (index % 8)
+
+
+def build_seat_map(flight) -> bytes:
+    airplane = flight.airplane
+    bitmap = bytearray((airplane.rows * airplane.seats_in_row + 7) // 8)
+    seats = Ticket.objects.filter(flight_id=flight.id).values_list("row", "seat")
+    # the bitmap is cached, build it from the primary
+    with replicas.primary():
+        seats = list(seats)
+    set_bits(bitmap, seats, airplane.seats_in_row)
+    return bytes(bitmap)
+
+
+def get_seat_map(flight) -> bytes:
+    """Return the occupancy bitmap of a flight, building it on a cache miss"""
+    airplane = flight.airplane
+    shape = (airplane.rows, airplane.seats_in_row)
+    cached = cache.get(seat_map_key(flight.id))
+    if cached is not None and cached[0] == shape:
+        return cached[1]
+
+    bitmap = build_seat_map(flight)
+    cache.set(seat_map_key(flight.id), (shape, bitmap), seat_map_seconds())
+    return bitmap
+
+
+def get_held_map(flight) -> bytes:
+    """Bitmap of seats under an active hold, one query on the primary"""
+    airplane = flight.airplane
+    bitmap = bytearray((airplane.rows * airplane.seats_in_row + 7) // 8)
+    holds = SeatHold.objects.filter(
+        flight_id=flight.id, expires_at__gt=timezone.now()
+    ).values_list("row", "seat")
+    with replicas.primary():
+        seats = list(holds.order_by())
+    set_bits(bitmap, seats, airplane.seats_in_row)
+    return bytes(bitmap)
+
+
+def invalidate_seat_map(flight_id: int):
+    cache.delete(seat_map_key(flight_id))
+
+
+def expand_seat_map(
+    bitmap: bytes, rows: int, seats_in_row: int, held: bytes = None
+) -> list:
+    """Unpack bitmaps into one list per row: 0 free, 1 sold, 2 held"""
+
+    def bit(data, index):
+        return (data[index // 8] >> (7 - index % 8)) & 1
+
+    return [
+        [
+            1 if bit(bitmap, index) else 2 if held and bit(held, index) else 0
+            for index in range(row * seats_in_row, (row + 1) * seats_in_row)
+        ]
+        for row in range(rows)
+    ]
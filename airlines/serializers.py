@@ -1,63 +1,145 @@
-from django.db import transaction
-from rest_framework import serializers
+from collections import Counter
 
+from django.core.files.storage import default_storage
+from django.db import models, transaction, IntegrityError
+from rest_framework import exceptions, serializers, status
+
+from airlines import adjacency, holds, images, schedules
 from airlines.models import (
     Airplane,
     Crew,
     Flight,
+    FlightSchedule,
     Route,
     Order,
     Ticket,
     AirplaneType,
     Airport,
+    SeatHold,
 )
+from airlines.signals import tickets_created
+from airlines.sparse import SparseFieldsMixin
+
+
+class ImageDerivativesField(serializers.Field):
+    """Absolute URLs and dimensions of the resized copies of an image"""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("source", "image_derivatives")
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, derivatives):
+        request = self.context.get("request")
+        representation = {}
+        for size in images.DERIVATIVES:
+            entry = derivatives.get(size)
+            if not entry:
+                continue
+            representation[size] = {
+                "width": entry["width"],
+                "height": entry["height"],
+            }
+            for name in images.FORMATS:
+                url = default_storage.url(entry[name])
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                representation[size][name] = url
+        return representation
+
+
+class AirplaneSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    images = ImageDerivativesField()
 
-
-class AirplaneSerializer(serializers.ModelSerializer):
     class Meta:
         model = Airplane
-        fields = ("id", "name", "rows", "seats_in_row", "airplane_type", "image")
+        fields = (
+            "id",
+            "name",
+            "rows",
+            "seats_in_row",
+            "airplane_type",
+            "image",
+            "images",
+        )
+
 
+class AirportSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    images = ImageDerivativesField()
 
-class AirportSerializer(serializers.ModelSerializer):
     class Meta:
         model = Airport
         fields = (
             "id",
             "name",
             "close_big_city",
+            "images",
         )
 
 
-class AirportDetailSerializer(serializers.ModelSerializer):
-    image = serializers.ImageField()
-    transfer = serializers.BooleanField(default=True)
+class AirportDestinationsListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        airports = list(data.all() if isinstance(data, models.Manager) else data)
+        self.context["destinations"] = adjacency.get_destinations(airports)
+        return super().to_representation(airports)
+
+
+class AirportDestinationsSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    images = ImageDerivativesField()
     destinations = serializers.SerializerMethodField()
 
     class Meta:
         model = Airport
+        fields = (
+            "id",
+            "name",
+            "close_big_city",
+            "images",
+            "destinations",
+        )
+        list_serializer_class = AirportDestinationsListSerializer
+
+    def sparse_queryset(self, queryset, keep=()):
+        if "destinations" in self.fields:
+            # the destinations cache is keyed by it
+            keep = (*keep, "updated_at")
+        return super().sparse_queryset(queryset, keep)
+
+    def get_destinations(self, obj) -> list:
+        destinations = self.context.get("destinations")
+        if destinations is None:
+            destinations = adjacency.get_destinations([obj])
+        return [
+            {"id": destination_id, "name": name}
+            for destination_id, name in destinations.get(obj.id, ())
+        ]
+
+
+class AirportDetailSerializer(AirportDestinationsSerializer):
+    image = serializers.ImageField()
+    transfer = serializers.BooleanField(default=True)
+
+    class Meta(AirportDestinationsSerializer.Meta):
         fields = (
             "id",
             "name",
             "close_big_city",
             "image",
+            "images",
             "transfer",
             "destinations",
         )
 
-    def get_destinations(self, obj):
-        source_routes = Route.objects.filter(source=obj)
-        destination_airport_names = [route.destination.name for route in source_routes]
-        return destination_airport_names
-
 
 class CloseBigCityImageSerializer(serializers.ModelSerializer):
+    images = ImageDerivativesField()
+
     class Meta:
         model = Airport
-        fields = ("id", "image")
+        fields = ("id", "image", "images")
 
 
-class AirplaneTypeSerializer(serializers.ModelSerializer):
+class AirplaneTypeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = AirplaneType
         fields = (
@@ -66,19 +148,31 @@ class AirplaneTypeSerializer(serializers.ModelSerializer):
         )
 
 
-class CrewSerializer(serializers.ModelSerializer):
+class CrewSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    images = ImageDerivativesField()
+
     class Meta:
         model = Crew
-        fields = ("id", "first_name", "last_name", "image")
+        fields = ("id", "first_name", "last_name", "image", "images")
 
 
-class RouteSerializer(serializers.ModelSerializer):
+class RouteSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     source = AirportSerializer(many=False)
     destination = AirportSerializer(many=False)
 
     class Meta:
         model = Route
         fields = ("id", "source", "destination")
+        expandable_fields = {
+            "source": (AirportSerializer, ("source",)),
+            "destination": (AirportSerializer, ("destination",)),
+        }
+
+
+class RouteCalendarDaySerializer(serializers.Serializer):
+    date = serializers.DateField()
+    flights = serializers.IntegerField()
+    seats_left = serializers.IntegerField()
 
 
 class RouteAirportSerializer(serializers.ModelSerializer):
@@ -90,7 +184,7 @@ class RouteAirportSerializer(serializers.ModelSerializer):
         fields = ("id", "source", "destination")
 
 
-class FlightListSerializer(serializers.ModelSerializer):
+class FlightListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     tickets_available = serializers.IntegerField()
     route = serializers.StringRelatedField(many=False)
 
@@ -105,6 +199,10 @@ class FlightListSerializer(serializers.ModelSerializer):
             "arrival_time",
             "tickets_available",
         )
+        expandable_fields = {
+            "route": (RouteSerializer, ("route__source", "route__destination")),
+            "airplane": (AirplaneSerializer, ("airplane",)),
+        }
 
 
 class FlightSerializer(serializers.ModelSerializer):
@@ -113,13 +211,13 @@ class FlightSerializer(serializers.ModelSerializer):
         fields = ("id", "number", "route", "airplane", "departure_time", "arrival_time")
 
 
-class FlightDetailSerializer(serializers.ModelSerializer):
+class FlightDetailSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     route = RouteSerializer(many=False, read_only=True)
     airplane = serializers.SlugRelatedField(
         many=False, read_only=True, slug_field="name"
     )
     airplane_type = serializers.SlugRelatedField(
-        source="airplane.airplane-type", many=False, read_only=True, slug_field="name"
+        source="airplane.airplane_type", many=False, read_only=True, slug_field="name"
     )
 
     class Meta:
@@ -133,9 +231,168 @@ class FlightDetailSerializer(serializers.ModelSerializer):
             "arrival_time",
             "airplane_type",
         )
+        expandable_fields = {
+            "route": (RouteSerializer, ("route__source", "route__destination")),
+            "airplane": (AirplaneSerializer, ("airplane",)),
+        }
+        related_paths = {"airplane_type": ("airplane__airplane_type",)}
+
+
+class FlightScheduleSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = FlightSchedule
+        fields = (
+            "id",
+            "number",
+            "route",
+            "airplane",
+            "weekdays",
+            "departure_time",
+            "duration",
+            "valid_from",
+            "valid_until",
+        )
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        FlightSchedule.validate_validity(
+            attrs.get("valid_from", getattr(self.instance, "valid_from", None)),
+            attrs.get("valid_until", getattr(self.instance, "valid_until", None)),
+            attrs.get("duration", getattr(self.instance, "duration", None)),
+            serializers.ValidationError,
+        )
+        return data
+
+
+class FlightSeatMapSerializer(serializers.Serializer):
+    flight = serializers.IntegerField()
+    rows = serializers.IntegerField()
+    seats_in_row = serializers.IntegerField()
+    occupied = serializers.CharField(
+        help_text="Base64 bitset, bit (row - 1) * seats_in_row + (seat - 1), MSB first"
+    )
+    held = serializers.CharField(help_text="Base64 bitset of seats on hold")
+    seats = serializers.ListField(
+        child=serializers.ListField(child=serializers.IntegerField()),
+        required=False,
+        help_text="Only with ?expanded=true: per row, 0 free, 1 sold, 2 held",
+    )
+
+
+class ItinerarySearchSerializer(serializers.Serializer):
+    source = serializers.IntegerField()
+    destination = serializers.IntegerField()
+    departure = serializers.DateTimeField(
+        help_text="Earliest departure of the first leg"
+    )
+    min_connection = serializers.IntegerField(
+        default=60, min_value=0, max_value=24 * 60, help_text="Minutes"
+    )
+    max_legs = serializers.IntegerField(default=3, min_value=1, max_value=4)
+    window = serializers.IntegerField(
+        default=24,
+        min_value=1,
+        max_value=72,
+        help_text="Hours after departure the first leg may leave",
+    )
+
+    def validate(self, attrs):
+        if attrs["source"] == attrs["destination"]:
+            raise serializers.ValidationError(
+                "source and destination must be different airports"
+            )
+        return attrs
+
+
+class ItineraryLegSerializer(serializers.Serializer):
+    flight = serializers.IntegerField()
+    number = serializers.CharField()
+    source = serializers.IntegerField()
+    destination = serializers.IntegerField()
+    departure_time = serializers.DateTimeField()
+    arrival_time = serializers.DateTimeField()
+
+
+class ItinerarySerializer(serializers.Serializer):
+    departure_time = serializers.DateTimeField()
+    arrival_time = serializers.DateTimeField()
+    legs = ItineraryLegSerializer(many=True)
+
+
+class ScheduledFlightField(serializers.PrimaryKeyRelatedField):
+    """Also accepts the negative ids of virtual flights, see airlines.schedules"""
+
+    def to_internal_value(self, data):
+        try:
+            flight_id = int(data)
+        except (TypeError, ValueError):
+            return super().to_internal_value(data)
+        if flight_id >= 0:
+            return super().to_internal_value(data)
+
+        flight = schedules.resolve(flight_id, self.get_queryset())
+        if flight is None:
+            self.fail("does_not_exist", pk_value=data)
+        return flight
+
+
+class PrefetchedFlightField(ScheduledFlightField):
+    """Resolves flights from context["flights"] when the parent prefetched them"""
+
+    def to_internal_value(self, data):
+        try:
+            return self.context["flights"][int(data)]
+        except (KeyError, TypeError, ValueError):
+            return super().to_internal_value(data)
+
+
+class SeatSerializer(serializers.Serializer):
+    row = serializers.IntegerField()
+    seat = serializers.IntegerField()
+
+
+class SeatHoldCreateSerializer(serializers.Serializer):
+    flight = ScheduledFlightField(queryset=Flight.objects.select_related("airplane"))
+    seats = SeatSerializer(many=True, allow_empty=False)
+
+    def validate(self, attrs):
+        airplane = attrs["flight"].airplane
+        for seat in attrs["seats"]:
+            Ticket.validate_seat_and_row(
+                seat["seat"],
+                airplane.seats_in_row,
+                seat["row"],
+                airplane.rows,
+                serializers.ValidationError,
+            )
+        return attrs
+
+    def create(self, validated_data):
+        try:
+            return holds.hold_seats(
+                self.context["request"].user,
+                schedules.materialize(validated_data["flight"]),
+                [(seat["row"], seat["seat"]) for seat in validated_data["seats"]],
+            )
+        except holds.SeatsUnavailable as error:
+            raise serializers.ValidationError(
+                {
+                    "seats_unavailable": [
+                        {"row": row, "seat": seat} for row, seat in error.seats
+                    ]
+                }
+            )
+
+
+class SeatHoldSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SeatHold
+        fields = ("id", "flight", "row", "seat", "expires_at")
 
 
 class TicketSerializer(serializers.ModelSerializer):
+    flight = PrefetchedFlightField(queryset=Flight.objects.select_related("airplane"))
+
     class Meta:
         model = Ticket
         fields = (
@@ -144,6 +401,8 @@ class TicketSerializer(serializers.ModelSerializer):
             "row",
             "seat",
         )
+        # seat collisions are checked for the whole order in OrderSerializer
+        validators = []
 
     def validate(self, attrs):
         data = super(TicketSerializer, self).validate(attrs)
@@ -165,6 +424,58 @@ class TicketDetailSerializer(serializers.ModelSerializer):
         fields = ("id", "flight")
 
 
+class TicketHistorySerializer(serializers.ModelSerializer):
+    """One flat row per ticket, without nested flight/route/airport objects"""
+
+    order = serializers.IntegerField(source="order_id")
+    ordered_at = serializers.DateTimeField(source="order.created_at")
+    flight = serializers.IntegerField(source="flight_id")
+    number = serializers.CharField(source="flight.number")
+    source = serializers.CharField(source="flight.route.source.name")
+    source_city = serializers.CharField(source="flight.route.source.close_big_city")
+    destination = serializers.CharField(source="flight.route.destination.name")
+    destination_city = serializers.CharField(
+        source="flight.route.destination.close_big_city"
+    )
+    departure_time = serializers.DateTimeField(source="flight.departure_time")
+    arrival_time = serializers.DateTimeField(source="flight.arrival_time")
+
+    class Meta:
+        model = Ticket
+        fields = (
+            "id",
+            "order",
+            "ordered_at",
+            "flight",
+            "number",
+            "source",
+            "source_city",
+            "destination",
+            "destination_city",
+            "departure_time",
+            "arrival_time",
+            "row",
+            "seat",
+        )
+
+
+class SeatsUnavailable(exceptions.APIException):
+    """
+    A 400 listing seats an order cannot have under ``tickets.<reason>``.
+    ValidationError would turn the flight ids, rows and seats into strings
+    """
+
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_code = "seats_unavailable"
+
+    def __init__(self, reason: str, seats: list):
+        self.detail = {"tickets": {reason: seats}}
+
+    def get_codes(self):
+        (reason,) = self.detail["tickets"]
+        return {"tickets": {reason: self.default_code}}
+
+
 class OrderSerializer(serializers.ModelSerializer):
     tickets = TicketSerializer(many=True, read_only=False, allow_empty=False)
 
@@ -176,14 +487,87 @@ class OrderSerializer(serializers.ModelSerializer):
             "created_at",
         )
 
+    def to_internal_value(self, data):
+        """
+        Load every referenced flight with its airplane in a single query,
+        plus one per virtual flight
+        """
+        tickets = data.get("tickets") if hasattr(data, "get") else None
+        if isinstance(tickets, list):
+            flight_ids = set()
+            for ticket in tickets:
+                try:
+                    flight_ids.add(int(ticket["flight"]))
+                except (KeyError, TypeError, ValueError):
+                    continue
+            queryset = Flight.objects.select_related("airplane")
+            flights = queryset.in_bulk(
+                [flight_id for flight_id in flight_ids if flight_id >= 0]
+            )
+            for flight_id in flight_ids:
+                if flight_id < 0:
+                    flight = schedules.resolve(flight_id, queryset)
+                    if flight is not None:
+                        flights[flight_id] = flight
+            self.context["flights"] = flights
+        return super().to_internal_value(data)
+
+    @staticmethod
+    def requested_seats(tickets_data) -> list:
+        return [
+            (ticket["flight"].id, ticket["row"], ticket["seat"])
+            for ticket in tickets_data
+        ]
+
+    def seat_conflicts(self, tickets_data) -> list:
+        """Seats requested twice in the order or already sold, one query total"""
+        seats = self.requested_seats(tickets_data)
+        conflicts = {seat for seat, count in Counter(seats).items() if count > 1}
+        taken = Ticket.objects.filter(
+            flight_id__in={flight_id for flight_id, _, _ in seats},
+            row__in={row for _, row, _ in seats},
+            seat__in={seat for _, _, seat in seats},
+        ).values_list("flight_id", "row", "seat")
+        conflicts.update(set(taken) & set(seats))
+        return [
+            {"flight": flight_id, "row": row, "seat": seat}
+            for flight_id, row, seat in sorted(conflicts)
+        ]
+
+    def validate_tickets(self, tickets_data):
+        conflicts = self.seat_conflicts(tickets_data)
+        if conflicts:
+            raise SeatsUnavailable("seats_taken", conflicts)
+
+        held = holds.held_by_others(
+            self.context["request"].user, self.requested_seats(tickets_data)
+        )
+        if held:
+            raise SeatsUnavailable(
+                "seats_held",
+                [
+                    {"flight": flight_id, "row": row, "seat": seat}
+                    for flight_id, row, seat in sorted(held)
+                ],
+            )
+        return tickets_data
+
     """redefine method create to allow create tickets while creating order"""
 
     def create(self, validated_data):
         with transaction.atomic():
             tickets_data = validated_data.pop("tickets")
+            schedules.materialize_booked(tickets_data)
             order = Order.objects.create(**validated_data)
-            for tickets_data in tickets_data:
-                Ticket.objects.create(order=order, **tickets_data)
+            tickets = [Ticket(order=order, **ticket) for ticket in tickets_data]
+            try:
+                with transaction.atomic():
+                    Ticket.objects.bulk_create(tickets)
+            except IntegrityError:
+                # another order took one of the seats after validation
+                raise SeatsUnavailable("seats_taken", self.seat_conflicts(tickets_data))
+            tickets_created(tickets)
+            holds.consume(order.user, self.requested_seats(tickets_data))
             return order
 
 
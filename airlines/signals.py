@@ -0,0 +1,181 @@
+from collections import defaultdict
+from functools import partial
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from airlines import availability, images, itinerary, seatmap
+from airlines.cache import bump_namespace
+from airlines.models import (
+    Airplane,
+    AirplaneType,
+    Airport,
+    Crew,
+    Flight,
+    FlightSchedule,
+    Route,
+    Ticket,
+)
+
+
+def seats_by_flight(tickets) -> dict:
+    seats = defaultdict(list)
+    for ticket in tickets:
+        seats[ticket.flight_id].append((ticket.row, ticket.seat))
+    return seats
+
+
+def tickets_created(tickets):
+    """Apply side effects of newly inserted tickets, including bulk inserts"""
+    availability.seats_sold(tickets)
+    for flight_id, seats in seats_by_flight(tickets).items():
+        Flight.objects.filter(pk=flight_id).update(
+            tickets_sold=F("tickets_sold") + len(seats)
+        )
+        transaction.on_commit(partial(seatmap.invalidate_seat_map, flight_id))
+    bump_namespace("flights")
+
+
+def tickets_deleted(tickets):
+    """Apply side effects of removed (cancelled) tickets"""
+    availability.seats_sold(tickets, sign=-1)
+    for flight_id, seats in seats_by_flight(tickets).items():
+        Flight.objects.filter(pk=flight_id, tickets_sold__gte=len(seats)).update(
+            tickets_sold=F("tickets_sold") - len(seats)
+        )
+        transaction.on_commit(partial(seatmap.invalidate_seat_map, flight_id))
+    bump_namespace("flights")
+
+
+@receiver(post_save, sender=Ticket)
+def ticket_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        tickets_created([instance])
+    else:
+        transaction.on_commit(partial(seatmap.invalidate_seat_map, instance.flight_id))
+
+
+@receiver(post_delete, sender=Ticket)
+def ticket_deleted(sender, instance, **kwargs):
+    tickets_deleted([instance])
+
+
+@receiver(post_save, sender=Airport)
+def airport_saved(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        routes = Route.objects.filter(Q(source=instance) | Q(destination=instance))
+        routes.update(updated_at=timezone.now())
+        destinations_changed(
+            *routes.filter(destination=instance).values_list("source_id", flat=True)
+        )
+
+
+@receiver(post_save, sender=Airport)
+@receiver(post_save, sender=Airplane)
+@receiver(post_save, sender=Crew)
+def image_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        images.image_changed(instance)
+
+
+@receiver(pre_save, sender=Flight)
+def flight_saving(sender, instance, raw=False, **kwargs):
+    # remember the old route and day, a moved flight leaves its calendar day
+    instance.previous_route_day = None
+    if instance.pk and not raw:
+        previous = (
+            Flight.objects.filter(pk=instance.pk)
+            .values_list("route_id", "departure_time")
+            .first()
+        )
+        if previous is not None:
+            instance.previous_route_day = (previous[0], previous[1].date())
+
+
+@receiver(post_save, sender=Flight)
+def flight_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(partial(itinerary.flight_changed, instance))
+    route_days = {
+        availability.route_day(instance),
+        getattr(instance, "previous_route_day", None),
+    }
+    route_days.discard(None)
+    availability.recount(*route_days)
+
+
+@receiver(post_delete, sender=Flight)
+def flight_deleted(sender, instance, **kwargs):
+    transaction.on_commit(partial(itinerary.flight_removed, instance.id))
+    availability.recount(availability.route_day(instance))
+
+
+@receiver(pre_save, sender=Airplane)
+def airplane_saving(sender, instance, raw=False, **kwargs):
+    instance.previous_shape = None
+    if instance.pk and not raw:
+        instance.previous_shape = (
+            Airplane.objects.filter(pk=instance.pk)
+            .values_list("rows", "seats_in_row")
+            .first()
+        )
+
+
+@receiver(post_save, sender=Airplane)
+def airplane_saved(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, "previous_shape", None)
+    if previous and previous != (instance.rows, instance.seats_in_row):
+        availability.recount_airplane(instance.id)
+
+
+@receiver(pre_save, sender=Route)
+def route_saving(sender, instance, raw=False, **kwargs):
+    # remember the old source, a repointed route leaves its destinations
+    instance.previous_source_id = None
+    if instance.pk and not raw:
+        instance.previous_source_id = (
+            Route.objects.filter(pk=instance.pk)
+            .values_list("source_id", flat=True)
+            .first()
+        )
+
+
+def destinations_changed(*airport_ids):
+    # destinations are part of the airport payload: its validators move, and
+    # so do the adjacency cache keys of every worker
+    Airport.objects.filter(pk__in=airport_ids).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Route)
+def route_saved(sender, instance, created, **kwargs):
+    sources = {instance.source_id, getattr(instance, "previous_source_id", None)}
+    sources.discard(None)
+    destinations_changed(*sources)
+    if not created:
+        transaction.on_commit(itinerary.invalidate)
+
+
+@receiver(post_delete, sender=Route)
+def route_deleted(sender, instance, **kwargs):
+    destinations_changed(instance.source_id)
+
+
+@receiver(post_save, sender=Flight)
+@receiver(post_delete, sender=Flight)
+@receiver(post_save, sender=FlightSchedule)
+@receiver(post_delete, sender=FlightSchedule)
+@receiver(post_save, sender=Route)
+@receiver(post_delete, sender=Route)
+@receiver(post_save, sender=Airport)
+@receiver(post_delete, sender=Airport)
+@receiver(post_save, sender=Airplane)
+@receiver(post_delete, sender=Airplane)
+@receiver(post_save, sender=AirplaneType)
+@receiver(post_delete, sender=AirplaneType)
+def flight_data_changed(sender, **kwargs):
+    bump_namespace("flights")
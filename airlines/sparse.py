@@ -0,0 +1,91 @@
+"""
+Sparse fieldsets (``?fields=id,number``) and expandable relations
+(``?expand=route``) for read requests.
+
+Without either parameter serializers keep their full shape. With one of
+them the response is lean: only the listed fields are rendered (all of
+them when ``fields`` is absent), relations listed in
+``Meta.expandable_fields`` render as ids unless expanded, and
+SparseQuerysetMixin selects just the columns and joins those fields read.
+"""
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+def query_list(request, name: str):
+    value = request.query_params.get(name)
+    if value is None:
+        return None
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+class SparseFieldsMixin:
+    """
+    ``Meta.expandable_fields`` maps a relation to the nested serializer and
+    the select_related paths it needs when expanded; ``Meta.related_paths``
+    maps other fields that read through relations to their joins
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lean = False
+        self.expanded = set()
+
+        request = kwargs.get("context", {}).get("request")
+        if request is None or request.method not in SAFE_METHODS:
+            return
+        requested = query_list(request, "fields")
+        expand = query_list(request, "expand")
+        if requested is None and expand is None:
+            return
+
+        self.lean = True
+        if requested is not None:
+            for name in set(self.fields) - set(requested):
+                self.fields.pop(name)
+
+        expandable = getattr(self.Meta, "expandable_fields", {})
+        self.expanded = set(expand or ()) & set(expandable) & set(self.fields)
+        for name, (serializer_class, _) in expandable.items():
+            if name not in self.fields:
+                continue
+            if name in self.expanded:
+                self.fields[name] = serializer_class(read_only=True)
+            else:
+                self.fields[name] = serializers.PrimaryKeyRelatedField(read_only=True)
+
+    def sparse_queryset(self, queryset, keep=()):
+        """Defer columns and drop joins that the rendered fields do not read"""
+        expandable = getattr(self.Meta, "expandable_fields", {})
+        related_paths = getattr(self.Meta, "related_paths", {})
+        model_fields = {field.name for field in queryset.model._meta.concrete_fields}
+
+        columns = {queryset.model._meta.pk.name, *keep}
+        joins = []
+        for name, field in self.fields.items():
+            if name in self.expanded:
+                joins.extend(expandable[name][1])
+            elif name in related_paths:
+                joins.extend(related_paths[name])
+            if field.source != "*":
+                columns.add(field.source.split(".")[0])
+
+        queryset = queryset.select_related(None).only(*(columns & model_fields))
+        if joins:
+            queryset = queryset.select_related(*joins)
+        return queryset
+
+
+class SparseQuerysetMixin:
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        serializer = self.get_serializer()
+        if not getattr(serializer, "lean", False):
+            return queryset
+
+        # the paginator reads its ordering fields from the last row
+        ordering = getattr(self.paginator, "ordering", None) or ()
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        keep = [field.lstrip("-") for field in ordering]
+        return serializer.sparse_queryset(queryset, keep)
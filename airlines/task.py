@@ -1,11 +1,18 @@
-def histogram(results: list) -> str:
-    res = ""
-    for count in range((len(results)), 0, -1):
-        if 0 < results[count - 1] <= 100:
-            res += f"{count}| {'#'*results[count - 1]}{results[count - 1]}\n"
-        elif results[count - 1] == 0:
-            res += f"{count}| \n"
-    return f'"""{res}"""'
+def histogram(results: list, labels: list = None, width: int = 50) -> str:
+    """
+    Render bucket counts as horizontal bars, the last bucket on top.
+    Rows are labelled with ``labels`` (1..n by default) and bars longer
+    than ``width`` are scaled down, the exact count follows every bar.
+    """
+    if labels is None:
+        labels = [str(index) for index in range(1, len(results) + 1)]
+    label_width = max((len(label) for label in labels), default=0)
+    scale = max(max(results, default=0) / width, 1)
 
-
-print(histogram([0, 0, 7, 0, 8, 0]))
+    rows = []
+    for label, count in reversed(list(zip(labels, results))):
+        bar = "#" * round(count / scale) if count else ""
+        if count and not bar:
+            bar = "."
+        rows.append(f"{label:>{label_width}}| {bar}{count or ''}".rstrip())
+    return "\n".join(rows) + "\n"
@@ -0,0 +1,207 @@
+from django.test import TestCase
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from airlines.models import Airport, Route
+
+AIRPORT_URL = reverse("airlines:airport-list")
+
+
+def sample_airport(**params):
+    defaults = {
+        "name": "Test",
+        "close_big_city": "Test city",
+    }
+    defaults.update(params)
+
+    return Airport.objects.create(**defaults)
+
+
+class AirportCitySearchTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("test@test1.com", "test1234")
+        self.client.force_authenticate(self.user)
+
+    def test_ids_for_city(self):
+        krakow = sample_airport(name="test1", close_big_city="Kraków")
+        new_york = sample_airport(name="test2", close_big_city="New  York")
+
+        self.assertEqual(Airport.objects.ids_for_city("KRAKOW"), [krakow.id])
+        self.assertEqual(Airport.objects.ids_for_city("w yo"), [new_york.id])
+        self.assertEqual(Airport.objects.ids_for_city("k"), [krakow.id, new_york.id])
+        self.assertEqual(Airport.objects.ids_for_city(" "), [])
+
+    def test_city_index_follows_updates(self):
+        airport = sample_airport(name="test1", close_big_city="Glasgow")
+        airport.close_big_city = "Edinburgh"
+        airport.save()
+
+        self.assertEqual(Airport.objects.ids_for_city("glasgow"), [])
+        self.assertEqual(Airport.objects.ids_for_city("edinb"), [airport.id])
+
+        airport.delete()
+        self.assertEqual(Airport.objects.ids_for_city("edinb"), [])
+
+    def test_city_index_follows_bulk_writes(self):
+        oslo, nice = Airport.objects.bulk_create(
+            [
+                Airport(name="test1", close_big_city="Ósló"),
+                Airport(name="test2", close_big_city="Nice"),
+            ]
+        )
+        self.assertEqual(Airport.objects.ids_for_city("oslo"), [oslo.id])
+
+        Airport.objects.filter(pk=oslo.id).update(close_big_city="Bergen")
+        nice.close_big_city = "Nîmes"
+        Airport.objects.bulk_update([nice], ["close_big_city"])
+
+        self.assertEqual(Airport.objects.ids_for_city("oslo"), [])
+        self.assertEqual(Airport.objects.ids_for_city("BERG"), [oslo.id])
+        self.assertEqual(Airport.objects.ids_for_city("nimes"), [nice.id])
+
+        Airport.objects.filter(pk=nice.id).delete()
+        self.assertEqual(Airport.objects.ids_for_city("nimes"), [])
+
+    def test_filter_airports_by_close_big_city(self):
+        glasgow = sample_airport(name="test1", close_big_city="Glasgow")
+        sample_airport(name="test2", close_big_city="Nice")
+
+        response = self.client.get(AIRPORT_URL, {"close_big_city": "glas"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([airport["id"] for airport in response.data], [glasgow.id])
+
+
+class AirportDestinationsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("test@test1.com", "test1234")
+        self.client.force_authenticate(self.user)
+        self.rome = sample_airport(name="Fiumicino", close_big_city="Rome")
+        self.lviv = sample_airport(name="Lviv", close_big_city="Lviv")
+        self.oslo = sample_airport(name="Gardermoen", close_big_city="Oslo")
+        with self.captureOnCommitCallbacks(execute=True):
+            Route.objects.create(source=self.rome, destination=self.lviv)
+            Route.objects.create(source=self.rome, destination=self.oslo)
+
+    def destinations(self, airport):
+        url = reverse("airlines:airport-detail", args=[airport.id])
+        return self.client.get(url).data["destinations"]
+
+    def test_detail_destinations(self):
+        self.assertEqual(
+            self.destinations(self.rome),
+            [
+                {"id": self.oslo.id, "name": "Gardermoen"},
+                {"id": self.lviv.id, "name": "Lviv"},
+            ],
+        )
+        self.assertEqual(self.destinations(self.lviv), [])
+
+        with self.assertNumQueries(1):
+            self.destinations(self.rome)
+
+    def test_destinations_follow_route_changes(self):
+        self.destinations(self.rome)
+        self.destinations(self.lviv)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            route = Route.objects.get(source=self.rome, destination=self.oslo)
+            route.source = self.lviv
+            route.save()
+        self.assertEqual(
+            self.destinations(self.rome), [{"id": self.lviv.id, "name": "Lviv"}]
+        )
+        self.assertEqual(
+            self.destinations(self.lviv), [{"id": self.oslo.id, "name": "Gardermoen"}]
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.oslo.name = "Oslo Airport"
+            self.oslo.save()
+        self.assertEqual(self.destinations(self.lviv)[0]["name"], "Oslo Airport")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            route.delete()
+        self.assertEqual(self.destinations(self.lviv), [])
+
+    def test_route_changes_reach_every_worker(self):
+        self.destinations(self.rome)
+
+        # nothing runs on commit here, like in a worker that did not write
+        with self.captureOnCommitCallbacks(execute=False):
+            Route.objects.filter(destination=self.oslo).get().delete()
+
+        self.assertEqual(
+            self.destinations(self.rome), [{"id": self.lviv.id, "name": "Lviv"}]
+        )
+
+    def test_list_include_destinations(self):
+        # validator aggregate, airports, destinations of every missed airport
+        with self.assertNumQueries(3):
+            response = self.client.get(AIRPORT_URL, {"include": "destinations"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        destinations = {
+            airport["id"]: len(airport["destinations"]) for airport in response.data
+        }
+        self.assertEqual(
+            destinations, {self.rome.id: 2, self.lviv.id: 0, self.oslo.id: 0}
+        )
+        self.assertNotIn("destinations", self.client.get(AIRPORT_URL).data[0])
+
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                AIRPORT_URL, {"include": "destinations", "fields": "id,destinations"}
+            )
+        self.assertEqual(len(response.data[0]["destinations"]), 2)
+
+
+class AirportConditionalGetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("test@test1.com", "test1234")
+        self.client.force_authenticate(self.user)
+        self.airport = sample_airport(name="Fiumicino", close_big_city="Rome")
+
+    def test_list_not_modified(self):
+        response = self.client.get(AIRPORT_URL)
+        etag = response["ETag"]
+        self.assertIn("Last-Modified", response)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(AIRPORT_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b"")
+
+        other = self.client.get(AIRPORT_URL, {"include": "destinations"})
+        self.assertNotEqual(other["ETag"], etag)
+
+        sample_airport(name="Ciampino", close_big_city="Rome")
+        response = self.client.get(AIRPORT_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+
+    def test_detail_follows_destinations(self):
+        url = reverse("airlines:airport-detail", args=[self.airport.id])
+        etag = self.client.get(url)["ETag"]
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Airport.objects.filter(pk=self.airport.pk).update(updated_at="2000-01-01")
+        with self.captureOnCommitCallbacks(execute=True):
+            Route.objects.create(
+                source=self.airport,
+                destination=sample_airport(name="Lviv", close_big_city="Lviv"),
+            )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["destinations"][0]["name"], "Lviv")
@@ -0,0 +1,157 @@
+from datetime import datetime
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import AsyncClient, TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from airlines import metrics
+from airlines.models import Airport, Route, Flight, Airplane, AirplaneType
+
+FLIGHT_URL = reverse("airlines:flight-list")
+ROUTE_URL = reverse("airlines:route-list")
+ASYNC_FLIGHT_URL = reverse("airlines:async-flight-list")
+ASYNC_ROUTE_URL = reverse("airlines:async-route-list")
+
+
+def async_flight_detail_url(flight_id):
+    return reverse("airlines:async-flight-detail", args=[flight_id])
+
+
+def sample_airport(**params):
+    defaults = {
+        "name": "Test",
+        "close_big_city": "Test city",
+    }
+    defaults.update(params)
+
+    return Airport.objects.create(**defaults)
+
+
+def sample_airplane(**params):
+    defaults = {
+        "name": "Test",
+        "rows": 3,
+        "seats_in_row": 10,
+        "airplane_type": AirplaneType.objects.create(name="Test"),
+    }
+    defaults.update(params)
+
+    return Airplane.objects.create(**defaults)
+
+
+class AsyncSearchApiTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user("test@test1.com", "test1234")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.token = AccessToken.for_user(self.user)
+
+        rome = sample_airport(name="test1", close_big_city="Rome")
+        lviv = sample_airport(name="test2", close_big_city="Lviv")
+        riga = sample_airport(name="test3", close_big_city="Riga")
+        self.route = Route.objects.create(source=rome, destination=lviv)
+        Route.objects.create(source=riga, destination=rome)
+        airplane = sample_airplane()
+        self.flights = [
+            Flight.objects.create(
+                number=f"T{day}",
+                route=self.route,
+                airplane=airplane,
+                departure_time=datetime(2023, 8, day, 10, 30),
+                arrival_time=datetime(2023, 8, day, 12, 30),
+            )
+            for day in range(1, 6)
+        ]
+
+    async def test_list_matches_sync_endpoint(self):
+        params = {"page-size": 2, "route": "Rome", "date_from": "2023-08-02"}
+
+        response = await self.async_get(ASYNC_FLIGHT_URL, params)
+        expected = await self.sync_get(FLIGHT_URL, params)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["results"], expected["results"])
+        self.assertEqual(
+            [flight["number"] for flight in response.json()["results"]], ["T2", "T3"]
+        )
+
+        response = await self.async_get(response.json()["next"])
+        self.assertEqual(
+            [flight["number"] for flight in response.json()["results"]], ["T4", "T5"]
+        )
+        self.assertIsNotNone(response.json()["previous"])
+        self.assertIsNone(response.json()["next"])
+
+    async def test_list_count_and_sparse_fields(self):
+        response = await self.async_get(
+            ASYNC_FLIGHT_URL, {"count": "approximate", "fields": "id,number"}
+        )
+
+        self.assertEqual(response.json()["count"], 5)
+        self.assertEqual(
+            response.json()["results"][0],
+            {"id": self.flights[0].id, "number": "T1"},
+        )
+
+    async def test_invalid_date_is_rejected(self):
+        response = await self.async_get(ASYNC_FLIGHT_URL, {"date_from": "21.08.2023"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("date_from", response.json())
+
+    async def test_detail(self):
+        flight = self.flights[0]
+
+        response = await self.async_get(async_flight_detail_url(flight.id))
+        expected = await self.sync_get(
+            reverse("airlines:flight-detail", args=[flight.id])
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), expected)
+        self.assertEqual(response.json()["airplane_type"], "Test")
+
+    async def test_detail_not_found(self):
+        response = await self.async_get(async_flight_detail_url(0))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_route_list(self):
+        response = await self.async_get(ASYNC_ROUTE_URL, {"source": "Rome"})
+        expected = await self.sync_get(ROUTE_URL, {"source": "Rome"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), expected)
+        self.assertEqual([route["id"] for route in response.json()], [self.route.id])
+
+    async def test_authentication_required(self):
+        response = await AsyncClient().get(ASYNC_FLIGHT_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn("Bearer", response["WWW-Authenticate"])
+
+    async def test_metrics_count_async_queries(self):
+        with mock.patch.object(metrics, "registry", metrics.Registry()) as registry:
+            await self.async_get(ASYNC_FLIGHT_URL)
+
+        labels = (("route", "airlines:async-flight-list"), ("method", "GET"))
+        queries = registry.histograms[("http_request_db_queries", labels)]
+        self.assertEqual(sum(queries[:-1]), 1)
+        self.assertGreater(queries[-1], 0)
+
+    async def async_get(self, url, params=None):
+        # AsyncClient(headers=...) does not reach ASGI requests on Django 4.2
+        return await AsyncClient().get(
+            url, params or {}, headers={"Authorization": f"Bearer {self.token}"}
+        )
+
+    async def sync_get(self, url, params=None):
+        response = await sync_to_async(self.client.get)(url, params or {})
+        return response.json()
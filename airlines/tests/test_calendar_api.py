@@ -0,0 +1,165 @@
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command, CommandError
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from airlines.models import (
+    Airplane,
+    AirplaneType,
+    Airport,
+    Flight,
+    FlightSchedule,
+    Route,
+    RouteDay,
+    Ticket,
+)
+
+ORDER_URL = reverse("airlines:order-list")
+
+
+def calendar_url(route_id):
+    return reverse("airlines:route-calendar", args=[route_id])
+
+
+def sample_flight(route, airplane, departure_time, **params):
+    defaults = {
+        "number": "Test",
+        "route": route,
+        "airplane": airplane,
+        "departure_time": departure_time,
+        "arrival_time": departure_time + timedelta(hours=2),
+    }
+    defaults.update(params)
+
+    return Flight.objects.create(**defaults)
+
+
+class RouteCalendarApiTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("test@test1.com", "test1234")
+        self.client.force_authenticate(self.user)
+
+        self.route = Route.objects.create(
+            source=Airport.objects.create(name="test1", close_big_city="Rome"),
+            destination=Airport.objects.create(name="test2", close_big_city="Lviv"),
+        )
+        self.airplane = Airplane.objects.create(
+            name="Test",
+            rows=2,
+            seats_in_row=4,
+            airplane_type=AirplaneType.objects.create(name="Test"),
+        )
+
+    def day(self, response, day: int) -> dict:
+        return response.data[day - 1]
+
+    def assert_in_sync(self):
+        call_command("rebuild_route_calendar", "--check", stdout=StringIO())
+
+    def test_calendar_of_a_month(self):
+        flight = sample_flight(self.route, self.airplane, datetime(2023, 8, 2, 9))
+        sample_flight(self.route, self.airplane, datetime(2023, 8, 2, 18))
+        sample_flight(self.route, self.airplane, datetime(2023, 8, 5, 9))
+        self.client.post(
+            ORDER_URL,
+            {
+                "tickets": [
+                    {"flight": flight.id, "row": 1, "seat": seat} for seat in (1, 2, 3)
+                ]
+            },
+            format="json",
+        )
+
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                calendar_url(self.route.id), {"month": "2023-08"}
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 31)
+        self.assertEqual(
+            self.day(response, 2),
+            {"date": "2023-08-02", "flights": 2, "seats_left": 13},
+        )
+        self.assertEqual(self.day(response, 5)["seats_left"], 8)
+        self.assertEqual(
+            self.day(response, 6), {"date": "2023-08-06", "flights": 0, "seats_left": 0}
+        )
+        self.assert_in_sync()
+
+    def test_writes_update_the_calendar(self):
+        flight = sample_flight(self.route, self.airplane, datetime(2023, 8, 2, 9))
+        self.client.post(
+            ORDER_URL,
+            {"tickets": [{"flight": flight.id, "row": 1, "seat": 1}]},
+            format="json",
+        )
+
+        flight.refresh_from_db()
+        flight.departure_time = datetime(2023, 8, 3, 9)
+        flight.save()
+        response = self.client.get(calendar_url(self.route.id), {"month": "2023-08"})
+        self.assertEqual(self.day(response, 2)["flights"], 0)
+        self.assertEqual(self.day(response, 3)["seats_left"], 7)
+        self.assertFalse(RouteDay.objects.filter(day=date(2023, 8, 2)).exists())
+        self.assert_in_sync()
+
+        Ticket.objects.get().delete()
+        self.assertEqual(RouteDay.objects.get().seats_left, 8)
+
+        self.airplane.rows = 3
+        self.airplane.save()
+        self.assertEqual(RouteDay.objects.get().seats_left, 12)
+
+        flight.delete()
+        self.assertFalse(RouteDay.objects.exists())
+
+    def test_scheduled_flights_are_counted(self):
+        today = date.today()
+        monday = today + timedelta(days=7 - today.weekday())
+        FlightSchedule.objects.create(
+            number="SC-1",
+            route=self.route,
+            airplane=self.airplane,
+            weekdays="1",
+            departure_time=time(10, 0),
+            duration=timedelta(hours=2),
+            valid_from=monday,
+            valid_until=monday,
+        )
+        sample_flight(self.route, self.airplane, datetime.combine(monday, time(8)))
+
+        response = self.client.get(
+            calendar_url(self.route.id), {"month": monday.strftime("%Y-%m")}
+        )
+
+        self.assertEqual(
+            self.day(response, monday.day),
+            {"date": str(monday), "flights": 2, "seats_left": 16},
+        )
+
+    def test_invalid_month(self):
+        response = self.client.get(calendar_url(self.route.id), {"month": "2023-13"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rebuild_repairs_drift(self):
+        sample_flight(self.route, self.airplane, datetime(2023, 8, 2, 9))
+        RouteDay.objects.update(seats_left=0)
+        RouteDay.objects.create(route=self.route, day=date(2023, 8, 9), flights=1)
+
+        with self.assertRaises(CommandError):
+            self.assert_in_sync()
+
+        call_command("rebuild_route_calendar", stdout=StringIO())
+        self.assert_in_sync()
+        self.assertEqual(
+            list(RouteDay.objects.values_list("day", "flights", "seats_left")),
+            [(date(2023, 8, 2), 1, 8)],
+        )
@@ -0,0 +1,240 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command, CommandError
+from django.test import TestCase
+
+from airlines import metrics
+from airlines.benchmarks import load_run
+from airlines.management.commands.benchmark_report import Command
+from airlines.models import (
+    Airplane,
+    AirplaneType,
+    Airport,
+    Flight,
+    Route,
+    Ticket,
+)
+from airlines.task import histogram
+
+
+class SeedDataCommandTest(TestCase):
+    def test_seed_data(self):
+        call_command(
+            "seed_data",
+            airports=5,
+            routes=10,
+            airplanes=2,
+            users=2,
+            flights=30,
+            tickets_per_flight=3,
+            batch_size=7,
+            stdout=StringIO(),
+        )
+
+        self.assertEqual(Airport.objects.count(), 5)
+        self.assertEqual(Flight.objects.count(), 30)
+        self.assertEqual(Ticket.objects.count(), 90)
+        self.assertEqual(len(Airport.objects.ids_for_city("london")), 1)
+        call_command("rebuild_tickets_sold", "--check", stdout=StringIO())
+        call_command("rebuild_route_calendar", "--check", stdout=StringIO())
+
+
+class ImportScheduleCommandTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.rome = Airport.objects.create(name="FCO", close_big_city="Rome")
+        self.lviv = Airport.objects.create(name="LWO", close_big_city="Lviv")
+        self.route = Route.objects.create(source=self.rome, destination=self.lviv)
+        airplane_type = AirplaneType.objects.create(name="Test")
+        self.airplane = Airplane.objects.create(
+            name="A320", rows=3, seats_in_row=10, airplane_type=airplane_type
+        )
+        Airplane.objects.create(
+            name="B737", rows=3, seats_in_row=6, airplane_type=airplane_type
+        )
+
+    def write(self, name: str, lines: list) -> str:
+        path = os.path.join(self.directory.name, name)
+        with open(path, "w") as file:
+            file.write("\n".join(lines) + "\n")
+        return path
+
+    def import_schedule(self, path: str, **options):
+        out, err = StringIO(), StringIO()
+        call_command("import_schedule", path, stdout=out, stderr=err, **options)
+        return out.getvalue(), err.getvalue()
+
+    def test_csv_upserts_by_number_and_departure(self):
+        existing = Flight.objects.create(
+            number="PS101",
+            route=self.route,
+            airplane=self.airplane,
+            departure_time="2023-08-21 10:30",
+            arrival_time="2023-08-21 12:00",
+        )
+        path = self.write(
+            "schedule.csv",
+            [
+                "number,source,destination,airplane,departure_time,arrival_time",
+                "PS101,FCO,LWO,B737,2023-08-21 10:30,2023-08-21 12:45",
+                "PS102,FCO,LWO,A320,2023-08-22T10:30,2023-08-22T12:30",
+                "PS103,FCO,XXX,A320,2023-08-22T10:30,2023-08-22T12:30",
+                "PS104,FCO,LWO,A320,2023-08-22T10:30,2023-08-22T09:30",
+                "PS105,FCO,LWO,A320,2023-08-22T10:30,2023-08-22T12:30",
+            ],
+        )
+
+        out, err = self.import_schedule(path, chunk_size=2)
+
+        self.assertIn("5 rows: 2 created, 1 updated, 0 unchanged, 2 rejected", out)
+        self.assertIn("line 4: unknown airport 'XXX'", err)
+        self.assertIn("line 5: arrival_time must be after departure_time", err)
+        existing.refresh_from_db()
+        self.assertEqual(existing.airplane.name, "B737")
+        self.assertEqual(existing.arrival_time.hour, 12)
+        self.assertEqual(existing.arrival_time.minute, 45)
+        self.assertEqual(
+            sorted(Flight.objects.values_list("number", flat=True)),
+            ["PS101", "PS102", "PS105"],
+        )
+
+        out, _ = self.import_schedule(path)
+        self.assertIn("2 rejected", out)
+        self.assertIn("0 created, 0 updated, 3 unchanged", out)
+        self.assertEqual(Flight.objects.count(), 3)
+
+    def test_ndjson_with_new_routes(self):
+        rows = [
+            {
+                "number": "PS201",
+                "source": "LWO",
+                "destination": "FCO",
+                "airplane": "A320",
+                "departure_time": "2023-08-21T10:30:00",
+                "arrival_time": "2023-08-21T12:30:00",
+            },
+            "not json",
+        ]
+        path = self.write(
+            "schedule.ndjson",
+            [json.dumps(row) if isinstance(row, dict) else row for row in rows],
+        )
+
+        out, err = self.import_schedule(path)
+        self.assertIn("line 1: no route from 'LWO' to 'FCO'", err)
+        self.assertIn("line 2: not a JSON object", err)
+        self.assertEqual(Flight.objects.count(), 0)
+
+        self.import_schedule(path, create_routes=True)
+        flight = Flight.objects.get()
+        self.assertEqual(flight.route.source, self.lviv)
+        self.assertEqual(Route.objects.count(), 2)
+
+    def test_dry_run_and_error_limit(self):
+        path = self.write(
+            "schedule.csv",
+            [
+                "number,source,destination,airplane,departure_time,arrival_time",
+                "PS301,FCO,LWO,A320,2023-08-21 10:30,2023-08-21 12:30",
+                "PS302,FCO,LWO,A380,2023-08-21 10:30,2023-08-21 12:30",
+                "PS303,FCO,LWO,A380,2023-08-21 10:30,2023-08-21 12:30",
+            ],
+        )
+
+        out, _ = self.import_schedule(path, dry_run=True)
+        self.assertIn("3 rows: 0 created, 0 updated, 0 unchanged, 2 rejected", out)
+        self.assertEqual(Flight.objects.count(), 0)
+
+        with self.assertRaises(CommandError):
+            self.import_schedule(path, max_errors=1)
+
+        with self.assertRaises(CommandError):
+            self.import_schedule(self.write("schedule.txt", ["PS101"]))
+
+
+def benchmark_run(p95: float, queries: float) -> dict:
+    return {
+        "meta": {},
+        "endpoints": {
+            "flights-list": {
+                "requests": 3,
+                "latency_ms": {"p50": 10.0, "p95": p95, "p99": p95},
+                "queries": {"mean": queries, "max": queries},
+                "samples_ms": [4.0, 10.0, p95],
+            }
+        },
+    }
+
+
+class BenchmarkReportCommandTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name: str, content) -> str:
+        path = os.path.join(self.directory.name, name)
+        with open(path, "w") as file:
+            file.write(content if isinstance(content, str) else json.dumps(content))
+        return path
+
+    def report(self, *runs, **options) -> str:
+        out = StringIO()
+        call_command("benchmark_report", *runs, stdout=out, **options)
+        return out.getvalue()
+
+    def test_histogram(self):
+        self.assertEqual(histogram([0, 2, 1]), "3| #1\n2| ##2\n1|\n")
+        self.assertEqual(histogram([100, 0], width=10), "2|\n1| ##########100\n")
+
+    def test_empty_histogram_and_baseline(self):
+        self.assertEqual(Command.histogram([0, 0, 0]), "")
+
+        baseline = self.write("base.json", benchmark_run(0.0, 3))
+        current = self.write("current.json", benchmark_run(40.0, 3))
+
+        output = self.report(baseline, current)
+
+        self.assertIn("p95", output)
+        self.assertIn("no baseline", output)
+        self.assertIn("No regressions", output)
+
+    def test_no_regression(self):
+        baseline = self.write("base.json", benchmark_run(20.0, 3))
+        current = self.write("current.json", benchmark_run(20.5, 3))
+
+        output = self.report(baseline, current)
+
+        self.assertIn("No regressions", output)
+        self.assertIn("<=25ms| #1", output)
+
+    def test_latency_and_query_regressions(self):
+        baseline = self.write("base.json", benchmark_run(20.0, 3))
+
+        with self.assertRaisesMessage(CommandError, "flights-list"):
+            self.report(baseline, self.write("slow.json", benchmark_run(40.0, 3)))
+        with self.assertRaisesMessage(CommandError, "flights-list"):
+            self.report(baseline, self.write("n+1.json", benchmark_run(20.0, 30)))
+
+        self.report(
+            baseline, self.write("slow.json", benchmark_run(40.0, 3)), threshold=150
+        )
+
+    def test_metrics_scrape(self):
+        registry = metrics.Registry()
+        for seconds in (0.004, 0.02, 0.02, 0.3):
+            registry.record("airlines:flight-list", "GET", 200, seconds, 2, 0.001, 512)
+        path = self.write(
+            "scrape.txt", metrics.render(metrics.merge([registry.snapshot()]))
+        )
+
+        run = load_run(path)["GET airlines:flight-list"]
+
+        self.assertEqual(run["requests"], 4)
+        self.assertEqual(run["queries"], 2)
+        self.assertEqual(run["histogram"][:7], [1, 0, 2, 0, 0, 0, 1])
+        self.assertEqual(run["p50"], 17.5)
+        self.assertIn("<=500ms| #1", self.report(path))
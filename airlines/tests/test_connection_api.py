@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from airlines import itinerary
+from airlines.cache import bump_version
+from airlines.models import Airport, Route, Flight, Airplane, AirplaneType
+
+CONNECTION_URL = reverse("airlines:connection-list")
+
+
+class ConnectionSearchApiTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("test@test1.com", "test1234")
+        self.client.force_authenticate(self.user)
+        itinerary.invalidate()
+
+        self.airports = {
+            code: Airport.objects.create(name=code, close_big_city=code)
+            for code in ("A", "B", "C")
+        }
+        self.airplane = Airplane.objects.create(
+            name="Test",
+            rows=3,
+            seats_in_row=10,
+            airplane_type=AirplaneType.objects.create(name="Test"),
+        )
+        self.day = (datetime.now() + timedelta(days=1)).replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        self.add_flight("A", "C", 9, 15)
+        self.add_flight("A", "B", 10, 11)
+        self.add_flight("B", "C", 11.5, 12.5)
+        self.add_flight("B", "C", 12.5, 13.5)
+
+    def add_flight(self, source, destination, departure, arrival):
+        route, _ = Route.objects.get_or_create(
+            source=self.airports[source], destination=self.airports[destination]
+        )
+        return Flight.objects.create(
+            number=f"{source}{destination}{departure}",
+            route=route,
+            airplane=self.airplane,
+            departure_time=self.day + timedelta(hours=departure),
+            arrival_time=self.day + timedelta(hours=arrival),
+        )
+
+    def search(self, **params):
+        defaults = {
+            "source": self.airports["A"].id,
+            "destination": self.airports["C"].id,
+            "departure": self.day.isoformat(),
+        }
+        defaults.update(params)
+        return self.client.get(CONNECTION_URL, defaults)
+
+    def flight_numbers(self, response):
+        return [
+            [leg["number"] for leg in journey["legs"]] for journey in response.data
+        ]
+
+    def test_fewest_legs_and_earliest_arrival(self):
+        response = self.search(min_connection=60)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            self.flight_numbers(response), [["AC9"], ["AB10", "BC12.5"]]
+        )
+
+    def test_min_connection_time(self):
+        response = self.search(min_connection=30)
+
+        self.assertEqual(self.flight_numbers(response), [["AC9"], ["AB10", "BC11.5"]])
+
+    def test_window_bounds_the_first_leg_only(self):
+        response = self.search(
+            departure=(self.day + timedelta(hours=9.5)).isoformat(),
+            window=1,
+            min_connection=30,
+        )
+
+        self.assertEqual(self.flight_numbers(response), [["AB10", "BC11.5"]])
+
+    def test_graph_is_updated_incrementally(self):
+        self.search()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.add_flight("A", "C", 9.5, 11.5)
+
+        with self.assertNumQueries(0):
+            response = self.search()
+
+        self.assertEqual(self.flight_numbers(response), [["AC9.5"]])
+
+    def test_change_in_another_worker_rebuilds_the_graph(self):
+        self.search()
+        # the other worker's signals never patch this graph; only the
+        # shared version tells it about the new flight
+        with self.captureOnCommitCallbacks(execute=False):
+            self.add_flight("A", "C", 9.5, 11.5)
+        bump_version(itinerary.NAMESPACE)
+
+        response = self.search()
+
+        self.assertEqual(self.flight_numbers(response), [["AC9.5"]])
+
+    def test_same_source_and_destination(self):
+        response = self.search(destination=self.airports["A"].id)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
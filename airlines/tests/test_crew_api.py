@@ -1,7 +1,12 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+
+from django.test import TestCase, override_settings
 
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+from PIL import Image
 from rest_framework import status
 from rest_framework.test import APIClient
 from airlines.models import Airport, Route, Flight, Airplane, AirplaneType, Crew
@@ -61,3 +66,69 @@ class CrewApiTest(TestCase):
         self.assertEqual(
             crew_list[0].full_name, f"{payload['first_name']} {payload['last_name']}"
         )
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, IMAGE_WORKERS=0)
+class CrewImageTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@test1.com", "test1234", is_staff=True
+        )
+        self.client.force_authenticate(self.user)
+
+    def upload(self, crew):
+        buffer = io.BytesIO()
+        Image.new("RGB", (1000, 500), "red").save(buffer, "PNG")
+        buffer.name = "photo.png"
+        buffer.seek(0)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.put(
+                detail_url(crew.id),
+                {"first_name": "Hanna", "last_name": "Jones", "image": buffer},
+                format="multipart",
+            )
+
+    def test_upload_renders_derivatives(self):
+        crew = sample_crew()
+        response = self.upload(crew)
+        crew.refresh_from_db()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(crew.image_derivatives["source"], crew.image.name)
+
+        images = self.client.get(detail_url(crew.id)).data["images"]
+        self.assertEqual(set(images), {"thumbnail", "card", "full"})
+        self.assertEqual(
+            (images["thumbnail"]["width"], images["thumbnail"]["height"]), (160, 80)
+        )
+        # never upscaled
+        self.assertEqual(
+            (images["full"]["width"], images["full"]["height"]), (1000, 500)
+        )
+        self.assertTrue(images["card"]["webp"].startswith("http://testserver/media/"))
+        self.assertTrue(images["card"]["jpeg"].endswith("-card.jpg"))
+
+        with Image.open(
+            f"{MEDIA_ROOT}/{crew.image_derivatives['card']['webp']}"
+        ) as card:
+            self.assertEqual((card.format, card.size), ("WEBP", (480, 240)))
+
+    def test_clearing_image_drops_derivatives(self):
+        crew = sample_crew()
+        self.upload(crew)
+        crew.refresh_from_db()
+
+        crew.image = None
+        crew.save()
+        crew.refresh_from_db()
+
+        self.assertEqual(crew.image_derivatives, {})
@@ -1,13 +1,22 @@
+import base64
+import io
 from datetime import datetime
 
+from django.core.cache import cache
+from django.db import connection
 from django.db.models import F, Count
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext, override_settings
 
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from rest_framework import status
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
+from airlines.checks import check_response_cache
 from airlines.models import Airport, Route, Flight, Airplane, AirplaneType
+from airlines.renderers import FastJSONParser, FastJSONRenderer
 from airlines.serializers import FlightListSerializer
 
 FLIGHT_URL = reverse("airlines:flight-list")
@@ -91,7 +100,7 @@ class AuthenticatedFlightApiTest(TestCase):
             tickets_available=(
                 F("airplane__rows") * F("airplane__seats_in_row") - Count("tickets")
             )
-        )
+        ).order_by("departure_time", "id")
         """Create response from flight-list"""
         response = self.client.get(FLIGHT_URL)
         """Create response from flight-list with filtering"""
@@ -107,6 +116,304 @@ class AuthenticatedFlightApiTest(TestCase):
         )
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, serializer.data)
-        self.assertIn(serializer1.data, response1.data)
-        self.assertIn(serializer2.data, response2.data)
+        self.assertEqual(response.data["results"], serializer.data)
+        self.assertIn(serializer1.data, response1.data["results"])
+        self.assertIn(serializer2.data, response2.data["results"])
+
+    def test_list_flight_cursor_pagination(self):
+        route = Route.objects.create(
+            source=sample_airport(name="test1", close_big_city="Rome"),
+            destination=sample_airport(name="test2", close_big_city="Lviv"),
+        )
+        airplane = sample_airplane()
+        for day in range(1, 6):
+            Flight.objects.create(
+                number=f"T{day}",
+                route=route,
+                airplane=airplane,
+                departure_time=datetime(2023, 8, day, 10, 30),
+                arrival_time=datetime(2023, 8, day, 12, 30),
+            )
+
+        response = self.client.get(FLIGHT_URL, {"page-size": 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("count", response.data)
+        self.assertIsNone(response.data["previous"])
+        self.assertEqual(
+            [flight["number"] for flight in response.data["results"]], ["T1", "T2"]
+        )
+
+        response = self.client.get(response.data["next"])
+        self.assertEqual(
+            [flight["number"] for flight in response.data["results"]], ["T3", "T4"]
+        )
+        self.assertIsNotNone(response.data["previous"])
+
+    def test_filter_flight_by_date_ranges(self):
+        route = Route.objects.create(
+            source=sample_airport(name="test1", close_big_city="Rome"),
+            destination=sample_airport(name="test2", close_big_city="Lviv"),
+        )
+        airplane = sample_airplane()
+        for day in (20, 21, 22):
+            Flight.objects.create(
+                number=f"T{day}",
+                route=route,
+                airplane=airplane,
+                departure_time=datetime(2023, 8, day, 23, 30),
+                arrival_time=datetime(2023, 8, day + 1, 1, 30),
+            )
+
+        def numbers(params):
+            response = self.client.get(FLIGHT_URL, params)
+            return [flight["number"] for flight in response.data["results"]]
+
+        self.assertEqual(numbers({"date": "2023-08-21"}), ["T21"])
+        self.assertEqual(
+            numbers({"date_from": "2023-08-21", "date_to": "2023-08-22"}),
+            ["T21", "T22"],
+        )
+        self.assertEqual(numbers({"arrival_date": "2023-08-22"}), ["T21"])
+
+    def test_filter_flight_by_invalid_date(self):
+        response = self.client.get(FLIGHT_URL, {"date_from": "21.08.2023"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_flight_approximate_count(self):
+        route = Route.objects.create(
+            source=sample_airport(name="test1", close_big_city="Rome"),
+            destination=sample_airport(name="test2", close_big_city="Lviv"),
+        )
+        Flight.objects.create(
+            number="Test",
+            route=route,
+            airplane=sample_airplane(),
+            departure_time=datetime(2023, 8, 21, 10, 30),
+            arrival_time=datetime(2023, 8, 21, 12, 30),
+        )
+
+        response = self.client.get(FLIGHT_URL, {"count": "approximate"})
+
+        self.assertEqual(response.data["count"], 1)
+
+
+class FlightSeatMapApiTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("test@test1.com", "test1234")
+        self.client.force_authenticate(self.user)
+        route = Route.objects.create(
+            source=sample_airport(name="test1", close_big_city="Rome"),
+            destination=sample_airport(name="test2", close_big_city="Lviv"),
+        )
+        self.flight = Flight.objects.create(
+            number="Test",
+            route=route,
+            airplane=sample_airplane(rows=2, seats_in_row=6),
+            departure_time=datetime(2023, 8, 21, 10, 30),
+            arrival_time=datetime(2023, 8, 21, 12, 30),
+        )
+        self.url = reverse("airlines:flight-seats", args=[self.flight.id])
+        cache.clear()
+
+    def book(self, row, seat):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("airlines:order-list"),
+                {"tickets": [{"flight": self.flight.id, "row": row, "seat": seat}]},
+                format="json",
+            )
+
+    def test_seat_map_is_packed_bitset(self):
+        self.book(1, 2)
+        self.book(2, 6)
+
+        response = self.client.get(self.url, {"expanded": "true"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(base64.b64decode(response.data["occupied"]), b"\x40\x10")
+        self.assertEqual(
+            response.data["seats"], [[0, 1, 0, 0, 0, 0], [0, 0, 0, 0, 0, 1]]
+        )
+
+    def test_seat_map_is_rebuilt_after_an_order(self):
+        self.client.get(self.url)
+        self.book(1, 1)
+
+        # the order dropped the cached bitmap: the flight, its tickets and
+        # the holds load; holds are never cached
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+
+        self.assertEqual(base64.b64decode(response.data["occupied"]), b"\x80\x00")
+        self.assertNotIn("seats", response.data)
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+
+
+class FlightResponseCacheTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@test1.com", "test1234", is_staff=True
+        )
+        self.client.force_authenticate(self.user)
+        self.route = Route.objects.create(
+            source=sample_airport(name="test1", close_big_city="Rome"),
+            destination=sample_airport(name="test2", close_big_city="Lviv"),
+        )
+        self.airplane = sample_airplane()
+
+    def create_flight(self, number):
+        return Flight.objects.create(
+            number=number,
+            route=self.route,
+            airplane=self.airplane,
+            departure_time=datetime(2023, 8, 21, 10, 30),
+            arrival_time=datetime(2023, 8, 21, 12, 30),
+        )
+
+    def test_list_is_cached_until_flights_change(self):
+        self.create_flight("T1")
+
+        first = self.client.get(FLIGHT_URL)
+        with self.assertNumQueries(0):
+            second = self.client.get(FLIGHT_URL)
+
+        self.assertEqual(first["X-Cache"], "MISS")
+        self.assertEqual(second["X-Cache"], "HIT")
+        self.assertEqual(first.data, second.data)
+
+        self.create_flight("T2")
+        third = self.client.get(FLIGHT_URL)
+
+        self.assertEqual(third["X-Cache"], "MISS")
+        self.assertEqual(len(third.data["results"]), 2)
+
+    def test_query_params_are_normalized(self):
+        self.create_flight("T1")
+
+        self.client.get(FLIGHT_URL, {"route": "Rome", "date": "2023-08-21"})
+        response = self.client.get(FLIGHT_URL, {"date": "2023-08-21", "route": "Rome"})
+
+        self.assertEqual(response["X-Cache"], "HIT")
+
+    def test_cache_stats(self):
+        self.create_flight("T1")
+        before = self.client.get(reverse("airlines:cache-stats")).data["flights"]
+
+        self.client.get(FLIGHT_URL)
+        self.client.get(FLIGHT_URL)
+        after = self.client.get(reverse("airlines:cache-stats")).data["flights"]
+
+        self.assertEqual(after["hits"] - before["hits"], 1)
+        self.assertEqual(after["misses"] - before["misses"], 1)
+
+
+class FlightSparseFieldsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("test@test1.com", "test1234")
+        self.client.force_authenticate(self.user)
+        self.flight = Flight.objects.create(
+            number="Test",
+            route=Route.objects.create(
+                source=sample_airport(name="test1", close_big_city="Rome"),
+                destination=sample_airport(name="test2", close_big_city="Lviv"),
+            ),
+            airplane=sample_airplane(),
+            departure_time=datetime(2023, 8, 21, 10, 30),
+            arrival_time=datetime(2023, 8, 21, 12, 30),
+        )
+
+    def get(self, url, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, queries[-1]["sql"]
+
+    def test_list_fields(self):
+        response, sql = self.get(FLIGHT_URL, {"fields": "id,route,departure_time"})
+
+        self.assertEqual(
+            response.data["results"],
+            [
+                {
+                    "id": self.flight.id,
+                    "route": self.flight.route_id,
+                    "departure_time": "2023-08-21T10:30:00",
+                }
+            ],
+        )
+        self.assertNotIn("airlines_route", sql)
+        self.assertNotIn('"number"', sql)
+
+    def test_list_expand(self):
+        response, sql = self.get(FLIGHT_URL, {"fields": "id,route", "expand": "route"})
+
+        route = response.data["results"][0]["route"]
+        self.assertEqual(route["source"]["name"], "test1")
+        self.assertEqual(route["destination"]["close_big_city"], "Lviv")
+        self.assertIn("airlines_route", sql)
+
+    def test_detail_lean(self):
+        url = reverse("airlines:flight-detail", args=[self.flight.id])
+
+        response, sql = self.get(url, {"expand": "airplane"})
+
+        self.assertEqual(response.data["route"], self.flight.route_id)
+        self.assertEqual(response.data["airplane"]["rows"], 3)
+        self.assertEqual(response.data["airplane_type"], "Test")
+        self.assertNotIn("airlines_route", sql)
+
+        response, _ = self.get(url, {})
+        self.assertEqual(response.data["route"]["source"]["name"], "test1")
+
+
+class FastJSONRendererTest(TestCase):
+    def test_output_matches_stock_renderer(self):
+        route = Route.objects.create(
+            source=sample_airport(name="test1", close_big_city="Kraków"),
+            destination=sample_airport(name="test2", close_big_city="Lviv"),
+        )
+        Flight.objects.create(
+            number="Test",
+            route=route,
+            airplane=sample_airplane(),
+            departure_time=datetime(2023, 8, 21, 10, 30),
+            arrival_time=datetime(2023, 8, 21, 12, 30),
+        )
+        flights = Flight.objects.annotate(tickets_available=F("tickets_sold"))
+        data = {
+            "results": FlightListSerializer(flights, many=True).data,
+            "fetched_at": datetime(2023, 8, 21, 9, 0, 0, 123456),
+            "note": "line\u2028separator",
+        }
+
+        rendered = FastJSONRenderer().render(data)
+
+        self.assertEqual(rendered, JSONRenderer().render(data))
+        self.assertEqual(
+            FastJSONParser().parse(io.BytesIO(rendered)),
+            JSONParser().parse(io.BytesIO(rendered)),
+        )
+
+
+class ResponseCacheCheckTest(SimpleTestCase):
+    def test_per_process_cache_with_several_workers(self):
+        with override_settings(WEB_CONCURRENCY=4):
+            self.assertEqual(
+                [warning.id for warning in check_response_cache(None)],
+                ["airlines.W001"],
+            )
+        with override_settings(WEB_CONCURRENCY=1):
+            self.assertEqual(check_response_cache(None), [])
+        shared = {
+            "BACKEND": "django.core.cache.backends.dummy.DummyCache",
+        }
+        with override_settings(
+            WEB_CONCURRENCY=4, CACHES={"default": shared, "responses": shared}
+        ):
+            self.assertEqual(check_response_cache(None), [])
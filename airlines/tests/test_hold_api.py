@@ -0,0 +1,126 @@
+from datetime import datetime, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from airlines.models import Airport, Route, Flight, Airplane, AirplaneType, SeatHold
+
+HOLD_URL = reverse("airlines:seathold-list")
+ORDER_URL = reverse("airlines:order-list")
+
+
+def sample_flight(**params):
+    route = Route.objects.create(
+        source=Airport.objects.create(name="test1", close_big_city="Rome"),
+        destination=Airport.objects.create(name="test2", close_big_city="Lviv"),
+    )
+    defaults = {
+        "number": "Test",
+        "route": route,
+        "airplane": Airplane.objects.create(
+            name="Test",
+            rows=2,
+            seats_in_row=4,
+            airplane_type=AirplaneType.objects.create(name="Test"),
+        ),
+        "departure_time": datetime(2023, 8, 21, 10, 30),
+        "arrival_time": datetime(2023, 8, 21, 12, 30),
+    }
+    defaults.update(params)
+
+    return Flight.objects.create(**defaults)
+
+
+class SeatHoldApiTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("test@test1.com", "test1234")
+        self.other = get_user_model().objects.create_user("test@test2.com", "test1234")
+        self.client.force_authenticate(self.user)
+        self.flight = sample_flight()
+        cache.clear()
+
+    def hold(self, *seats, user=None):
+        client = APIClient()
+        client.force_authenticate(user or self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            return client.post(
+                HOLD_URL,
+                {
+                    "flight": self.flight.id,
+                    "seats": [{"row": row, "seat": seat} for row, seat in seats],
+                },
+                format="json",
+            )
+
+    def test_hold_seats(self):
+        response = self.hold((1, 1), (1, 2))
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(self.client.get(HOLD_URL).data), 2)
+
+    def test_seat_held_by_other_user(self):
+        self.hold((1, 1), user=self.other)
+
+        response = self.hold((1, 1), (1, 2))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.json()["seats_unavailable"], [{"row": "1", "seat": "1"}]
+        )
+        self.assertFalse(SeatHold.objects.filter(user=self.user).exists())
+
+    def test_expired_hold_frees_seat(self):
+        self.hold((1, 1), user=self.other)
+        SeatHold.objects.update(expires_at=datetime.now() - timedelta(seconds=1))
+
+        response = self.hold((1, 1))
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(SeatHold.objects.get().user, self.user)
+
+    def test_order_converts_own_holds(self):
+        self.hold((1, 1))
+
+        response = self.client.post(
+            ORDER_URL,
+            {"tickets": [{"flight": self.flight.id, "row": 1, "seat": 1}]},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(SeatHold.objects.exists())
+
+    def test_order_rejects_seats_held_by_others(self):
+        self.hold((1, 1), user=self.other)
+
+        response = self.client.post(
+            ORDER_URL,
+            {"tickets": [{"flight": self.flight.id, "row": 1, "seat": 1}]},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("seats_held", response.json()["tickets"])
+
+    def test_seat_map_shows_held_seats(self):
+        url = reverse("airlines:flight-seats", args=[self.flight.id])
+        self.client.get(url)
+        self.hold((2, 4))
+
+        response = self.client.get(url, {"expanded": "true"})
+
+        self.assertEqual(response.data["seats"], [[0, 0, 0, 0], [0, 0, 0, 2]])
+
+    def test_release_hold(self):
+        hold_id = self.hold((1, 1)).data[0]["id"]
+
+        response = self.client.delete(reverse("airlines:seathold-detail", args=[hold_id]))
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(SeatHold.objects.exists())
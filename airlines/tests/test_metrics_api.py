@@ -0,0 +1,95 @@
+import json
+import os
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from airlines import metrics
+
+FLIGHT_URL = reverse("airlines:flight-list")
+METRICS_URL = reverse("metrics")
+
+
+@override_settings(METRICS_TOKEN="scraper")
+class MetricsApiTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("test@test1.com", "test1234")
+        self.client.force_authenticate(self.user)
+        patcher = mock.patch.object(metrics, "registry", metrics.Registry())
+        self.registry = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def scrape(self) -> str:
+        response = self.client.get(METRICS_URL, HTTP_AUTHORIZATION="Bearer scraper")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        return response.content.decode()
+
+    def test_requests_are_recorded_per_route(self):
+        self.client.get(FLIGHT_URL)
+        self.client.get(FLIGHT_URL)
+
+        text = self.scrape()
+
+        labels = 'route="airlines:flight-list",method="GET"'
+        self.assertIn(f'http_requests_total{{{labels},status="200"}} 2', text)
+        self.assertIn(
+            f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 2', text
+        )
+        self.assertIn(f"http_request_duration_seconds_count{{{labels}}} 2", text)
+        self.assertIn(f"http_request_db_queries_count{{{labels}}} 2", text)
+        self.assertIn(f"http_response_size_bytes_count{{{labels}}} 2", text)
+        self.assertIn("# TYPE http_request_db_duration_seconds histogram", text)
+
+    def test_processes_are_aggregated(self):
+        with tempfile.TemporaryDirectory() as directory:
+            labels = [["route", "airlines:flight-list"], ["method", "GET"]]
+            other = {
+                "histograms": [
+                    [
+                        "http_request_db_queries",
+                        labels,
+                        [0, 0, 3] + [0] * 7 + [6.0],
+                    ]
+                ],
+                "counters": [["http_requests_total", labels + [["status", "200"]], 3]],
+            }
+            with open(os.path.join(directory, "metrics-1-other.json"), "w") as file:
+                json.dump(other, file)
+
+            with override_settings(METRICS_DIR=directory):
+                self.client.get(FLIGHT_URL)
+                text = self.scrape()
+
+        self.assertIn(
+            'http_requests_total{route="airlines:flight-list",method="GET",'
+            'status="200"} 4',
+            text,
+        )
+        self.assertIn(
+            'http_request_db_queries_count{route="airlines:flight-list",method="GET"} 4',
+            text,
+        )
+
+    def test_scrapes_need_the_token_or_staff(self):
+        self.assertEqual(self.client.get(METRICS_URL).status_code, 403)
+        response = self.client.get(METRICS_URL, HTTP_AUTHORIZATION="Bearer other")
+        self.assertEqual(response.status_code, 403)
+
+        staff = get_user_model().objects.create_user(
+            "staff@test.com", "test1234", is_staff=True
+        )
+        self.client.force_login(staff)
+        self.assertEqual(self.client.get(METRICS_URL).status_code, 200)
+
+    @override_settings(WEB_CONCURRENCY=4, METRICS_DIR=None)
+    def test_several_workers_need_a_metrics_dir(self):
+        with self.assertLogs("airlines.metrics", "ERROR"):
+            response = self.client.get(METRICS_URL, HTTP_AUTHORIZATION="Bearer scraper")
+
+        self.assertEqual(response.status_code, 503)
@@ -0,0 +1,174 @@
+from datetime import datetime
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command, CommandError
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from airlines.models import Airport, Route, Flight, Airplane, AirplaneType, Ticket
+
+ORDER_URL = reverse("airlines:order-list")
+FLIGHT_URL = reverse("airlines:flight-list")
+
+
+def sample_flight(**params):
+    airplane_type = AirplaneType.objects.create(name="Test")
+    route = Route.objects.create(
+        source=Airport.objects.create(name="test1", close_big_city="Rome"),
+        destination=Airport.objects.create(name="test2", close_big_city="Lviv"),
+    )
+    defaults = {
+        "number": "Test",
+        "route": route,
+        "airplane": Airplane.objects.create(
+            name="Test", rows=3, seats_in_row=10, airplane_type=airplane_type
+        ),
+        "departure_time": datetime(2023, 8, 21, 10, 30),
+        "arrival_time": datetime(2023, 8, 21, 12, 30),
+    }
+    defaults.update(params)
+
+    return Flight.objects.create(**defaults)
+
+
+class AuthenticatedOrderApiTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("test@test1.com", "test1234")
+        self.client.force_authenticate(self.user)
+        self.flight = sample_flight()
+
+    def create_order(self, *seats):
+        payload = {
+            "tickets": [
+                {"flight": self.flight.id, "row": row, "seat": seat}
+                for row, seat in seats
+            ]
+        }
+        return self.client.post(ORDER_URL, payload, format="json")
+
+    def test_create_order_updates_tickets_sold(self):
+        response = self.create_order((1, 1), (1, 2))
+        self.flight.refresh_from_db()
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.flight.tickets_sold, 2)
+
+        flight = self.client.get(FLIGHT_URL).data["results"][0]
+        self.assertEqual(flight["tickets_available"], 28)
+
+    def test_delete_ticket_updates_tickets_sold(self):
+        self.create_order((1, 1), (1, 2))
+        Ticket.objects.filter(flight=self.flight, row=1, seat=1).delete()
+        self.flight.refresh_from_db()
+
+        self.assertEqual(self.flight.tickets_sold, 1)
+
+    def test_rebuild_tickets_sold_command(self):
+        self.create_order((1, 1))
+        Flight.objects.filter(pk=self.flight.pk).update(tickets_sold=5)
+
+        with self.assertRaises(CommandError):
+            call_command("rebuild_tickets_sold", "--check", stdout=StringIO())
+
+        call_command("rebuild_tickets_sold", stdout=StringIO())
+        self.flight.refresh_from_db()
+
+        self.assertEqual(self.flight.tickets_sold, 1)
+        call_command("rebuild_tickets_sold", "--check", stdout=StringIO())
+
+    def test_create_group_order_in_bulk(self):
+        other_flight = Flight.objects.create(
+            number="Other",
+            route=self.flight.route,
+            airplane=self.flight.airplane,
+            departure_time=datetime(2023, 8, 22, 10, 30),
+            arrival_time=datetime(2023, 8, 22, 12, 30),
+        )
+        payload = {
+            "tickets": [
+                {"flight": flight.id, "row": row, "seat": seat}
+                for flight in (self.flight, other_flight)
+                for row in range(1, 4)
+                for seat in range(1, 11)
+            ]
+        }
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(ORDER_URL, payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data["tickets"]), 60)
+        self.assertLess(len(queries), 15)
+        self.flight.refresh_from_db()
+        other_flight.refresh_from_db()
+        self.assertEqual(self.flight.tickets_sold, 30)
+        self.assertEqual(other_flight.tickets_sold, 30)
+
+    def test_seat_conflicts_are_listed(self):
+        self.create_order((1, 1))
+
+        response = self.create_order((1, 1), (2, 5), (2, 5), (3, 3))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.json()["tickets"]["seats_taken"],
+            [
+                {"flight": self.flight.id, "row": 1, "seat": 1},
+                {"flight": self.flight.id, "row": 2, "seat": 5},
+            ],
+        )
+        self.assertEqual(Ticket.objects.count(), 1)
+
+    def test_seat_out_of_range(self):
+        response = self.create_order((4, 1))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_order_list_query_budget(self):
+        for number in range(2):
+            self.create_order((number + 1, 1), (number + 1, 2))
+        other = Flight.objects.create(
+            number="Other",
+            route=Route.objects.create(
+                source=Airport.objects.create(name="test3", close_big_city="Oslo"),
+                destination=Airport.objects.create(name="test4", close_big_city="Riga"),
+            ),
+            airplane=self.flight.airplane,
+            departure_time=datetime(2023, 8, 22, 10, 30),
+            arrival_time=datetime(2023, 8, 22, 12, 30),
+        )
+        self.client.post(
+            ORDER_URL,
+            {"tickets": [{"flight": other.id, "row": 1, "seat": 1}]},
+            format="json",
+        )
+
+        # count, orders, tickets with flights/routes/airports/airplanes joined
+        with self.assertNumQueries(3):
+            response = self.client.get(ORDER_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 3)
+        ticket = response.data["results"][0]["tickets"][0]
+        self.assertEqual(ticket["flight"]["airplane_type"], "Test")
+        self.assertEqual(ticket["flight"]["route"]["source"]["name"], "test3")
+
+    def test_ticket_history(self):
+        self.create_order((1, 1), (1, 2))
+
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("airlines:order-tickets"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 2)
+        row = response.data["results"][0]
+        self.assertEqual(row["number"], "Test")
+        self.assertEqual(row["source_city"], "Rome")
+        self.assertEqual(row["destination"], "test2")
+        self.assertEqual((row["row"], row["seat"]), (1, 1))
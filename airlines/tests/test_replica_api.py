@@ -0,0 +1,114 @@
+from datetime import datetime
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from airlines import replicas, seatmap
+from airlines.cache import bump_namespace, response_cache, written_key
+from airlines.models import Airport, Route, Flight, Airplane, AirplaneType
+
+ORDER_URL = reverse("airlines:order-list")
+FLIGHT_URL = reverse("airlines:flight-list")
+
+
+def sample_flight(**params):
+    airplane_type = AirplaneType.objects.create(name="Test")
+    route = Route.objects.create(
+        source=Airport.objects.create(name="test1", close_big_city="Rome"),
+        destination=Airport.objects.create(name="test2", close_big_city="Lviv"),
+    )
+    defaults = {
+        "number": "Test",
+        "route": route,
+        "airplane": Airplane.objects.create(
+            name="Test", rows=3, seats_in_row=10, airplane_type=airplane_type
+        ),
+        "departure_time": datetime(2023, 8, 21, 10, 30),
+        "arrival_time": datetime(2023, 8, 21, 12, 30),
+    }
+    defaults.update(params)
+
+    return Flight.objects.create(**defaults)
+
+
+@override_settings(DATABASE_REPLICAS=["replica1"], REPLICA_STICKY_SECONDS=5)
+class ReplicaRoutingTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        response_cache().clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("test@test1.com", "test1234")
+        self.client.force_authenticate(self.user)
+        self.flight = sample_flight()
+
+        # record where reads would go, but run them all on the test database
+        self.reads = []
+        patcher = mock.patch.object(
+            replicas.ReplicaRouter,
+            "db_for_read",
+            lambda router, model, **hints: self.reads.append(replicas.read_alias()),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_safe_requests_read_from_replica(self):
+        response = self.client.get(FLIGHT_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("replica1", self.reads)
+        self.reads.clear()
+
+        Flight.objects.count()
+        self.assertEqual(self.reads, [None])
+
+    def test_writer_reads_from_primary(self):
+        response = self.client.post(
+            ORDER_URL,
+            {"tickets": [{"flight": self.flight.id, "row": 1, "seat": 1}]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.reads.clear()
+
+        # the next request lands on a worker with caches of its own
+        other_worker = {
+            alias: {**config, "LOCATION": f"other-{alias}"}
+            for alias, config in settings.CACHES.items()
+        }
+        with override_settings(CACHES=other_worker):
+            self.client.get(ORDER_URL)
+        self.assertNotIn("replica1", self.reads)
+
+        del self.client.cookies[replicas.PIN_COOKIE]
+        self.client.get(ORDER_URL)
+        self.assertIn("replica1", self.reads)
+
+    def test_forged_pin_is_ignored(self):
+        self.client.cookies[replicas.PIN_COOKIE] = "1"
+
+        self.client.get(ORDER_URL)
+
+        self.assertIn("replica1", self.reads)
+
+    def test_responses_read_after_a_write_are_not_cached(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_namespace("flights")
+
+        self.assertEqual(self.client.get(FLIGHT_URL)["X-Cache"], "MISS")
+        self.assertEqual(self.client.get(FLIGHT_URL)["X-Cache"], "MISS")
+
+        response_cache().delete(written_key("flights"))
+        self.assertEqual(self.client.get(FLIGHT_URL)["X-Cache"], "MISS")
+        self.assertEqual(self.client.get(FLIGHT_URL)["X-Cache"], "HIT")
+
+    def test_shared_caches_are_filled_from_primary(self):
+        with replicas.reading_from_replica():
+            seatmap.get_seat_map(self.flight)
+
+        self.assertEqual(self.reads, [None])
@@ -54,3 +54,20 @@ class AuthenticatedRouteApiTest(TestCase):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data, serializer.data)
+
+    def test_filter_routes_by_city(self):
+        rome = sample_airport(name="test1", close_big_city="Rome")
+        lviv = sample_airport(name="test2", close_big_city="Lviv")
+        sao_paulo = sample_airport(name="test3", close_big_city="São Paulo")
+        route1 = Route.objects.create(source=rome, destination=lviv)
+        route2 = Route.objects.create(source=lviv, destination=sao_paulo)
+
+        def route_ids(params):
+            response = self.client.get(ROUTE_URL, params)
+            return [route["id"] for route in response.data]
+
+        self.assertEqual(route_ids({"source": "rom"}), [route1.id])
+        self.assertEqual(route_ids({"destination": "Lviv"}), [route1.id])
+        self.assertEqual(route_ids({"destination": "sao"}), [route2.id])
+        self.assertEqual(route_ids({"source": "Lv", "destination": "PAULO"}), [route2.id])
+        self.assertEqual(route_ids({"source": "Oslo"}), [])
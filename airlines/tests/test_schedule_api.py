@@ -0,0 +1,319 @@
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import AsyncClient, TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from airlines import schedules
+from airlines.models import (
+    Airplane,
+    AirplaneType,
+    Airport,
+    Flight,
+    FlightSchedule,
+    Route,
+    Ticket,
+)
+
+FLIGHT_URL = reverse("airlines:flight-list")
+ASYNC_FLIGHT_URL = reverse("airlines:async-flight-list")
+SCHEDULE_URL = reverse("airlines:flightschedule-list")
+ORDER_URL = reverse("airlines:order-list")
+HOLD_URL = reverse("airlines:seathold-list")
+
+
+def detail_url(flight_id):
+    return reverse("airlines:flight-detail", args=[flight_id])
+
+
+def sample_route():
+    return Route.objects.create(
+        source=Airport.objects.create(name="test1", close_big_city="Rome"),
+        destination=Airport.objects.create(name="test2", close_big_city="Lviv"),
+    )
+
+
+def sample_airplane():
+    return Airplane.objects.create(
+        name="Test",
+        rows=2,
+        seats_in_row=4,
+        airplane_type=AirplaneType.objects.create(name="Test"),
+    )
+
+
+class FlightScheduleApiTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("test@test1.com", "test1234")
+        self.client.force_authenticate(self.user)
+
+        # three days next week, from Monday
+        today = date.today()
+        self.monday = today + timedelta(days=7 - today.weekday())
+        self.schedule = FlightSchedule.objects.create(
+            number="SC-1",
+            route=sample_route(),
+            airplane=sample_airplane(),
+            weekdays="123",
+            departure_time=time(10, 0),
+            duration=timedelta(hours=2),
+            valid_from=self.monday,
+            valid_until=self.monday + timedelta(days=60),
+        )
+
+    def at(self, days: int, hour: int) -> datetime:
+        return datetime.combine(self.monday + timedelta(days=days), time(hour))
+
+    def week_params(self, **params):
+        return {
+            "date_from": str(self.monday),
+            "date_to": str(self.monday + timedelta(days=6)),
+            **params,
+        }
+
+    def test_search_merges_scheduled_flights(self):
+        stored = Flight.objects.create(
+            number="ST-1",
+            route=self.schedule.route,
+            airplane=self.schedule.airplane,
+            departure_time=self.at(1, 9),
+            arrival_time=self.at(1, 11),
+        )
+
+        response = self.client.get(FLIGHT_URL, self.week_params())
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data["results"]
+        self.assertEqual(
+            [flight["departure_time"] for flight in results],
+            [
+                self.at(0, 10).isoformat(),
+                self.at(1, 9).isoformat(),
+                self.at(1, 10).isoformat(),
+                self.at(2, 10).isoformat(),
+            ],
+        )
+        self.assertEqual(results[1]["id"], stored.id)
+        self.assertEqual(
+            results[0]["id"], schedules.virtual_id(self.schedule.id, self.monday)
+        )
+        self.assertEqual(results[0]["arrival_time"], self.at(0, 12).isoformat())
+        self.assertEqual(results[0]["tickets_available"], 8)
+
+    def test_pages_through_merged_flights(self):
+        for days in range(3):
+            Flight.objects.create(
+                number="ST-1",
+                route=self.schedule.route,
+                airplane=self.schedule.airplane,
+                departure_time=self.at(days, 10),
+                arrival_time=self.at(days, 12),
+            )
+
+        ids, url = [], FLIGHT_URL
+        params = self.week_params(**{"page-size": 2})
+        while url:
+            response = self.client.get(url, params)
+            params = None
+            ids.append([flight["id"] for flight in response.data["results"]])
+            url = response.data["next"]
+
+        self.assertEqual([len(page) for page in ids], [2, 2, 2])
+        self.assertEqual(len({flight for page in ids for flight in page}), 6)
+        # stored and scheduled flights at the same time interleave by id
+        self.assertLess(ids[0][0], 0)
+        self.assertGreater(ids[0][1], 0)
+
+        previous = self.client.get(response.data["previous"])
+        self.assertEqual([flight["id"] for flight in previous.data["results"]], ids[1])
+
+    def test_approximate_count_includes_scheduled_flights(self):
+        response = self.client.get(FLIGHT_URL, self.week_params(count="approximate"))
+
+        self.assertEqual(response.data["count"], 3)
+
+    @override_settings(FLIGHT_SCHEDULE_WINDOW_DAYS=1)
+    def test_searches_expand_a_bounded_window(self):
+        response = self.client.get(FLIGHT_URL, self.week_params())
+
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(
+            response.data["results"][0]["departure_time"], self.at(0, 10).isoformat()
+        )
+
+    def test_pages_expand_schedules_from_the_cursor(self):
+        Flight.objects.create(
+            number="SC-1",
+            route=self.schedule.route,
+            airplane=self.schedule.airplane,
+            departure_time=self.at(1, 10),
+            arrival_time=self.at(1, 12),
+            schedule=self.schedule,
+        )
+        start, end = self.at(0, 11), self.at(60, 0)
+
+        with self.assertNumQueries(2):
+            flights = schedules.nearest_flights([self.schedule], start, end, 2)
+        self.assertEqual(
+            [flight.departure_time for flight in flights],
+            [self.at(2, 10), self.at(7, 10)],
+        )
+        latest = schedules.nearest_flights([self.schedule], start, end, 1, True)
+        self.assertEqual(latest[0].departure_time, self.at(58, 10))
+        self.assertEqual(
+            schedules.count_departures(self.schedule, start, end),
+            len(list(schedules.departures(self.schedule, start, end))),
+        )
+
+    async def test_async_search_merges_scheduled_flights(self):
+        token = AccessToken.for_user(self.user)
+
+        response = await AsyncClient().get(
+            ASYNC_FLIGHT_URL,
+            self.week_params(),
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json()["results"]), 3)
+
+    async def test_async_retrieve_scheduled_flight(self):
+        headers = {"Authorization": f"Bearer {AccessToken.for_user(self.user)}"}
+        flight_id = schedules.virtual_id(self.schedule.id, self.monday)
+
+        response = await AsyncClient().get(
+            reverse("airlines:async-flight-detail", args=[flight_id]), headers=headers
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["id"], flight_id)
+        self.assertEqual(response.json()["number"], "SC-1")
+
+        thursday = schedules.virtual_id(self.schedule.id, self.monday + timedelta(3))
+        response = await AsyncClient().get(
+            reverse("airlines:async-flight-detail", args=[thursday]), headers=headers
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response["Content-Type"], "application/json")
+
+    def test_retrieve_scheduled_flight(self):
+        flight_id = schedules.virtual_id(self.schedule.id, self.monday)
+
+        response = self.client.get(detail_url(flight_id))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["number"], "SC-1")
+        self.assertEqual(response.data["airplane_type"], "Test")
+
+        seats = self.client.get(reverse("airlines:flight-seats", args=[flight_id]))
+        self.assertEqual(seats.status_code, status.HTTP_200_OK)
+        self.assertEqual(seats.data["flight"], flight_id)
+
+        # Thursday is not a scheduled day
+        thursday = schedules.virtual_id(self.schedule.id, self.monday + timedelta(3))
+        response = self.client.get(detail_url(thursday))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_booking_materializes_the_flight_once(self):
+        flight_id = schedules.virtual_id(self.schedule.id, self.monday)
+
+        for seat in (1, 2):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    ORDER_URL,
+                    {"tickets": [{"flight": flight_id, "row": 1, "seat": seat}]},
+                    format="json",
+                )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        flight = Flight.objects.get(schedule=self.schedule)
+        self.assertEqual(flight.departure_time, self.at(0, 10))
+        self.assertEqual(flight.arrival_time, self.at(0, 12))
+        self.assertEqual(flight.tickets_sold, 2)
+        self.assertEqual(Ticket.objects.filter(flight=flight).count(), 2)
+
+        response = self.client.get(FLIGHT_URL, self.week_params())
+        results = response.data["results"]
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0]["id"], flight.id)
+        self.assertEqual(results[0]["tickets_available"], 6)
+
+        taken = self.client.post(
+            ORDER_URL,
+            {"tickets": [{"flight": flight_id, "row": 1, "seat": 1}]},
+            format="json",
+        )
+        self.assertEqual(taken.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_hold_materializes_the_flight(self):
+        flight_id = schedules.virtual_id(self.schedule.id, self.monday)
+
+        response = self.client.post(
+            HOLD_URL,
+            {"flight": flight_id, "seats": [{"row": 1, "seat": 1}]},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        flight = Flight.objects.get(schedule=self.schedule)
+        self.assertEqual(response.data[0]["flight"], flight.id)
+
+    def test_create_schedule_validates_window(self):
+        admin = get_user_model().objects.create_superuser("admin@test.com", "test1234")
+        self.client.force_authenticate(admin)
+        payload = {
+            "number": "SC-2",
+            "route": self.schedule.route_id,
+            "airplane": self.schedule.airplane_id,
+            "weekdays": "8",
+            "departure_time": "08:00",
+            "duration": "01:30:00",
+            "valid_from": str(self.monday),
+            "valid_until": str(self.monday - timedelta(days=1)),
+        }
+
+        response = self.client.post(SCHEDULE_URL, payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("weekdays", response.data)
+
+        payload["weekdays"] = "67"
+        response = self.client.post(SCHEDULE_URL, payload, format="json")
+        self.assertIn("valid_until", response.data)
+
+        payload["valid_until"] = str(self.monday + timedelta(days=30))
+        response = self.client.post(SCHEDULE_URL, payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_materialize_schedules_command(self):
+        Flight.objects.create(
+            number="SC-1",
+            route=self.schedule.route,
+            airplane=self.schedule.airplane,
+            departure_time=self.at(0, 10),
+            arrival_time=self.at(0, 12),
+            schedule=self.schedule,
+        )
+        days = (self.monday - date.today()).days + 3
+
+        call_command("materialize_schedules", days=days, stdout=StringIO())
+        call_command("materialize_schedules", days=days, stdout=StringIO())
+
+        self.assertEqual(
+            list(
+                Flight.objects.filter(schedule=self.schedule)
+                .order_by("departure_time")
+                .values_list("departure_time", flat=True)
+            ),
+            [self.at(0, 10), self.at(1, 10), self.at(2, 10)],
+        )
+        response = self.client.get(FLIGHT_URL, self.week_params())
+        self.assertTrue(all(flight["id"] > 0 for flight in response.data["results"]))
@@ -0,0 +1,205 @@
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import AsyncClient, SimpleTestCase, TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from airlines.checks import check_throttle_store
+from airlines.throttling import (
+    TAKE_SCRIPT,
+    RedisBucketStore,
+    SQLiteBucketStore,
+    TokenBucketThrottle,
+)
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+AIRPORT_URL = reverse("airlines:airport-list")
+FLIGHT_URL = reverse("airlines:flight-list")
+ORDER_URL = reverse("airlines:order-list")
+ASYNC_FLIGHT_URL = reverse("airlines:async-flight-list")
+
+RATES = {"anon": "2/min", "user": "5/min", "orders": "1/min", "search": "10/min"}
+
+
+@mock.patch.object(TokenBucketThrottle, "THROTTLE_RATES", RATES)
+class TokenBucketThrottleTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user("test@test1.com", "test1234")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_rate_limit_headers(self):
+        response = self.client.get(AIRPORT_URL)
+
+        self.assertEqual(response["RateLimit-Limit"], "5")
+        self.assertEqual(response["RateLimit-Remaining"], "4")
+        self.assertEqual(response["RateLimit-Reset"], "12")
+
+        response = self.client.get(AIRPORT_URL)
+        self.assertEqual(response["RateLimit-Remaining"], "3")
+
+    def test_empty_bucket_is_throttled_until_refilled(self):
+        timer = mock.Mock(return_value=1000.0)
+        with mock.patch.object(TokenBucketThrottle, "timer", timer):
+            for _ in range(5):
+                self.assertEqual(self.client.get(AIRPORT_URL).status_code, 200)
+
+            response = self.client.get(AIRPORT_URL)
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            self.assertEqual(response["Retry-After"], "12")
+            self.assertEqual(response["RateLimit-Remaining"], "0")
+
+            timer.return_value = 1012.0
+            self.assertEqual(self.client.get(AIRPORT_URL).status_code, 200)
+            response = self.client.get(AIRPORT_URL)
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_scopes_per_action(self):
+        self.assertEqual(self.client.get(FLIGHT_URL)["RateLimit-Limit"], "10")
+        self.assertEqual(self.client.get(ORDER_URL)["RateLimit-Limit"], "5")
+
+        response = self.client.post(ORDER_URL, {"tickets": []}, format="json")
+        self.assertEqual(response["RateLimit-Limit"], "1")
+        response = self.client.post(ORDER_URL, {"tickets": []}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+        # searching and ordering do not spend the "user" bucket
+        self.assertEqual(self.client.get(ORDER_URL)["RateLimit-Remaining"], "3")
+
+    def test_anonymous_requests(self):
+        client = APIClient()
+        for _ in range(2):
+            client.get(AIRPORT_URL)
+
+        response = client.get(AIRPORT_URL)
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response["RateLimit-Limit"], "2")
+
+    async def test_async_views_are_throttled(self):
+        token = AccessToken.for_user(self.user)
+        response = await AsyncClient().get(
+            ASYNC_FLIGHT_URL, headers={"Authorization": f"Bearer {token}"}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["RateLimit-Limit"], "10")
+        self.assertEqual(response["RateLimit-Remaining"], "9")
+
+
+class SQLiteBucketStoreTest(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = str(Path(directory.name) / "throttle.sqlite3")
+
+    def test_take_refills_over_time(self):
+        store = SQLiteBucketStore(self.path)
+
+        self.assertEqual(store.take("key", 1000, 10, 20), (True, 1010))
+        self.assertEqual(store.take("key", 1000, 10, 20), (True, 1020))
+        self.assertEqual(store.take("key", 1000, 10, 20), (False, 1020))
+        self.assertEqual(store.take("key", 1010, 10, 20), (True, 1030))
+        self.assertEqual(store.take("key", 5000, 10, 20), (True, 5010))
+
+    def test_concurrent_takes_are_atomic(self):
+        allowed = []
+
+        def take():
+            store = SQLiteBucketStore(self.path)
+            for _ in range(10):
+                allowed.append(store.take("key", 1000, 1, 50)[0])
+
+        threads = [threading.Thread(target=take) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(allowed.count(True), 50)
+
+    def test_throttle_uses_sqlite_store(self):
+        user = get_user_model().objects.create_user("test@test1.com", "test1234")
+        client = APIClient()
+        client.force_authenticate(user)
+
+        with override_settings(THROTTLE_STORE="sqlite", THROTTLE_SQLITE_PATH=self.path):
+            with mock.patch.object(TokenBucketThrottle, "THROTTLE_RATES", RATES):
+                for _ in range(5):
+                    client.get(AIRPORT_URL)
+                response = client.get(AIRPORT_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+
+class FakeRedis:
+    """register_script of redis-py, running TAKE_SCRIPT in Python"""
+
+    def __init__(self):
+        self.values = {}
+        self.scripts = []
+
+    def register_script(self, script):
+        self.scripts.append(script)
+
+        def take(keys, args):
+            now, interval, limit = args
+            full_at = max(self.values.get(keys[0], now), now)
+            if full_at + interval - now > limit:
+                return [0, full_at]
+            self.values[keys[0]] = full_at + interval
+            return [1, full_at + interval]
+
+        return take
+
+
+class RedisBucketStoreTest(SimpleTestCase):
+    def test_take_runs_the_script(self):
+        client = FakeRedis()
+        store = RedisBucketStore(client)
+
+        self.assertEqual(client.scripts, [TAKE_SCRIPT])
+        self.assertEqual(store.take("key", 1000, 10, 20), (True, 1010))
+        self.assertEqual(store.take("key", 1000, 10, 20), (True, 1020))
+        self.assertEqual(store.take("key", 1000, 10, 20), (False, 1020))
+        self.assertEqual(store.take("key", 1010, 10, 20), (True, 1030))
+
+    @unittest.skipIf(redis is None, "redis is not installed")
+    def test_take_on_a_server(self):
+        client = redis.Redis.from_url(settings.THROTTLE_REDIS_URL)
+        try:
+            client.delete("test-bucket")
+        except redis.ConnectionError:
+            self.skipTest("no Redis server at THROTTLE_REDIS_URL")
+        self.addCleanup(client.delete, "test-bucket")
+        store = RedisBucketStore(client)
+
+        self.assertEqual(store.take("test-bucket", 1000, 10, 20), (True, 1010))
+        self.assertEqual(store.take("test-bucket", 1000, 10, 20), (True, 1020))
+        self.assertEqual(store.take("test-bucket", 1000, 10, 20), (False, 1020))
+
+
+class ThrottleStoreCheckTest(SimpleTestCase):
+    def test_per_process_cache_with_several_workers(self):
+        with override_settings(WEB_CONCURRENCY=4, THROTTLE_STORE="cache"):
+            self.assertEqual(
+                [error.id for error in check_throttle_store(None)], ["airlines.E001"]
+            )
+        with override_settings(WEB_CONCURRENCY=4, THROTTLE_STORE="sqlite"):
+            self.assertEqual(check_throttle_store(None), [])
+        with override_settings(WEB_CONCURRENCY=1, THROTTLE_STORE="cache"):
+            self.assertEqual(check_throttle_store(None), [])
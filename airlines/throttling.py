@@ -0,0 +1,213 @@
+"""
+Token bucket throttling.
+
+A rate of "100/hour" is a bucket of 100 requests refilled evenly over the
+hour, one every 36 seconds. Each key stores a single number, the time the
+bucket will be full again in microseconds (GCRA), and every check updates it atomically
+in ``settings.THROTTLE_STORE``:
+
+* ``cache``: the ``THROTTLE_CACHE_ALIAS`` cache, updated under a process
+  lock; LocMem limits are per process, so airlines.checks refuses them
+  when WEB_CONCURRENCY says there are several workers.
+* ``redis``: the Redis server at ``THROTTLE_REDIS_URL``, updated by a Lua
+  script so every worker shares the limits. Needs the redis package.
+* ``sqlite``: a SQLite file at ``THROTTLE_SQLITE_PATH`` shared by the
+  workers of one host, updated with a single UPSERT.
+
+Views pick a scope other than "user" per action through
+``throttle_scopes``; RateLimitHeadersMiddleware (airlines.middleware) turns
+what the throttles saw into RateLimit-* response headers.
+"""
+import math
+import random
+import sqlite3
+import threading
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import (
+    AnonRateThrottle,
+    SimpleRateThrottle,
+    UserRateThrottle,
+)
+
+TAKE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+local full_at = math.max(tonumber(redis.call("GET", KEYS[1]) or ARGV[1]), now)
+if full_at + interval - now > limit then
+    return {0, full_at}
+end
+full_at = full_at + interval
+redis.call("SET", KEYS[1], string.format("%d", full_at), "PX", math.ceil((full_at - now) / 1000))
+return {1, full_at}
+"""
+
+TAKE_SQL = """
+INSERT INTO bucket (key, full_at) VALUES (:key, :now + :interval)
+ON CONFLICT (key) DO UPDATE SET full_at = max(full_at, :now) + :interval
+WHERE max(full_at, :now) + :interval - :now <= :limit
+RETURNING full_at
+"""
+
+# share of takes that also delete buckets which are full again
+PRUNE_CHANCE = 0.001
+
+
+class CacheBucketStore:
+    lock = threading.Lock()
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def take(self, key: str, now: int, interval: int, limit: int):
+        """
+        Take a token if the bucket has one. Returns whether it did and the
+        time the bucket is full again
+        """
+        with self.lock:
+            full_at = max(self.cache.get(key, now), now)
+            if full_at + interval - now > limit:
+                return False, full_at
+            full_at += interval
+            self.cache.set(key, full_at, timeout=math.ceil((full_at - now) / 1e6))
+            return True, full_at
+
+
+class RedisBucketStore:
+    def __init__(self, client):
+        self.take_script = client.register_script(TAKE_SCRIPT)
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisBucketStore":
+        # optional dependency, only this store needs it
+        import redis
+
+        return cls(redis.Redis.from_url(url))
+
+    def take(self, key: str, now: int, interval: int, limit: int):
+        allowed, full_at = self.take_script(keys=[key], args=[now, interval, limit])
+        return bool(allowed), full_at
+
+
+class SQLiteBucketStore:
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+
+    def connection(self) -> sqlite3.Connection:
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS bucket "
+                "(key TEXT PRIMARY KEY, full_at INTEGER NOT NULL) WITHOUT ROWID"
+            )
+            self.local.connection = connection
+        return connection
+
+    def take(self, key: str, now: int, interval: int, limit: int):
+        connection = self.connection()
+        params = {"key": key, "now": now, "interval": interval, "limit": limit}
+        row = connection.execute(TAKE_SQL, params).fetchone()
+        if row is not None:
+            if random.random() < PRUNE_CHANCE:
+                connection.execute("DELETE FROM bucket WHERE full_at < ?", (now,))
+            return True, row[0]
+
+        row = connection.execute(
+            "SELECT full_at FROM bucket WHERE key = ?", (key,)
+        ).fetchone()
+        return False, max(row[0] if row else now, now)
+
+
+_stores = {}
+
+
+def get_store():
+    kind = getattr(settings, "THROTTLE_STORE", "cache")
+    if kind == "sqlite":
+        location, store_class = str(settings.THROTTLE_SQLITE_PATH), SQLiteBucketStore
+    elif kind == "redis":
+        location, store_class = settings.THROTTLE_REDIS_URL, RedisBucketStore.from_url
+    else:
+        return CacheBucketStore(
+            caches[getattr(settings, "THROTTLE_CACHE_ALIAS", "default")]
+        )
+    if (kind, location) not in _stores:
+        _stores[(kind, location)] = store_class(location)
+    return _stores[(kind, location)]
+
+
+class RateLimit(NamedTuple):
+    limit: int
+    remaining: int
+    reset: int
+
+
+def note(request, rate_limit: RateLimit):
+    """Keep the tightest limit a request ran into, for the response headers"""
+    request = getattr(request, "_request", request)
+    current = getattr(request, "rate_limit", None)
+    if current is None or rate_limit.remaining < current.remaining:
+        request.rate_limit = rate_limit
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """SimpleRateThrottle semantics, but with a token bucket per key"""
+
+    cache_format = "bucket_%(scope)s_%(ident)s"
+
+    def get_scope(self, view) -> str:
+        return self.scope
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(view)
+        if scope != self.scope:
+            self.scope = scope
+            self.rate = self.get_rate()
+            self.num_requests, self.duration = self.parse_rate(self.rate)
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = int(self.timer() * 1e6)
+        self.interval = self.duration * 1_000_000 // self.num_requests
+        self.limit = self.interval * self.num_requests
+        allowed, self.full_at = get_store().take(
+            self.key, self.now, self.interval, self.limit
+        )
+        note(
+            request,
+            RateLimit(
+                limit=self.num_requests,
+                remaining=(self.now + self.limit - self.full_at) // self.interval,
+                reset=math.ceil((self.full_at - self.now) / 1e6),
+            ),
+        )
+        return allowed
+
+    def wait(self):
+        """Seconds until the bucket holds a token again"""
+        return max(self.full_at + self.interval - self.limit - self.now, 0) / 1e6
+
+
+class AnonBucketThrottle(TokenBucketThrottle, AnonRateThrottle):
+    pass
+
+
+class UserBucketThrottle(TokenBucketThrottle, UserRateThrottle):
+    """
+    The "user" scope, or the one the view sets for its action, e.g.
+    ``throttle_scopes = {"create": "orders"}``
+    """
+
+    def get_scope(self, view) -> str:
+        scopes = getattr(view, "throttle_scopes", {})
+        return scopes.get(getattr(view, "action", None), "user")
@@ -1,14 +1,19 @@
-from django.urls import path, include
+from django.urls import path, include, re_path
 from rest_framework import routers
 
+from airlines.async_views import FlightDetailView, FlightListView, RouteListView
 from airlines.views import (
     AirplaneViewSet,
     CrewViewSet,
     FlightViewSet,
+    FlightScheduleViewSet,
     RouteViewSet,
     OrderViewSet,
     AirplaneTypeViewSet,
     AirportViewSet,
+    ItineraryViewSet,
+    ResponseCacheStatsView,
+    SeatHoldViewSet,
 )
 
 router = routers.DefaultRouter()
@@ -17,9 +22,24 @@ router.register("airplane_types", AirplaneTypeViewSet)
 router.register("airports", AirportViewSet)
 router.register("crew", CrewViewSet)
 router.register("flights", FlightViewSet)
+router.register("schedules", FlightScheduleViewSet)
 router.register("routes", RouteViewSet)
 router.register("orders", OrderViewSet)
+router.register("connections", ItineraryViewSet, basename="connection")
+router.register("holds", SeatHoldViewSet)
 
-urlpatterns = [path("", include(router.urls))]
+urlpatterns = [
+    path("", include(router.urls)),
+    path("cache-stats/", ResponseCacheStatsView.as_view(), name="cache-stats"),
+    # native async twins of the flight and route searches, for ASGI deployments
+    path("async/flights/", FlightListView.as_view(), name="async-flight-list"),
+    # negative ids are scheduled flights, see airlines.schedules
+    re_path(
+        r"^async/flights/(?P<pk>-?\d+)/$",
+        FlightDetailView.as_view(),
+        name="async-flight-detail",
+    ),
+    path("async/routes/", RouteListView.as_view(), name="async-route-list"),
+]
 
 app_name = "airlines"
@@ -1,28 +1,62 @@
-from datetime import datetime
-
-from django.db.models import F, Count, Q
+import base64
+import json
+from datetime import datetime, timedelta
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+from django.db.models import F, Prefetch, Q
+from django.utils import timezone
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema, OpenApiParameter
-from rest_framework import mixins, viewsets
-from rest_framework.pagination import PageNumberPagination
-from rest_framework.permissions import IsAuthenticated
+from rest_framework import mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import PageNumberPagination, CursorPagination
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import GenericViewSet
 
-from airlines.models import Airplane, Crew, Flight, Route, Order, AirplaneType, Airport
+from airlines import availability, holds, itinerary, schedules, seatmap
+from airlines.cache import CachedResponseMixin, stats
+from airlines.conditional import ConditionalResponseMixin
+from airlines.models import (
+    Airplane,
+    Crew,
+    Flight,
+    FlightSchedule,
+    Route,
+    Order,
+    AirplaneType,
+    Airport,
+    SeatHold,
+    Ticket,
+)
 from airlines.permissions import IsAdminOrIfAuthenticatedReadOnly, IsAdminOrReadOnly
 from airlines.serializers import (
     AirplaneSerializer,
     CrewSerializer,
     RouteSerializer,
+    RouteCalendarDaySerializer,
     OrderSerializer,
     FlightDetailSerializer,
     FlightListSerializer,
     AirplaneTypeSerializer,
     FlightSerializer,
+    FlightScheduleSerializer,
     OrderListSerializer,
     AirportSerializer,
     AirportDetailSerializer,
+    AirportDestinationsSerializer,
+    FlightSeatMapSerializer,
+    ItinerarySearchSerializer,
+    ItinerarySerializer,
+    SeatHoldCreateSerializer,
+    SeatHoldSerializer,
+    TicketHistorySerializer,
 )
+from airlines.replicas import ReplicaReadMixin
+from airlines.sparse import SparseQuerysetMixin
 
 
 class AirplanePagination(PageNumberPagination):
@@ -33,6 +67,8 @@ class AirplanePagination(PageNumberPagination):
 
 
 class AirplaneViewSet(
+    ReplicaReadMixin,
+    SparseQuerysetMixin,
     mixins.CreateModelMixin,
     mixins.ListModelMixin,
     GenericViewSet,
@@ -44,6 +80,9 @@ class AirplaneViewSet(
 
 
 class AirportViewSet(
+    ReplicaReadMixin,
+    ConditionalResponseMixin,
+    SparseQuerysetMixin,
     viewsets.ModelViewSet,
 ):
     queryset = Airport.objects.all()
@@ -51,15 +90,14 @@ class AirportViewSet(
     permission_classes = (IsAdminOrReadOnly,)
 
     def get_queryset(self):
-        queryset = self.queryset
+        queryset = self.queryset.all()
         """Retrieve the airports with filters"""
         close_big_city = self.request.query_params.get("close_big_city")
 
         if close_big_city:
-            queryset = queryset.filter(close_big_city__icontains=close_big_city)
-
-        if self.action == "retrieve":
-            queryset = queryset.prefetch_related("destination_routes", "source_routes")
+            queryset = queryset.filter(
+                id__in=Airport.objects.ids_for_city(close_big_city)
+            )
 
         return queryset
 
@@ -67,6 +105,12 @@ class AirportViewSet(
         if self.action in ("retrieve", "update"):
             return AirportDetailSerializer
 
+        if (
+            self.action == "list"
+            and self.request.query_params.get("include") == "destinations"
+        ):
+            return AirportDestinationsSerializer
+
         return AirportSerializer
 
     @extend_schema(
@@ -77,6 +121,13 @@ class AirportViewSet(
                 description="Filter by close_big_city (ex. ?close_big_city=Glasgow)",
                 required=False,
             ),
+            OpenApiParameter(
+                name="include",
+                type=OpenApiTypes.STR,
+                enum=["destinations"],
+                description="Add direct destinations of every airport (ex. ?include=destinations)",
+                required=False,
+            ),
         ]
     )
     def list(self, request, *args, **kwargs):
@@ -84,10 +135,13 @@ class AirportViewSet(
         this method is created for documentation, to use extend_schema
         for filtering
         """
-        return super().list(self, request, *args, **kwargs)
+        return super().list(request, *args, **kwargs)
 
 
 class AirplaneTypeViewSet(
+    ReplicaReadMixin,
+    ConditionalResponseMixin,
+    SparseQuerysetMixin,
     viewsets.ModelViewSet,
 ):
     queryset = AirplaneType.objects.all()
@@ -96,6 +150,9 @@ class AirplaneTypeViewSet(
 
 
 class CrewViewSet(
+    ReplicaReadMixin,
+    ConditionalResponseMixin,
+    SparseQuerysetMixin,
     viewsets.ModelViewSet,
 ):
     queryset = Crew.objects.all()
@@ -103,22 +160,288 @@ class CrewViewSet(
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
 
 
-class FlightPagination(PageNumberPagination):
+def approximate_count(queryset) -> int:
+    """
+    Estimate the number of rows of a queryset without counting them.
+    Postgres answers from the planner estimate; other backends fall back
+    to a regular COUNT(*)
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return queryset.count()
+
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def reverse_ordering(ordering) -> tuple:
+    return tuple(
+        order[1:] if order.startswith("-") else f"-{order}" for order in ordering
+    )
+
+
+class FlightPagination(CursorPagination):
+    """
+    Keyset pagination over (departure_time, id): every page costs the same
+    no matter how deep it is, and no COUNT(*) is issued unless the client
+    asks for it with ?count=approximate
+    """
+
     page_size = 20
     page_size_query_param = "page-size"
     max_page_size = 100
+    ordering = ("departure_time", "id")
+    count_query_param = "count"
+
+    def paginate_queryset(self, queryset, request, view=None, scheduled=None):
+        """
+        ``scheduled`` (a ScheduledFlights) adds unsaved flights from
+        airlines.schedules to the page, in the same order
+        """
+        self.count = None
+        if request.query_params.get(self.count_query_param) == "approximate":
+            self.count = approximate_count(queryset)
+            if scheduled is not None:
+                self.count += scheduled.count()
+        if scheduled is None or not scheduled.schedules:
+            return super().paginate_queryset(queryset, request, view)
+        return self.paginate_merged(queryset, request, view, scheduled)
+
+    async def apaginate_queryset(self, queryset, request, view=None, scheduled=None):
+        """paginate_queryset for async views"""
+        return await sync_to_async(self.paginate_queryset)(
+            queryset, request, view, scheduled
+        )
+
+    def paginate_merged(self, queryset, request, view, scheduled) -> list:
+        """
+        CursorPagination.paginate_queryset with the scheduled flights sorted
+        into the stored ones. It sets the same attributes, which
+        get_next_link and get_previous_link read. Stored rows are read from
+        the cursor position rather than its offset, since the rows the
+        offset skips may be scheduled ones
+        """
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        offset, reverse, position = self.cursor or (0, False, None)
+        ordering = reverse_ordering(self.ordering) if reverse else self.ordering
+        field = self.ordering[0].lstrip("-")
+
+        queryset = queryset.order_by(*ordering)
+        start = None
+        if position is not None:
+            lookup = "lt" if reverse != self.ordering[0].startswith("-") else "gt"
+            queryset = queryset.filter(**{f"{field}__{lookup}": position})
+            start = Flight._meta.get_field(field).to_python(position)
+
+        limit = offset + self.page_size + 1
+        extra = scheduled.page(start, reverse, limit)
+        names = [order.lstrip("-") for order in ordering]
+        results = sorted(
+            [*queryset[:limit], *extra],
+            key=lambda row: tuple(getattr(row, name) for name in names),
+            reverse=ordering[0].startswith("-"),
+        )[offset:limit]
+        self.page = results[: self.page_size]
+
+        has_following = len(results) > len(self.page)
+        following = self.position(results[-1]) if has_following else None
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = position is not None or offset > 0
+            self.has_previous = has_following
+            if self.has_next:
+                self.next_position = position
+            if self.has_previous:
+                self.previous_position = following
+        else:
+            self.has_next = has_following
+            self.has_previous = position is not None or offset > 0
+            if self.has_next:
+                self.next_position = following
+            if self.has_previous:
+                self.previous_position = position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def position(self, instance) -> str:
+        """The cursor position of a row, from the first ordering field"""
+        return str(getattr(instance, self.ordering[0].lstrip("-")))
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.count is not None:
+            response.data["count"] = self.count
+        return response
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema["properties"]["count"] = {
+            "type": "integer",
+            "example": 123,
+            "description": "Only present with ?count=approximate",
+        }
+        return response_schema
+
+
+def date_param(params, name: str):
+    """
+    Converts a YYYY-MM-DD query parameter to the midnight starting that day,
+    so filters compare the raw column against a half-open range and can use
+    the departure/arrival indexes
+    """
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise ValidationError({name: "Date has wrong format. Use YYYY-MM-DD."})
+
+
+def filter_flights(queryset, params, airport_ids=None):
+    """
+    The flight search filters shared by the sync and async views;
+    ``airport_ids`` are the airports matching ?route=, looked up by the caller
+    """
+    date = date_param(params, "date")
+    date_from = date_param(params, "date_from")
+    date_to = date_param(params, "date_to")
+    arrival_date = date_param(params, "arrival_date")
+    one_day = timedelta(days=1)
+
+    if date:
+        queryset = queryset.filter(
+            departure_time__gte=date, departure_time__lt=date + one_day
+        )
+
+    if date_from:
+        queryset = queryset.filter(departure_time__gte=date_from)
+
+    if date_to:
+        queryset = queryset.filter(departure_time__lt=date_to + one_day)
+
+    if arrival_date:
+        queryset = queryset.filter(
+            arrival_time__gte=arrival_date,
+            arrival_time__lt=arrival_date + one_day,
+        )
+
+    if airport_ids is not None:
+        queryset = queryset.filter(
+            Q(route__source_id__in=airport_ids)
+            | Q(route__destination_id__in=airport_ids)
+        )
+    return queryset
+
+
+def schedule_window(params):
+    """
+    Departures to expand schedules over for a search: the searched days
+    from now on, at most FLIGHT_SCHEDULE_WINDOW_DAYS of them
+    """
+    one_day = timedelta(days=1)
+    date = date_param(params, "date")
+    date_to = date_param(params, "date_to")
+    start = max(
+        day for day in (timezone.now(), date, date_param(params, "date_from")) if day
+    )
+    end = start + timedelta(days=schedules.window_days())
+    if date:
+        end = min(end, date + one_day)
+    if date_to:
+        end = min(end, date_to + one_day)
+    return start, end
+
+
+class ScheduledFlights:
+    """
+    The virtual flights (see airlines.schedules) matching the flight search
+    filters, read a page at a time by FlightPagination
+    """
+
+    def __init__(self, params, airport_ids=None):
+        self.start, self.end = schedule_window(params)
+        self.arrival_day = date_param(params, "arrival_date")
+        self.airport_ids = airport_ids
+        self._schedules = None
+
+    @property
+    def schedules(self) -> list:
+        if self._schedules is None:
+            self._schedules = []
+            if self.start < self.end:
+                self._schedules = list(
+                    schedules.schedules_between(self.start, self.end, self.airport_ids)
+                )
+        return self._schedules
+
+    def page(self, position, reverse: bool, count: int) -> list:
+        """
+        Up to ``count`` flights per schedule past the cursor position, the
+        most any one schedule can put on the page
+        """
+        start, end = self.start, self.end
+        if position is not None and reverse:
+            end = min(end, position)
+        elif position is not None:
+            start = max(start, position + timedelta(microseconds=1))
+        if start >= end or not self.schedules:
+            return []
+        return schedules.nearest_flights(
+            self.schedules, start, end, count, reverse, self.arrival_day
+        )
+
+    def count(self) -> int:
+        """Scheduled departures without a row yet, for ?count=approximate"""
+        if not self.schedules:
+            return 0
+        total = sum(
+            schedules.count_departures(
+                schedule,
+                *schedules.search_range(
+                    schedule, self.start, self.end, self.arrival_day
+                ),
+            )
+            for schedule in self.schedules
+        )
+        stored = Flight.objects.filter(
+            schedule__in=self.schedules,
+            departure_time__gte=self.start,
+            departure_time__lt=self.end,
+        ).count()
+        return max(total - stored, 0)
 
 
 class FlightViewSet(
+    ReplicaReadMixin,
+    CachedResponseMixin,
+    SparseQuerysetMixin,
     viewsets.ModelViewSet,
 ):
     queryset = Flight.objects.select_related("route__destination", "route__source", "airplane").annotate(
         tickets_available=(
-            F("airplane__rows") * F("airplane__seats_in_row") - Count("tickets")
+            F("airplane__rows") * F("airplane__seats_in_row") - F("tickets_sold")
         ),
     )
 
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    pagination_class = FlightPagination
+    cache_namespace = "flights"
+    throttle_scopes = {"list": "search"}
 
     @staticmethod
     def _params_to_ints(qs):
@@ -127,28 +450,40 @@ class FlightViewSet(
 
     def get_queryset(self):
         """Retrieve the flights with filters"""
-        route = self.request.query_params.get("route")
-        date = self.request.query_params.get("date")
-        arrival_date = self.request.query_params.get("arrival_date")
-
-        queryset = self.queryset
-        if date:
-            date = datetime.strptime(date, "%Y-%m-%d").date()
-            queryset = queryset.filter(departure_time__date=date)
+        if self.action == "seats":
+            return Flight.objects.select_related("airplane")
 
-        if arrival_date:
-            arrival_date = datetime.strptime(arrival_date, "%Y-%m-%d").date()
-            queryset = queryset.filter(departure_time__arrival_date=arrival_date)
-
-        if route:
-            queryset = queryset.filter(
-                Q(route__source__close_big_city__icontains=route)
-                | Q(route__destination__close_big_city__icontains=route)
-            )
+        route = self.request.query_params.get("route")
+        self.airport_ids = Airport.objects.ids_for_city(route) if route else None
+        queryset = filter_flights(
+            self.queryset.all(), self.request.query_params, self.airport_ids
+        )
 
         if self.action == "retrieve":
             queryset = queryset.select_related("airplane__airplane_type")
-        return queryset.distinct()
+        return queryset
+
+    def get_object(self):
+        """Virtual flight ids (see airlines.schedules) open for reading"""
+        flight_id = self.kwargs.get(self.lookup_field)
+        if self.action not in ("retrieve", "seats") or not flight_id.startswith("-"):
+            return super().get_object()
+        try:
+            flight = schedules.resolve(int(flight_id), self.get_queryset())
+        except ValueError:
+            flight = None
+        if flight is None:
+            raise NotFound()
+        self.check_object_permissions(self.request, flight)
+        return flight
+
+    def paginate_queryset(self, queryset):
+        return self.paginator.paginate_queryset(
+            queryset,
+            self.request,
+            view=self,
+            scheduled=ScheduledFlights(self.request.query_params, self.airport_ids),
+        )
 
     @extend_schema(
         parameters=[
@@ -158,15 +493,31 @@ class FlightViewSet(
                 description="Filter by departure_time (ex. ?date=2020-10-10)",
             ),
             OpenApiParameter(
-                "arrival_time",
+                "date_from",
                 type=OpenApiTypes.DATE,
-                description="Filter by arrival_time (ex. ?date=2020-10-10)",
+                description="Departing on or after this day (ex. ?date_from=2020-10-10)",
+            ),
+            OpenApiParameter(
+                "date_to",
+                type=OpenApiTypes.DATE,
+                description="Departing on or before this day (ex. ?date_to=2020-10-12)",
+            ),
+            OpenApiParameter(
+                "arrival_date",
+                type=OpenApiTypes.DATE,
+                description="Filter by arrival_time (ex. ?arrival_date=2020-10-10)",
             ),
             OpenApiParameter(
                 "route",
                 type=OpenApiTypes.STR,
                 description="Filter by route(ex. ?route=Nice)",
             ),
+            OpenApiParameter(
+                "count",
+                type=OpenApiTypes.STR,
+                enum=["approximate"],
+                description="Include an approximate total (ex. ?count=approximate)",
+            ),
         ]
     )
     def list(self, request, *args, **kwargs):
@@ -174,42 +525,154 @@ class FlightViewSet(
         this method is created for documentation, to use extend_schema
         for filtering
         """
-        return super().list(self, request, *args, **kwargs)
+        return super().list(request, *args, **kwargs)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "expanded",
+                type=OpenApiTypes.BOOL,
+                description="Also return per-row occupancy flags (ex. ?expanded=true)",
+            ),
+        ]
+    )
+    @action(methods=["GET"], detail=True, url_path="seats")
+    def seats(self, request, pk=None):
+        """Seat occupancy of the flight as a packed bitset"""
+        flight = self.get_object()
+        airplane = flight.airplane
+        if schedules.is_virtual(flight):
+            # nothing is sold or held before the flight has a row
+            bitmap = held = bytes((airplane.rows * airplane.seats_in_row + 7) // 8)
+        else:
+            bitmap = seatmap.get_seat_map(flight)
+            held = seatmap.get_held_map(flight)
+        data = {
+            "flight": flight.id,
+            "rows": airplane.rows,
+            "seats_in_row": airplane.seats_in_row,
+            "occupied": base64.b64encode(bitmap).decode(),
+            "held": base64.b64encode(held).decode(),
+        }
+        if request.query_params.get("expanded") in ("true", "1"):
+            data["seats"] = seatmap.expand_seat_map(
+                bitmap, airplane.rows, airplane.seats_in_row, held
+            )
+
+        return Response(self.get_serializer(data).data)
 
     def get_serializer_class(self):
         if self.action == "list":
             return FlightListSerializer
 
+        if self.action == "seats":
+            return FlightSeatMapSerializer
+
         if self.action == "retrieve":
             return FlightDetailSerializer
 
         return FlightSerializer
 
 
+class FlightScheduleViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
+    """Recurring flights, searched through /flights/ as dated flights"""
+
+    queryset = FlightSchedule.objects.select_related(
+        "route__source", "route__destination"
+    )
+    serializer_class = FlightScheduleSerializer
+    permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+
+
+class ItineraryViewSet(ReplicaReadMixin, GenericViewSet):
+    """Direct and connecting flights between two airports"""
+
+    serializer_class = ItinerarySerializer
+    permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    throttle_scopes = {"list": "search"}
+
+    @extend_schema(parameters=[ItinerarySearchSerializer])
+    def list(self, request, *args, **kwargs):
+        """
+        Itineraries ordered by number of legs, each one arriving earlier
+        than the previous one; served from memory without querying flights
+        """
+        search = ItinerarySearchSerializer(data=request.query_params)
+        search.is_valid(raise_exception=True)
+        params = search.validated_data
+
+        itineraries = itinerary.get_graph().search(
+            source=params["source"],
+            destination=params["destination"],
+            depart_after=params["departure"],
+            min_connection=timedelta(minutes=params["min_connection"]),
+            max_legs=params["max_legs"],
+            window=timedelta(hours=params["window"]),
+        )
+        return Response(self.get_serializer(itineraries, many=True).data)
+
+
+class ResponseCacheStatsView(APIView):
+    """Hit/miss counters of the response cache per namespace"""
+
+    permission_classes = (IsAdminUser,)
+
+    @extend_schema(responses=OpenApiTypes.OBJECT)
+    def get(self, request):
+        return Response(stats(["flights"]))
+
+
 class RoutePagination(PageNumberPagination):
     page_size = 5
     page_size_query_param = "page-size"
     max_page_size = 100
 
 
-class RouteViewSet(viewsets.ModelViewSet):
+def month_param(params, name: str = "month"):
+    """First and last day of a YYYY-MM parameter, this month by default"""
+    value = params.get(name)
+    try:
+        first = (
+            datetime.strptime(value, "%Y-%m").date()
+            if value
+            else timezone.now().date().replace(day=1)
+        )
+    except ValueError:
+        raise ValidationError({name: "Month has wrong format. Use YYYY-MM."})
+    following = (first + timedelta(days=31)).replace(day=1)
+    return first, following - timedelta(days=1)
+
+
+def filter_routes(queryset, source_ids=None, destination_ids=None):
+    if source_ids is not None:
+        queryset = queryset.filter(source_id__in=source_ids)
+
+    if destination_ids is not None:
+        queryset = queryset.filter(destination_id__in=destination_ids)
+
+    return queryset
+
+
+class RouteViewSet(
+    ReplicaReadMixin,
+    ConditionalResponseMixin,
+    SparseQuerysetMixin,
+    viewsets.ModelViewSet,
+):
     queryset = Route.objects.select_related("source", "destination")
     serializer_class = RouteSerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    throttle_scopes = {"list": "search"}
 
     def get_queryset(self):
         source = self.request.query_params.get("source")
         destination = self.request.query_params.get("destination")
 
-        queryset = self.queryset
-
-        if source:
-            queryset = queryset.filter(source__close_big_city__icontains=source)
-
-        if destination:
-            queryset = queryset.filter(source__close_big_city__icontains=destination)
-
-        return queryset
+        return filter_routes(
+            self.queryset.all(),
+            Airport.objects.ids_for_city(source) if source else None,
+            Airport.objects.ids_for_city(destination) if destination else None,
+        )
 
     @extend_schema(
         parameters=[
@@ -230,7 +693,25 @@ class RouteViewSet(viewsets.ModelViewSet):
         this method is created for documentation, to use extend_schema
         for filtering
         """
-        return super().list(self, request, *args, **kwargs)
+        return super().list(request, *args, **kwargs)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "month",
+                type=OpenApiTypes.STR,
+                description="Month to show, the current one by default (ex. ?month=2020-10)",
+            ),
+        ],
+        responses=RouteCalendarDaySerializer(many=True),
+    )
+    @action(methods=["GET"], detail=True, url_path="calendar")
+    def calendar(self, request, pk=None):
+        """Flights and seats left on every day of a month"""
+        route = self.get_object()
+        first, last = month_param(request.query_params)
+        days = availability.calendar(route.id, first, last)
+        return Response(RouteCalendarDaySerializer(days, many=True).data)
 
 
 class OrderPagination(PageNumberPagination):
@@ -240,6 +721,7 @@ class OrderPagination(PageNumberPagination):
 
 
 class OrderViewSet(
+    ReplicaReadMixin,
     mixins.ListModelMixin,
     mixins.CreateModelMixin,
     GenericViewSet,
@@ -248,6 +730,7 @@ class OrderViewSet(
     serializer_class = OrderSerializer
     pagination_class = OrderPagination
     permission_classes = (IsAuthenticated,)
+    throttle_scopes = {"create": "orders"}
 
     """The function limits the ability of the user to view other user's orders"""
 
@@ -255,7 +738,18 @@ class OrderViewSet(
         queryset = self.queryset.filter(user=self.request.user)
 
         if self.action == "list":
-            queryset = queryset.prefetch_related("tickets__flight__airplane")
+            # a fixed number of queries whatever the page size:
+            # orders, then every ticket of the page with its flight joined in
+            queryset = queryset.prefetch_related(
+                Prefetch(
+                    "tickets",
+                    queryset=Ticket.objects.select_related(
+                        "flight__route__source",
+                        "flight__route__destination",
+                        "flight__airplane__airplane_type",
+                    ),
+                )
+            )
 
         return queryset
 
@@ -267,4 +761,52 @@ class OrderViewSet(
     def get_serializer_class(self):
         if self.action == "list":
             return OrderListSerializer
+        if self.action == "tickets":
+            return TicketHistorySerializer
         return OrderSerializer
+
+    @action(methods=["GET"], detail=False, url_path="tickets")
+    def tickets(self, request):
+        """Ticket history of the current user as flat rows, newest order first"""
+        queryset = (
+            Ticket.objects.filter(order__user=request.user)
+            .select_related(
+                "order", "flight__route__source", "flight__route__destination"
+            )
+            .order_by("-order__created_at", "order_id", "row", "seat")
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+
+class SeatHoldViewSet(
+    ReplicaReadMixin,
+    mixins.ListModelMixin,
+    mixins.DestroyModelMixin,
+    GenericViewSet,
+):
+    """Short reservations of seats that an order later turns into tickets"""
+
+    queryset = SeatHold.objects.all()
+    serializer_class = SeatHoldSerializer
+    permission_classes = (IsAuthenticated,)
+
+    def get_queryset(self):
+        return holds.active(self.queryset.filter(user=self.request.user))
+
+    def get_serializer_class(self):
+        if self.action == "create":
+            return SeatHoldCreateSerializer
+        return SeatHoldSerializer
+
+    @extend_schema(responses=SeatHoldSerializer(many=True))
+    def create(self, request, *args, **kwargs):
+        """Hold all requested seats on a flight, or none of them"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        seat_holds = serializer.save()
+        return Response(
+            SeatHoldSerializer(seat_holds, many=True).data,
+            status=status.HTTP_201_CREATED,
+        )
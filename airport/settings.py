@@ -27,7 +27,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = "django-insecure-!%s(_i=w3(t1t58u#js+4_i&_gr(h)3ad#j#7%ja8ddzqn7j3g"
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get("DEBUG", "True").lower() in ("1", "true", "yes")
 
 ALLOWED_HOSTS = []
 
@@ -41,7 +41,6 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
-    "debug_toolbar",
     "rest_framework",
     "user",
     "airlines",
@@ -57,9 +56,10 @@ MEDIA_ROOT = BASE_DIR / "media"
 
 
 MIDDLEWARE = [
+    "airlines.middleware.MetricsMiddleware",
+    "airlines.middleware.RateLimitHeadersMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
-    "debug_toolbar.middleware.DebugToolbarMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
@@ -67,6 +67,22 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+if DEBUG:
+    INSTALLED_APPS.append("debug_toolbar")
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index("django.middleware.common.CommonMiddleware"),
+        "debug_toolbar.middleware.DebugToolbarMiddleware",
+    )
+
+# shared by all worker processes, /metrics sums the files found there
+METRICS_DIR = os.environ.get("METRICS_DIR") or None
+METRICS_FLUSH_SECONDS = float(os.environ.get("METRICS_FLUSH_SECONDS", 5))
+# bearer token of the Prometheus scraper; staff users may scrape without it
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN") or None
+# worker processes, as gunicorn and uvicorn read it; /metrics needs
+# METRICS_DIR when there are several
+WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY", 1))
+
 ROOT_URLCONF = "airport.urls"
 
 SPECTACULAR_SETTINGS = {
@@ -104,13 +120,108 @@ WSGI_APPLICATION = "airport.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+if os.environ.get("POSTGRES_HOST"):
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "HOST": os.environ["POSTGRES_HOST"],
+            "PORT": os.environ.get("POSTGRES_PORT", "5432"),
+            "NAME": os.environ.get("POSTGRES_NAME"),
+            "USER": os.environ.get("POSTGRES_USER"),
+            "PASSWORD": os.environ.get("POSTGRES_PASSWORD"),
+        }
+    }
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": BASE_DIR / "db.sqlite3",
+        }
     }
+
+# Persistent connections, checked before reuse. airport/asgi.py turns them
+# off: under ASGI every request runs its sync code on a thread of its own
+# and would leave its connection open
+DATABASES["default"]["CONN_MAX_AGE"] = int(os.environ.get("DB_CONN_MAX_AGE", 60))
+DATABASES["default"]["CONN_HEALTH_CHECKS"] = os.environ.get(
+    "DB_CONN_HEALTH_CHECKS", "True"
+).lower() in ("1", "true", "yes")
+
+# Read replicas, comma separated: hosts on Postgres, database files on
+# SQLite. Safe requests to the airlines API read from them, users who just
+# wrote read from the primary for REPLICA_STICKY_SECONDS
+DATABASE_REPLICAS = []
+for number, replica in enumerate(os.environ.get("DB_REPLICAS", "").split(","), 1):
+    if not replica.strip():
+        continue
+    field = "HOST" if os.environ.get("POSTGRES_HOST") else "NAME"
+    DATABASES[f"replica{number}"] = {
+        **DATABASES["default"],
+        field: replica.strip(),
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(f"replica{number}")
+
+DATABASE_ROUTERS = ["airlines.replicas.ReplicaRouter"]
+REPLICA_STICKY_SECONDS = int(os.environ.get("REPLICA_STICKY_SECONDS", 5))
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# The response cache defaults to per-process memory, which only suits a
+# single worker: it also holds the namespace versions writes bump (see
+# airlines.cache). With several workers point it at a shared backend (e.g.
+# django.core.cache.backends.filebased.FileBasedCache with a directory, or
+# Redis); airlines.checks warns when WEB_CONCURRENCY > 1 and it is not
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "default",
+    },
+    "responses": {
+        "BACKEND": os.environ.get(
+            "RESPONSE_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("RESPONSE_CACHE_LOCATION", "responses"),
+        "TIMEOUT": int(os.environ.get("RESPONSE_CACHE_TIMEOUT", 300)),
+    },
+    # always per process, for authenticated users; backed by "default" only
+    # when that one is shared, see user.authentication
+    "jwt-users": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "jwt-users",
+        "TIMEOUT": int(os.environ.get("JWT_USER_LOCAL_SECONDS", 5)),
+    },
 }
 
+RESPONSE_CACHE_ALIAS = "responses"
+
+# token buckets, see airlines.throttling: "cache", "redis" (shared by all
+# workers, needs the redis package) or "sqlite" (shared by one host). The
+# LocMem default cache only serves a single worker; several share a file
+THROTTLE_STORE = os.environ.get("THROTTLE_STORE") or (
+    "sqlite" if WEB_CONCURRENCY > 1 else "cache"
+)
+THROTTLE_CACHE_ALIAS = "default"
+THROTTLE_REDIS_URL = os.environ.get("THROTTLE_REDIS_URL", "redis://localhost:6379/0")
+THROTTLE_SQLITE_PATH = os.environ.get("THROTTLE_SQLITE_PATH") or str(
+    BASE_DIR / "throttle.sqlite3"
+)
+
+JWT_USER_LOCAL_CACHE_ALIAS = "jwt-users"
+JWT_USER_CACHE_SECONDS = int(os.environ.get("JWT_USER_CACHE_SECONDS", 60))
+
+SEAT_HOLD_MINUTES = int(os.environ.get("SEAT_HOLD_MINUTES", 10))
+# how long another worker may serve a seat map older than the last order
+SEAT_MAP_SECONDS = int(os.environ.get("SEAT_MAP_SECONDS", 60))
+
+# days of schedule-generated flights a single search expands at most
+FLIGHT_SCHEDULE_WINDOW_DAYS = int(os.environ.get("FLIGHT_SCHEDULE_WINDOW_DAYS", 31))
+
+# threads rendering image derivatives, 0 renders inline after commit
+IMAGE_WORKERS = int(os.environ.get("IMAGE_WORKERS", 2))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -157,16 +268,31 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_THROTTLE_CLASSES": [
-        "rest_framework.throttling.AnonRateThrottle",
-        "rest_framework.throttling.UserRateThrottle",
+        "airlines.throttling.AnonBucketThrottle",
+        "airlines.throttling.UserBucketThrottle",
     ],
-    "DEFAULT_THROTTLE_RATES": {"anon": "100/day", "user": "1000/day"},
-    "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+    # "orders" and "search" replace "user" for the actions that set them
+    "DEFAULT_THROTTLE_RATES": {
+        "anon": os.environ.get("THROTTLE_ANON_RATE", "100/day"),
+        "user": os.environ.get("THROTTLE_USER_RATE", "1000/day"),
+        "orders": os.environ.get("THROTTLE_ORDERS_RATE", "100/day"),
+        "search": os.environ.get("THROTTLE_SEARCH_RATE", "5000/day"),
+    },
+    "DEFAULT_AUTHENTICATION_CLASSES": ("user.authentication.CachedJWTAuthentication",),
+    # orjson backed, the stock JSON classes are used when it is not installed
+    "DEFAULT_RENDERER_CLASSES": (
+        "airlines.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "airlines.renderers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
     ),
 }
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=400),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
     "ROTATE_REFRESH_TOKENS": True,
+    "TOKEN_OBTAIN_SERIALIZER": "user.serializers.TokenObtainPairSerializer",
 }
@@ -0,0 +1,109 @@
+"""
+JWT authentication without a user query per request.
+
+Tokens carry a ``ver`` claim, the user's token_version when they were
+issued; changing the password bumps it, which revokes older tokens.
+CachedJWTAuthentication resolves the user from a short-lived per-process
+cache, keyed by user id and ``ver``, in front of the default cache when
+that one is shared between processes (anything but LocMemCache). Entries
+hold the fields permissions read (is_staff, is_active, ...). Saving or
+deleting a user drops its entries, see user.signals; other processes may
+serve theirs for up to JWT_USER_LOCAL_SECONDS.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+VERSION_CLAIM = "ver"
+
+USER_FIELDS = (
+    "id",
+    "email",
+    "first_name",
+    "last_name",
+    "is_staff",
+    "is_active",
+    "is_superuser",
+    "token_version",
+)
+
+
+def local_cache():
+    return caches[getattr(settings, "JWT_USER_LOCAL_CACHE_ALIAS", "default")]
+
+
+def shared_cache():
+    """
+    The default cache, or None when it is per-process memory: entries other
+    processes cannot drop would outlive a revocation there
+    """
+    shared = caches["default"]
+    return None if isinstance(shared, LocMemCache) else shared
+
+
+def cache_seconds() -> int:
+    return getattr(settings, "JWT_USER_CACHE_SECONDS", 60)
+
+
+def user_key(user_id, version) -> str:
+    return f"jwt-user:{user_id}:{version}"
+
+
+def forget(user_id, *versions):
+    keys = [user_key(user_id, version) for version in versions]
+    local_cache().delete_many(keys)
+    shared = shared_cache()
+    if shared is not None:
+        shared.delete_many(keys)
+
+
+class VersionedJWTAuthentication(JWTAuthentication):
+    """Loads the user from the database and rejects revoked tokens"""
+
+    def get_user(self, validated_token):
+        user = super().get_user(validated_token)
+        if user.token_version != validated_token.get(VERSION_CLAIM, 0):
+            raise AuthenticationFailed(
+                _("The user's password has been changed."), code="password_changed"
+            )
+        return user
+
+
+class CachedJWTAuthentication(VersionedJWTAuthentication):
+    """
+    The request user is a User instance built from cached fields; other
+    fields are deferred and load from the database on first access
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        key = user_key(user_id, validated_token.get(VERSION_CLAIM, 0))
+        fields = local_cache().get(key)
+        if fields is None:
+            shared = shared_cache()
+            fields = None if shared is None else shared.get(key)
+            if fields is None:
+                user = super().get_user(validated_token)
+                fields = {name: getattr(user, name) for name in USER_FIELDS}
+                if shared is not None:
+                    shared.set(key, fields, timeout=cache_seconds())
+            local_cache().set(key, fields)
+
+        return self.build_user(fields)
+
+    def build_user(self, fields: dict):
+        names, values = [], []
+        for field in self.user_model._meta.concrete_fields:
+            if field.attname in fields:
+                names.append(field.attname)
+                values.append(fields[field.attname])
+        return self.user_model.from_db(DEFAULT_DB_ALIAS, names, values)
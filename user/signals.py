@@ -0,0 +1,41 @@
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from user.authentication import forget
+
+User = get_user_model()
+
+
+def forget_now_and_on_commit(user_id, *versions):
+    # again on commit, for entries other requests cached from pre-commit data
+    forget(user_id, *versions)
+    transaction.on_commit(partial(forget, user_id, *versions))
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, raw=False, **kwargs):
+    # remember the old version, its cached entries must go too
+    instance.previous_token_version = None
+    if instance.pk and not raw:
+        instance.previous_token_version = (
+            User.objects.filter(pk=instance.pk)
+            .values_list("token_version", flat=True)
+            .first()
+        )
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, **kwargs):
+    if created or raw:
+        return
+    versions = {instance.token_version, instance.previous_token_version} - {None}
+    forget_now_and_on_commit(instance.pk, *versions)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    forget_now_and_on_commit(instance.pk, instance.token_version)
@@ -0,0 +1,125 @@
+from tempfile import TemporaryDirectory
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from user.authentication import user_key
+
+TOKEN_URL = reverse("user:token_obtain_pair")
+REFRESH_URL = reverse("user:token_refresh")
+ME_URL = reverse("user:manage")
+AIRPORT_URL = reverse("airlines:airport-list")
+
+
+class CachedJWTApiTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        caches["jwt-users"].clear()
+        self.user = get_user_model().objects.create_user("test@test1.com", "test1234")
+        self.client = APIClient()
+
+    def login(self, password="test1234") -> dict:
+        response = self.client.post(
+            TOKEN_URL, {"email": "test@test1.com", "password": password}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def get(self, url, token):
+        return self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def test_token_carries_version(self):
+        token = AccessToken(self.login()["access"])
+
+        self.assertEqual(token["ver"], 0)
+
+    def test_user_is_not_queried_once_cached(self):
+        token = self.login()["access"]
+        with self.assertNumQueries(3):
+            self.get(AIRPORT_URL, token)
+        with self.assertNumQueries(2):
+            response = self.get(AIRPORT_URL, token)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_shared_cache_serves_a_cold_process(self):
+        with TemporaryDirectory() as location:
+            shared = {
+                "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                "LOCATION": location,
+            }
+            with override_settings(CACHES={**settings.CACHES, "default": shared}):
+                token = self.login()["access"]
+                self.get(AIRPORT_URL, token)
+                caches["jwt-users"].clear()
+
+                with self.assertNumQueries(2):
+                    self.get(AIRPORT_URL, token)
+
+    def test_per_process_default_cache_is_not_shared(self):
+        token = self.login()["access"]
+        self.get(AIRPORT_URL, token)
+
+        self.assertIsNone(cache.get(user_key(self.user.id, 0)))
+
+    def test_password_change_revokes_tokens(self):
+        tokens = self.login()
+        self.get(AIRPORT_URL, tokens["access"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                ME_URL,
+                {"password": "new-pass1"},
+                HTTP_AUTHORIZATION=f"Bearer {tokens['access']}",
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.get(AIRPORT_URL, tokens["access"])
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.get(ME_URL, tokens["access"])
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        refreshed = self.client.post(REFRESH_URL, {"refresh": tokens["refresh"]})
+        response = self.get(AIRPORT_URL, refreshed.data["access"])
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        response = self.get(AIRPORT_URL, self.login("new-pass1")["access"])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_deactivation_rejects_cached_user(self):
+        token = self.login()["access"]
+        self.get(AIRPORT_URL, token)
+
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+
+        response = self.get(AIRPORT_URL, token)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_staff_change_applies_immediately(self):
+        token = self.login()["access"]
+        response = self.client.post(
+            AIRPORT_URL,
+            {"name": "Test", "close_big_city": "Test city"},
+            HTTP_AUTHORIZATION=f"Bearer {token}",
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+
+        response = self.client.post(
+            AIRPORT_URL,
+            {"name": "Test", "close_big_city": "Test city"},
+            HTTP_AUTHORIZATION=f"Bearer {token}",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
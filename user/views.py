@@ -1,7 +1,7 @@
 from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.authentication import JWTAuthentication
 
+from user.authentication import VersionedJWTAuthentication
 from user.serializers import UserSerializer
 
 
@@ -11,7 +11,7 @@ class CreateUserView(generics.CreateAPIView):
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
-    authentication_classes = (JWTAuthentication,)
+    authentication_classes = (VersionedJWTAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def get_object(self):